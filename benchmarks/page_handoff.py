@@ -0,0 +1,84 @@
+"""
+Benchmark: entrega de páginas rasterizadas al OCR en memoria vs. archivo PNG temporal
+
+Compara el costo por página de guardar la imagen en /tmp y volver a leerla con
+cv2.imread (flujo anterior de extract_from_pdf) frente a pasar la imagen PIL
+directamente a OCRService.preprocess_image. No requiere Tesseract ni EasyOCR.
+
+Uso:
+    python -m benchmarks.page_handoff [--pages 20] [--dpi 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src.services.ocr_service import OCRService
+
+
+def render_page(dpi: int) -> Image.Image:
+    """Genera una página carta con texto, similar a un extracto rasterizado"""
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    page = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default()
+    
+    line_height = max(12, dpi // 10)
+    for i, y in enumerate(range(dpi // 2, height - dpi // 2, line_height)):
+        draw.text(
+            (dpi // 2, y),
+            f"{i + 1:04d}  15/05/2023  PAGO PSE BANCO COLOMBIA  $1,250,000.00  $8,430,120.55",
+            fill='black', font=font
+        )
+    
+    return page
+
+
+def bench_temp_file(service: OCRService, pages: list) -> float:
+    """Flujo anterior: PNG en disco y lectura con cv2.imread"""
+    start = time.perf_counter()
+    for page_num, page in enumerate(pages):
+        temp_path = os.path.join(tempfile.gettempdir(), f"pdf_page_{page_num}.png")
+        page.save(temp_path, 'PNG')
+        service.preprocess_image(temp_path)
+        os.remove(temp_path)
+    return time.perf_counter() - start
+
+
+def bench_in_memory(service: OCRService, pages: list) -> float:
+    """Flujo actual: imagen PIL entregada directamente al preprocesamiento"""
+    start = time.perf_counter()
+    for page in pages:
+        service.preprocess_image(page)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--dpi', type=int, default=200)
+    args = parser.parse_args()
+    
+    service = OCRService(use_cache=False)
+    pages = [render_page(args.dpi) for _ in range(args.pages)]
+    
+    # Calentamiento
+    bench_in_memory(service, pages[:1])
+    
+    temp_file_time = bench_temp_file(service, pages)
+    in_memory_time = bench_in_memory(service, pages)
+    
+    per_page_temp = temp_file_time / args.pages * 1000
+    per_page_memory = in_memory_time / args.pages * 1000
+    
+    print(f"Páginas: {args.pages} a {args.dpi} DPI ({pages[0].width}x{pages[0].height})")
+    print(f"Archivo temporal PNG: {per_page_temp:8.1f} ms/página")
+    print(f"En memoria:           {per_page_memory:8.1f} ms/página")
+    print(f"Ahorro:               {per_page_temp - per_page_memory:8.1f} ms/página "
+          f"({temp_file_time / in_memory_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
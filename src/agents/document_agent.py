@@ -3,7 +3,7 @@ Agente principal de procesamiento de documentos
 """
 import asyncio
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
 from pathlib import Path
 
@@ -14,8 +14,9 @@ from src.models.schemas import (
 )
 from src.services.ocr_service import OCRService
 from src.services.classification_service import DocumentClassifier
-from src.services.extraction_service import DataExtractionService
-from src.core.config import DOCUMENT_CONFIG
+from src.services.extraction_service import FULL_TEXT_FIELDS, DataExtractionService
+from src.services.zone_templates import get_zone_template
+from src.core.config import DOCUMENT_CONFIG, EXTRACTION_FIELDS, OCR_CONFIG
 
 
 class DocumentProcessingAgent:
@@ -31,13 +32,18 @@ class DocumentProcessingAgent:
         
         logger.info("Agente de procesamiento de documentos inicializado")
     
-    async def process_document(self, document: Document, actions: List[str] = None) -> ProcessingResult:
+    async def process_document(self, document: Document, actions: List[str] = None,
+                               full_ocr: bool = False, zone_ocr: bool = False) -> ProcessingResult:
         """
         Procesa un documento completo
         
         Args:
             document: Documento a procesar
             actions: Lista de acciones a realizar ['classify', 'extract', 'validate', 'detect_fraud']
+            full_ocr: Si procesar todas las páginas de un PDF aunque ya haya
+                evidencia suficiente (ver _process_pdf_stream)
+            zone_ocr: Si intentar el OCR por zonas de plantilla cuando el tipo
+                ya se clasificó con confianza (ver _extract_zones)
         """
         start_time = time.time()
         
@@ -53,23 +59,45 @@ class DocumentProcessingAgent:
             # Actualizar estado
             document.status = ProcessingStatus.PROCESSING
             
-            # 1. Extraer texto del documento
-            text = await self._extract_text(document)
+            # 1. Extraer texto del documento: solo las zonas de plantilla si se
+            #    pidió, el tipo se clasificó con confianza y tiene diseño fijo,
+            #    o el documento completo
+            zone_result = await self._extract_zones(document) if zone_ocr else None
+            regex_results = None
+            if zone_result:
+                text = zone_result['text']
+            elif Path(document.file_path).suffix.lower() == '.pdf':
+                # Clasificar y extraer a medida que llegan las páginas
+                text, regex_results = self._process_pdf_stream(document, actions, result, full_ocr)
+            else:
+                text = await self._extract_text(document)
             if not text:
                 result.errors.append("No se pudo extraer texto del documento")
                 document.status = ProcessingStatus.FAILED
                 return result
             
-            # 2. Clasificar documento
-            if 'classify' in actions:
-                logger.info(f"Clasificando documento {document.id}")
-                result.classification = self._classify_document(text)
-                document.document_type = result.classification.document_type
+            # 2. Clasificar documento (si no se decidió ya durante el flujo de páginas)
+            if 'classify' in actions and result.classification is None:
+                if zone_result:
+                    result.classification = ClassificationResult(
+                        document_type=document.document_type,
+                        confidence=document.classification_confidence,
+                        reasoning="Tipo de documento clasificado previamente; OCR por zonas de plantilla"
+                    )
+                else:
+                    logger.info(f"Clasificando documento {document.id}")
+                    result.classification = self._classify_document(text)
+                    document.document_type = result.classification.document_type
+                    document.classification_confidence = result.classification.confidence
             
             # 3. Extraer datos
             if 'extract' in actions and document.document_type:
                 logger.info(f"Extrayendo datos del documento {document.id}")
-                result.extraction = self._extract_data(text, document.document_type)
+                result.extraction = self._extract_data(
+                    text, document.document_type,
+                    zone_fields=zone_result['fields'] if zone_result else None,
+                    regex_results=regex_results
+                )
             
             # 4. Validar documento
             if 'validate' in actions:
@@ -106,8 +134,10 @@ class DocumentProcessingAgent:
             file_extension = Path(document.file_path).suffix.lower()
             
             if file_extension == '.pdf':
-                # Extraer de PDF
-                ocr_result = self.ocr_service.extract_from_pdf(document.file_path)
+                # Usar la capa de texto del PDF y OCR solo en páginas escaneadas
+                ocr_result = self.ocr_service.extract_from_pdf_pages(
+                    document.file_path, use_text_layer=True
+                )
             elif file_extension in ['.png', '.jpg', '.jpeg', '.tiff']:
                 # Extraer de imagen
                 ocr_result = self.ocr_service.extract_text(document.file_path)
@@ -130,13 +160,170 @@ class DocumentProcessingAgent:
             logger.error(f"Error extrayendo texto: {e}")
             return None
     
+    def _process_pdf_stream(self, document: Document, actions: List[str],
+                            result: ProcessingResult,
+                            full_ocr: bool = False) -> Tuple[Optional[str], Optional[Tuple[Dict, Dict]]]:
+        """
+        Procesa un PDF página a página a medida que avanza el OCR
+        
+        La clasificación se decide en cuanto el texto acumulado supera
+        DOCUMENT_CONFIG['classification_threshold'] (normalmente en la primera
+        página) y desde ese momento la extracción por regex corre sobre cada
+        página que llega. Solo se clasifica durante las primeras
+        DOCUMENT_CONFIG['stream_classify_pages'] páginas con texto; si el
+        umbral no se alcanza, el tipo se fija con la clasificación de esas
+        páginas, de modo que no se reclasifica el texto acumulado en cada
+        página nueva.
+        
+        Con evidencia suficiente (tipo decidido y todos los campos esperados
+        que produce la regex encontrados, ver _has_all_fields) se detiene el
+        OCR de las páginas restantes, salvo que se pida `full_ocr` o que
+        OCR_CONFIG['early_stop'] esté deshabilitado. La detección de fraude
+        analiza entonces las páginas leídas; quien necesite revisar todas debe
+        pedir `full_ocr`.
+        
+        Returns:
+            (texto completo, campos de regex acumulados o None si no se extrajeron
+            durante el flujo)
+        """
+        start_time = time.time()
+        threshold = DOCUMENT_CONFIG['classification_threshold']
+        classify_pages = DOCUMENT_CONFIG['stream_classify_pages']
+        classified_pages = 0
+        document_type = None if 'classify' in actions else document.document_type
+        page_texts = []
+        regex_results = None
+        extracted_pages = 0
+        early_stop = OCR_CONFIG['early_stop'] and not full_ocr
+        pages = self.ocr_service.iter_pdf_pages(document.file_path)
+        
+        try:
+            for page in pages:
+                if not page_texts:
+                    logger.info(f"Primera página de {document.id} lista en {time.time() - start_time:.2f}s")
+                page_texts.append(page['text'])
+                
+                if document_type is None and 'classify' in actions and page['text']:
+                    classification = self._classify_document('\n\n'.join(page_texts))
+                    classified_pages += 1
+                    if classification.confidence >= threshold or classified_pages >= classify_pages:
+                        result.classification = classification
+                        document.document_type = document_type = classification.document_type
+                        document.classification_confidence = classification.confidence
+                        logger.info(
+                            f"Documento {document.id} clasificado como {document_type.value} "
+                            f"en la página {page['page']}"
+                        )
+                
+                if document_type is not None and 'extract' in actions:
+                    # Incluye las páginas recibidas antes de decidir el tipo
+                    if regex_results is None:
+                        regex_results = ({}, {})
+                    for page_text in page_texts[extracted_pages:]:
+                        self.extractor.merge_regex_results(
+                            regex_results, self.extractor.extract_with_regex(page_text, document_type)
+                        )
+                    extracted_pages = len(page_texts)
+                    
+                    if early_stop and self._has_all_fields(document_type, regex_results):
+                        logger.info(
+                            f"Evidencia suficiente para {document.id} en la página {page['page']}; "
+                            f"se omite el OCR de las páginas restantes"
+                        )
+                        break
+            
+        except Exception as e:
+            logger.error(f"Error extrayendo texto: {e}")
+            return None, None
+        
+        finally:
+            # Cancela las páginas pendientes del pool si se detuvo antes de terminar
+            pages.close()
+        
+        return '\n\n'.join(text for text in page_texts if text), regex_results
+    
+    def _has_all_fields(self, document_type: DocumentType, regex_results: Optional[Tuple[Dict, Dict]]) -> bool:
+        """
+        Indica si la regex ya encontró todos los campos esperados que puede producir
+        
+        Solo cuentan los EXTRACTION_FIELDS del tipo con patrón de regex (p. ej.
+        'apellidos' de la cédula no tiene y no impide detenerse). Los tipos con
+        campos que se leen del documento completo, como los movimientos del
+        estado de cuenta, nunca se detienen antes.
+        """
+        expected = EXTRACTION_FIELDS.get(document_type.value)
+        if not expected or regex_results is None:
+            return False
+        if any(field in FULL_TEXT_FIELDS for field in expected):
+            return False
+        
+        patterns = self.extractor.patterns.get(document_type.value, {})
+        required = [field for field in expected if field in patterns]
+        return bool(required) and all(field in regex_results[0] for field in required)
+    
+    async def _extract_zones(self, document: Document) -> Optional[Dict]:
+        """
+        Aplica OCR por zonas de plantilla a documentos de tipo conocido y diseño fijo
+        
+        Solo aplica si una clasificación previa fijó el tipo con al menos
+        zone_min_confidence: con un tipo dudoso las zonas recortarían regiones
+        equivocadas. Retorna None si no aplica (tipo sin clasificar con
+        confianza, sin plantilla, formato no soportado), si las zonas no
+        produjeron texto o si falta algún campo esperado de la plantilla, para
+        usar el OCR completo.
+        """
+        template = get_zone_template(document.document_type)
+        confidence = document.classification_confidence
+        if not template or confidence is None or confidence < DOCUMENT_CONFIG['zone_min_confidence']:
+            return None
+        
+        try:
+            file_extension = Path(document.file_path).suffix.lower()
+            
+            if file_extension == '.pdf':
+                image = self.ocr_service._rasterize_page(document.file_path, 0, OCR_CONFIG['pdf_dpi'])
+            elif file_extension in ['.png', '.jpg', '.jpeg', '.tiff']:
+                image = document.file_path
+            else:
+                return None
+            
+            zone_result = self.ocr_service.extract_zones(image, document.document_type)
+            if zone_result.get('error') or not zone_result['word_count']:
+                logger.warning(f"OCR por zonas sin resultados para {document.id}; usando OCR completo")
+                return None
+            
+            # Los campos esperados con zona deben salir de las zonas; si falta
+            # alguno (recorte desplazado, zona ilegible) se usa el OCR completo
+            expected = EXTRACTION_FIELDS.get(document.document_type.value, [])
+            zone_data, _ = self.extractor.extract_from_zones(zone_result['fields'], document.document_type)
+            missing = [field for field in expected if field in template and field not in zone_data]
+            if missing:
+                logger.warning(
+                    f"OCR por zonas sin {', '.join(missing)} para {document.id}; usando OCR completo"
+                )
+                return None
+            
+            logger.info(
+                f"OCR por zonas de {document.document_type.value}: "
+                f"{zone_result['pixel_ratio']:.0%} de los píxeles en {zone_result['processing_time']:.2f}s"
+            )
+            return zone_result
+            
+        except Exception as e:
+            logger.warning(f"Error en OCR por zonas: {e}")
+            return None
+    
     def _classify_document(self, text: str) -> ClassificationResult:
         """Clasifica el tipo de documento"""
         return self.classifier.classify(text)
     
-    def _extract_data(self, text: str, document_type: DocumentType) -> ExtractionResult:
+    def _extract_data(self, text: str, document_type: DocumentType,
+                      zone_fields: Optional[Dict] = None,
+                      regex_results: Optional[Tuple[Dict, Dict]] = None) -> ExtractionResult:
         """Extrae datos estructurados del documento"""
-        return self.extractor.extract_data(text, document_type)
+        return self.extractor.extract_data(
+            text, document_type, zone_fields=zone_fields, regex_results=regex_results
+        )
     
     def _validate_document(self, extraction: Optional[ExtractionResult], 
                           document_type: DocumentType) -> ValidationResult:
@@ -255,7 +442,9 @@ class DocumentProcessingAgent:
                 mime_type="application/pdf"
             )
             
-            result = await self.process_document(document, request.actions)
+            result = await self.process_document(
+                document, request.actions, request.full_ocr, request.zone_ocr
+            )
             
             return AgentResponse(
                 request_id=request.document_id,
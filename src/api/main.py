@@ -41,6 +41,14 @@ app.add_middleware(
 # Inicializar agente
 agent = DocumentProcessingAgent()
 
+# Precargar los motores de OCR al importar el módulo: con `gunicorn --preload`
+# la importación ocurre en el proceso maestro antes del fork, de modo que los
+# workers comparten los modelos congelados por copia en escritura
+try:
+    agent.ocr_service.warm_up(freeze=True)
+except Exception as e:
+    logger.warning(f"No se pudieron precargar los motores de OCR: {e}")
+
 # Almacenamiento en memoria para documentos (en producción usar base de datos)
 documents_db: dict = {}
 results_db: dict = {}
@@ -128,7 +136,9 @@ async def upload_document(file: UploadFile = File(...)):
 async def process_document(
     document_id: str,
     background_tasks: BackgroundTasks,
-    actions: Optional[List[str]] = None
+    actions: Optional[List[str]] = None,
+    full_ocr: bool = False,
+    zone_ocr: bool = False
 ):
     """
     Procesa un documento usando el agente de IA
@@ -145,11 +155,13 @@ async def process_document(
         # Crear solicitud
         request = AgentRequest(
             document_id=document_id,
-            actions=actions
+            actions=actions,
+            full_ocr=full_ocr,
+            zone_ocr=zone_ocr
         )
         
         # Procesar en background
-        background_tasks.add_task(process_document_background, document, actions)
+        background_tasks.add_task(process_document_background, document, actions, full_ocr, zone_ocr)
         
         return AgentResponse(
             request_id=document_id,
@@ -165,10 +177,11 @@ async def process_document(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def process_document_background(document: Document, actions: List[str]):
+async def process_document_background(document: Document, actions: List[str], full_ocr: bool = False,
+                                       zone_ocr: bool = False):
     """Procesa documento en background"""
     try:
-        result = await agent.process_document(document, actions)
+        result = await agent.process_document(document, actions, full_ocr, zone_ocr)
         results_db[document.id] = result
         documents_db[document.id] = document  # Actualizar estado
         
@@ -281,7 +294,9 @@ async def get_statistics():
         "total_documents": total_docs,
         "status_distribution": status_counts,
         "type_distribution": type_counts,
-        "success_rate": status_counts.get(ProcessingStatus.COMPLETED, 0) / total_docs if total_docs > 0 else 0
+        "success_rate": status_counts.get(ProcessingStatus.COMPLETED, 0) / total_docs if total_docs > 0 else 0,
+        "classification_cascade": agent.classifier.get_cascade_stats(),
+        "nlp_planner": agent.extractor.get_nlp_stats()
     }
 
 
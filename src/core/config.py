@@ -21,7 +21,44 @@ DOCUMENT_CONFIG = {
     "max_file_size": 50 * 1024 * 1024,  # 50MB
     "ocr_language": "spa",  # Español
     "classification_threshold": 0.7,
-    "extraction_confidence": 0.8
+    "classification_cascade": True,  # Patrones primero; ML solo para documentos ambiguos
+    "cascade_min_margin": 0.1,  # Ventaja mínima del mejor tipo sobre el segundo para aceptar patrones
+    "stream_classify_pages": 2,  # Páginas del PDF tras las que se fija el tipo aunque no alcance el umbral
+    "zone_min_confidence": 0.9,  # Confianza previa del tipo para intentar el OCR por zonas
+    "extraction_confidence": 0.8,
+    "nlp_planner": True,  # Ejecutar NLP solo para campos esperados que regex no llenó
+    "nlp_window_chars": 300,  # Contexto a cada lado de la etiqueta de un campo faltante
+    "nlp_windows_per_field": 3  # Apariciones de la etiqueta usadas como ventana por campo
+}
+
+# Configuración de OCR
+OCR_CONFIG = {
+    "pdf_chunk_size": 4,  # Páginas rasterizadas por tarea del pool
+    "max_workers": os.cpu_count() or 1,  # Procesos para OCR multipágina
+    "pdf_dpi": 200,  # DPI fija cuando adaptive_dpi está deshabilitado
+    "raster_window_pages": 1,  # Páginas rasterizadas a la vez dentro de cada tarea
+    "max_document_memory_mb": 1024,  # Techo de memoria de imágenes por documento
+    "raster_memory_factor": 4,  # Copias de la imagen vivas durante preprocesamiento y OCR
+    "adaptive_dpi": True,  # Elegir la DPI por página según la altura del texto
+    "dpi_probe": 100,  # DPI del sondeo rápido para estimar la altura del texto
+    "dpi_candidates": [100, 150, 200, 300],
+    "target_text_height_px": 13,  # Altura mediana de caracteres deseada (10 pt a 200 DPI mide ~16 px)
+    "dpi_confidence_tolerance": 0.05,  # Margen bajo cascade_min_confidence antes de subir la DPI
+    "text_layer_min_chars": 20,  # Mínimo de caracteres para confiar en la capa de texto
+    "text_layer_min_valid_ratio": 0.85,  # Proporción mínima de caracteres legibles
+    "text_layer_max_avg_word_length": 25,
+    "cascade_min_confidence": 0.8,  # Umbral para aceptar un motor sin escalar
+    "cascade_min_words": 3,
+    "early_stop": True,  # Detener el OCR de un PDF con clasificación y campos completos
+    "cache_enabled": True,  # Caché persistente de resultados por contenido
+    "cache_dir": DATA_DIR / "cache" / "ocr",
+    "cache_max_bytes": 256 * 1024 * 1024,  # 256MB
+    "warmup_engines": ["tesseract"],  # Motores precargados al iniciar la API (añadir "easyocr" si se usa)
+    "zone_workers": 4,  # Hilos para el OCR de zonas de plantilla
+    "tesseract_backend": "auto",  # 'auto' (tesserocr si está instalado), 'tesserocr' o 'pytesseract'
+    "tesseract_pool_size": os.cpu_count() or 1,  # Handles persistentes de Tesseract por proceso
+    "easyocr_batch_size": 8,  # Imágenes por lote en extract_batch
+    "easyocr_bucket_px": 256  # Granularidad de las cubetas de tamaño para los lotes
 }
 
 # Configuración de modelos
@@ -29,7 +66,14 @@ MODEL_CONFIG = {
     "document_classifier": "microsoft/DialoGPT-medium",
     "text_extractor": "distilbert-base-multilingual-cased", 
     "fraud_detector": "scikit-learn",
-    "embedding_model": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    "embedding_model": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+    "hashing_n_features": 2 ** 18,  # Columnas del vectorizador por hashing (entrenamiento incremental)
+    "training_chunk_size": 5000,  # Documentos por bloque al entrenar desde archivos
+    "spacy_model": "es_core_news_sm",  # Solo se ejecutan sus componentes de NER
+    "nlp_batch_size": 64,  # Textos por lote en nlp.pipe
+    "nlp_n_process": 1,  # Procesos para la extracción NLP por lotes
+    "nlp_chunk_chars": 100_000,  # Ventana máxima de texto por Doc de spaCy (max_length es 1M)
+    "nlp_chunk_overlap_chars": 1_000  # Solapamiento entre ventanas para no partir entidades
 }
 
 # Configuración de API
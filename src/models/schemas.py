@@ -36,6 +36,9 @@ class Document(BaseModel):
     filename: str = Field(..., description="Nombre del archivo")
     file_path: str = Field(..., description="Ruta del archivo")
     document_type: Optional[DocumentType] = Field(None, description="Tipo de documento")
+    classification_confidence: Optional[float] = Field(
+        None, ge=0.0, le=1.0, description="Confianza de la clasificación que fijó el tipo"
+    )
     status: ProcessingStatus = Field(default=ProcessingStatus.PENDING)
     uploaded_at: datetime = Field(default_factory=datetime.now)
     processed_at: Optional[datetime] = None
@@ -91,6 +94,8 @@ class AgentRequest(BaseModel):
     actions: List[str] = Field(default=["classify", "extract", "validate", "detect_fraud"])
     priority: int = Field(default=1, ge=1, le=5)
     callback_url: Optional[str] = None
+    full_ocr: bool = False  # Procesar todas las páginas aunque haya evidencia suficiente
+    zone_ocr: bool = False  # Probar OCR por zonas si el tipo ya se clasificó con confianza
 
 
 class AgentResponse(BaseModel):
@@ -1,11 +1,13 @@
 """
 Servicio de clasificación de documentos usando modelos de ML
 """
-import re
 import pickle
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
@@ -14,7 +16,23 @@ import numpy as np
 from loguru import logger
 
 from src.models.schemas import DocumentType, ClassificationResult
-from src.core.config import DOCUMENT_TYPES, MODEL_CONFIG, MODELS_DIR
+from src.core.config import DOCUMENT_CONFIG, DOCUMENT_TYPES, MODEL_CONFIG, MODELS_DIR
+from src.services.classifier_artifact import (
+    IncompatibleArtifactError, MANIFEST_NAME, load_classifier_artifact, save_classifier_artifact
+)
+from src.services.feature_extractor import BatchFeatureExtractor
+from src.services.keyword_automaton import KeywordAutomaton, fold_text
+from src.services.training_data import TrainingSource, iter_labelled_chunks
+
+
+@lru_cache(maxsize=1)
+def spanish_stop_words() -> Optional[List[str]]:
+    """Palabras vacías en español de spaCy (no requiere descargar modelos), o None"""
+    try:
+        from spacy.lang.es.stop_words import STOP_WORDS
+    except ImportError:
+        return None
+    return sorted(STOP_WORDS)
 
 
 class DocumentClassifier:
@@ -22,18 +40,36 @@ class DocumentClassifier:
     
     def __init__(self):
         self.model = None
-        self.model_path = MODELS_DIR / "document_classifier.pkl"
+        self.model_path = MODELS_DIR / "document_classifier.pkl"  # Formato anterior (pickle)
+        self.artifact_dir = MODELS_DIR / "document_classifier"
         self.patterns = self._create_document_patterns()
+        self.keyword_automaton = self._build_keyword_automaton()
+        
+        # Peso máximo alcanzable por tipo (todas sus palabras clave presentes)
+        self.pattern_max_weights = {
+            doc_type: sum(weights) for doc_type, weights in self.keyword_automaton.weights.items()
+        }
+        self.feature_extractor = BatchFeatureExtractor(self.keyword_automaton)
+        
+        # Métricas de la cascada patrones -> ML
+        self.cascade_stats = {'calls': 0, 'accepted': 0, 'escalations': 0}
+        self._stats_lock = threading.Lock()
         
     def _create_document_patterns(self) -> Dict[DocumentType, List[str]]:
-        """Crea patrones de texto para cada tipo de documento"""
+        """
+        Crea patrones de texto para cada tipo de documento
+        
+        Se buscan como subcadenas del texto normalizado con fold_text, así que
+        se escriben en minúsculas; las siglas cortas llevan un espacio final
+        para no coincidir dentro de otras palabras ("cc " no está en "acción").
+        """
         return {
             DocumentType.CEDULA: [
-                "cédula", "ciudadanía", "documento de identidad", "CC", "número de documento",
+                "cédula", "ciudadanía", "documento de identidad", "cc ", "número de documento",
                 "lugar de expedición", "fecha de nacimiento", "registraduría"
             ],
             DocumentType.PASAPORTE: [
-                "pasaporte", "passport", "república de colombia", "tipo P", "lugar de nacimiento",
+                "pasaporte", "passport", "república de colombia", "tipo p ", "lugar de nacimiento",
                 "nacionalidad", "fecha de expedición", "cancillería"
             ],
             DocumentType.RUT: [
@@ -62,45 +98,47 @@ class DocumentClassifier:
             ]
         }
     
+    def _build_keyword_automaton(self) -> KeywordAutomaton:
+        """Compila los patrones de todos los tipos en un único autómata"""
+        # Dar más peso a patrones más específicos; el autómata compara sin tildes
+        folded = {
+            doc_type: [fold_text(pattern) for pattern in patterns]
+            for doc_type, patterns in self.patterns.items()
+        }
+        return KeywordAutomaton(folded, weight=lambda pattern: len(pattern.split()) / 10 + 0.1)
+    
     def _extract_features(self, text: str) -> Dict[str, float]:
         """Extrae características del texto para clasificación"""
-        text_lower = text.lower()
-        features = {}
-        
-        # Características basadas en patrones
-        for doc_type, patterns in self.patterns.items():
-            pattern_score = 0
-            for pattern in patterns:
-                if pattern in text_lower:
-                    pattern_score += 1
-            features[f"pattern_{doc_type.value}"] = pattern_score / len(patterns)
-        
-        # Características de formato
-        features["has_numbers"] = len(re.findall(r'\d+', text)) / len(text.split())
-        features["has_dates"] = len(re.findall(r'\d{1,2}/\d{1,2}/\d{4}', text)) > 0
-        features["has_currency"] = len(re.findall(r'\$[\d,]+', text)) > 0
-        features["line_count"] = len(text.split('\n'))
-        features["word_count"] = len(text.split())
-        
-        return features
+        return self.feature_extractor.transform_one(text)
     
-    def classify_by_patterns(self, text: str) -> ClassificationResult:
-        """Clasifica documento usando patrones de texto"""
-        scores = {}
+    def extract_features_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Matriz de características N x F de un lote de textos
         
-        for doc_type, patterns in self.patterns.items():
-            score = 0
-            text_lower = text.lower()
-            
-            for pattern in patterns:
-                if pattern in text_lower:
-                    # Dar más peso a patrones más específicos
-                    weight = len(pattern.split()) / 10 + 0.1
-                    score += weight
-            
-            # Normalizar score
-            scores[doc_type] = score / len(patterns)
+        Las columnas siguen self.feature_extractor.feature_names.
+        """
+        return self.feature_extractor.transform(texts)
+    
+    def _pattern_scores(self, text_lower: str) -> Dict[DocumentType, float]:
+        """
+        Score de cada tipo de documento con un solo recorrido del texto
         
+        El peso encontrado se normaliza por el peso máximo del tipo, de modo
+        que el score va de 0 a 1 y se puede comparar con
+        DOCUMENT_CONFIG['classification_threshold'].
+        """
+        return {
+            doc_type: weight / self.pattern_max_weights[doc_type] if self.pattern_max_weights[doc_type] else 0.0
+            for doc_type, (_, weight) in self.keyword_automaton.scan(text_lower).items()
+        }
+    
+    def classify_by_patterns(self, text: str) -> ClassificationResult:
+        """Clasifica documento usando patrones de texto"""
+        text_lower = fold_text(text)
+        return self._classify_by_scores(self._pattern_scores(text_lower), text_lower)
+    
+    def _classify_by_scores(self, scores: Dict[DocumentType, float], text_lower: str) -> ClassificationResult:
+        """Resultado de la clasificación por patrones a partir de los scores por tipo"""
         # Encontrar el tipo con mayor score
         best_type = max(scores.keys(), key=lambda x: scores[x])
         confidence = scores[best_type]
@@ -108,7 +146,7 @@ class DocumentClassifier:
         # Aplicar umbral mínimo de confianza
         if confidence < 0.1:
             # Si no hay suficiente confianza, intentar clasificación por contenido general
-            if "banco" in text.lower() or "cuenta" in text.lower():
+            if "banco" in text_lower or "cuenta" in text_lower:
                 best_type = DocumentType.ESTADO_CUENTA
                 confidence = 0.5
             else:
@@ -121,8 +159,36 @@ class DocumentClassifier:
             reasoning=f"Clasificado por patrones. Scores: {scores}"
         )
     
-    def train_ml_model(self, training_data: List[Dict]) -> None:
-        """Entrena un modelo de ML para clasificación"""
+    @staticmethod
+    def _create_model(params: Optional[Dict[str, any]] = None) -> Pipeline:
+        """
+        Crea el pipeline TF-IDF + Naive Bayes
+        
+        Args:
+            params: Parámetros del pipeline a sobrescribir, con la notación de
+                scikit-learn (por ejemplo {'tfidf__max_features': 5000})
+        """
+        model = Pipeline([
+            ('tfidf', TfidfVectorizer(
+                max_features=1000,
+                stop_words=spanish_stop_words(),
+                ngram_range=(1, 2)
+            )),
+            ('classifier', MultinomialNB())
+        ])
+        if params:
+            model.set_params(**params)
+        return model
+    
+    def train_ml_model(self, training_data: List[Dict], params: Optional[Dict[str, any]] = None) -> None:
+        """
+        Entrena un modelo de ML para clasificación
+        
+        Args:
+            training_data: Lista de {'text', 'document_type'}
+            params: Parámetros del pipeline (por ejemplo, los elegidos por
+                src.services.model_search)
+        """
         try:
             if not training_data:
                 logger.warning("No hay datos de entrenamiento disponibles")
@@ -133,14 +199,7 @@ class DocumentClassifier:
             labels = [item['document_type'] for item in training_data]
             
             # Crear pipeline
-            self.model = Pipeline([
-                ('tfidf', TfidfVectorizer(
-                    max_features=1000,
-                    stop_words='english',
-                    ngram_range=(1, 2)
-                )),
-                ('classifier', MultinomialNB())
-            ])
+            self.model = self._create_model(params)
             
             # Dividir datos
             X_train, X_test, y_train, y_test = train_test_split(
@@ -156,18 +215,117 @@ class DocumentClassifier:
             logger.info(f"Reporte de clasificación:\n{report}")
             
             # Guardar modelo
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(self.model, f)
+            save_classifier_artifact(self.model, self.artifact_dir)
             
-            logger.info(f"Modelo entrenado y guardado en {self.model_path}")
+            logger.info(f"Modelo entrenado y guardado en {self.artifact_dir}")
             
         except Exception as e:
             logger.error(f"Error entrenando modelo: {e}")
     
+    def _create_incremental_model(self) -> Pipeline:
+        """Crea un pipeline sin vocabulario que se puede entrenar con partial_fit"""
+        return Pipeline([
+            ('hashing', HashingVectorizer(
+                n_features=MODEL_CONFIG['hashing_n_features'],
+                ngram_range=(1, 2),
+                alternate_sign=False,  # MultinomialNB requiere valores no negativos
+                norm='l2'
+            )),
+            # Con 2^18 columnas el suavizado por defecto (alpha=1) aplana las probabilidades
+            ('classifier', MultinomialNB(alpha=0.01))
+        ])
+    
+    def _is_incremental_model(self) -> bool:
+        """Indica si el modelo actual admite actualizaciones con partial_fit"""
+        return self.model is not None and isinstance(self.model.steps[0][1], HashingVectorizer)
+    
+    def train_incremental(self, source: TrainingSource, chunk_size: Optional[int] = None,
+                          save: bool = True) -> Dict[str, any]:
+        """
+        Entrena o actualiza el modelo por bloques con feature hashing y partial_fit
+        
+        El vectorizador por hashing no necesita vocabulario, de modo que cada
+        bloque se vectoriza y se incorpora al Naive Bayes sin volver a ver los
+        anteriores: la memoria depende del tamaño del bloque y no del corpus.
+        Si el modelo actual ya es incremental, los nuevos documentos lo
+        actualizan; si no, se parte de un modelo nuevo.
+        
+        Args:
+            source: Archivo .jsonl/.parquet o lista de {'text', 'document_type'}
+            chunk_size: Documentos por bloque (por defecto MODEL_CONFIG['training_chunk_size'])
+            save: Si guardar el artefacto al terminar
+        """
+        start_time = time.time()
+        chunk_size = chunk_size or MODEL_CONFIG['training_chunk_size']
+        
+        if not self._is_incremental_model():
+            if self.model is not None:
+                logger.warning("El modelo actual no admite partial_fit; se entrena uno incremental nuevo")
+            self.model = self._create_incremental_model()
+        
+        vectorizer = self.model.steps[0][1]
+        classifier = self.model.steps[-1][1]
+        
+        # Los arreglos cargados con mmap son de solo lectura
+        for attr in ('class_count_', 'feature_count_', 'class_log_prior_', 'feature_log_prob_'):
+            value = getattr(classifier, attr, None)
+            if isinstance(value, np.memmap):
+                setattr(classifier, attr, np.array(value))
+        
+        # Todas las clases desde el primer bloque, para admitir tipos nuevos en lotes posteriores
+        all_classes = [doc_type.value for doc_type in DocumentType]
+        known_types = set(all_classes)
+        documents = 0
+        skipped = 0
+        chunks = 0
+        
+        for texts, labels in iter_labelled_chunks(source, chunk_size):
+            valid = [(text, label) for text, label in zip(texts, labels) if label in known_types]
+            skipped += len(texts) - len(valid)
+            if not valid:
+                continue
+            
+            chunk_texts, chunk_labels = zip(*valid)
+            classifier.partial_fit(vectorizer.transform(chunk_texts), chunk_labels, classes=all_classes)
+            documents += len(chunk_labels)
+            chunks += 1
+        
+        if skipped:
+            logger.warning(f"{skipped} documentos con tipo desconocido omitidos en el entrenamiento")
+        
+        if documents and save:
+            save_classifier_artifact(self.model, self.artifact_dir)
+        
+        stats = {
+            'documents': documents,
+            'chunks': chunks,
+            'skipped': skipped,
+            'processing_time': time.time() - start_time
+        }
+        logger.info(
+            f"Entrenamiento incremental: {documents} documentos en {chunks} bloques "
+            f"({stats['processing_time']:.2f}s)"
+        )
+        return stats
+    
     def load_model(self) -> bool:
-        """Carga el modelo entrenado"""
+        """
+        Carga el modelo entrenado
+        
+        Prefiere el artefacto versionado (arreglos mapeados en memoria,
+        compartidos entre procesos) y recurre al pickle del formato anterior si
+        no existe. Un artefacto incompatible se rechaza aquí.
+        """
         try:
-            if self.model_path.exists():
+            if (self.artifact_dir / MANIFEST_NAME).exists():
+                start_time = time.time()
+                self.model = load_classifier_artifact(self.artifact_dir)
+                logger.info(
+                    f"Modelo de clasificación cargado desde {self.artifact_dir} "
+                    f"en {(time.time() - start_time) * 1000:.1f}ms"
+                )
+                return True
+            elif self.model_path.exists():
                 with open(self.model_path, 'rb') as f:
                     self.model = pickle.load(f)
                 logger.info("Modelo de clasificación cargado exitosamente")
@@ -175,6 +333,10 @@ class DocumentClassifier:
             else:
                 logger.warning("No se encontró modelo entrenado")
                 return False
+        except IncompatibleArtifactError as e:
+            logger.error(f"Artefacto de clasificación rechazado: {e}")
+            self.model = None
+            return False
         except Exception as e:
             logger.error(f"Error cargando modelo: {e}")
             return False
@@ -185,34 +347,112 @@ class DocumentClassifier:
             logger.warning("Modelo no disponible, usando clasificación por patrones")
             return self.classify_by_patterns(text)
         
+        return self._classify_batch_with_ml([text])[0]
+    
+    def _classify_batch_with_ml(self, texts: List[str]) -> List[ClassificationResult]:
+        """
+        Clasifica un lote con el modelo de ML en una sola pasada
+        
+        El lote se vectoriza una vez y la etiqueta de cada documento es la
+        clase de mayor probabilidad de la misma llamada a predict_proba.
+        """
         try:
             # Predecir
-            prediction = self.model.predict([text])[0]
-            probabilities = self.model.predict_proba([text])[0]
-            
-            # Obtener confianza
-            max_prob_idx = np.argmax(probabilities)
-            confidence = probabilities[max_prob_idx]
+            probabilities = self.model.predict_proba(texts)
+            classes = self.model.classes_
             
-            return ClassificationResult(
-                document_type=DocumentType(prediction),
-                confidence=confidence,
-                reasoning=f"Clasificado con modelo ML. Probabilidades: {dict(zip(self.model.classes_, probabilities))}"
-            )
+            results = []
+            for row in probabilities:
+                # Obtener confianza
+                max_prob_idx = np.argmax(row)
+                results.append(ClassificationResult(
+                    document_type=DocumentType(classes[max_prob_idx]),
+                    confidence=float(row[max_prob_idx]),
+                    reasoning=f"Clasificado con modelo ML. Probabilidades: {dict(zip(classes, row))}"
+                ))
+            return results
             
         except Exception as e:
             logger.error(f"Error en clasificación ML: {e}")
-            return self.classify_by_patterns(text)
+            return [self.classify_by_patterns(text) for text in texts]
+    
+    @staticmethod
+    def _is_decisive(scores: Dict[DocumentType, float]) -> bool:
+        """
+        Indica si los patrones bastan: el mejor tipo supera el umbral de
+        clasificación con ventaja suficiente sobre el segundo
+        """
+        best, second = (sorted(scores.values(), reverse=True) + [0.0, 0.0])[:2]
+        return (best >= DOCUMENT_CONFIG['classification_threshold']
+                and best - second >= DOCUMENT_CONFIG['cascade_min_margin'])
+    
+    def _classify_cascade(self, texts: List[str]) -> List[ClassificationResult]:
+        """
+        Clasifica con patrones y escala al modelo de ML solo los documentos ambiguos
+        
+        Los documentos escalados se clasifican juntos en un solo lote.
+        """
+        results: List[Optional[ClassificationResult]] = []
+        escalated = []
+        for i, text in enumerate(texts):
+            text_lower = fold_text(text)
+            scores = self._pattern_scores(text_lower)
+            if self._is_decisive(scores):
+                results.append(self._classify_by_scores(scores, text_lower))
+            else:
+                results.append(None)
+                escalated.append(i)
+        
+        if escalated:
+            ml_results = self._classify_batch_with_ml([texts[i] for i in escalated])
+            for i, result in zip(escalated, ml_results):
+                results[i] = result
+        
+        with self._stats_lock:
+            self.cascade_stats['calls'] += len(texts)
+            self.cascade_stats['accepted'] += len(texts) - len(escalated)
+            self.cascade_stats['escalations'] += len(escalated)
+        
+        return results
+    
+    def get_cascade_stats(self) -> Dict[str, any]:
+        """Retorna conteos y tasas de aceptación por patrones y de escalamiento a ML"""
+        with self._stats_lock:
+            stats = dict(self.cascade_stats)
+        
+        calls = stats['calls']
+        stats['acceptance_rate'] = stats['accepted'] / calls if calls else 0.0
+        stats['escalation_rate'] = stats['escalations'] / calls if calls else 0.0
+        return stats
+    
+    def classify_many(self, texts: List[str], use_ml: bool = True) -> List[ClassificationResult]:
+        """
+        Clasifica varios documentos, en el mismo orden en que se reciben
+        
+        Args:
+            texts: Textos extraídos de los documentos
+            use_ml: Si usar modelo de ML (si está disponible) o solo patrones
+        """
+        if not texts:
+            return []
+        
+        if use_ml and self.model:
+            if DOCUMENT_CONFIG['classification_cascade']:
+                return self._classify_cascade(list(texts))
+            return self._classify_batch_with_ml(list(texts))
+        else:
+            return [self.classify_by_patterns(text) for text in texts]
     
     def classify(self, text: str, use_ml: bool = True) -> ClassificationResult:
         """
         Clasifica un documento basado en su texto
         
+        Con modelo de ML disponible y DOCUMENT_CONFIG['classification_cascade'],
+        el resultado por patrones se acepta si es decisivo y solo los documentos
+        ambiguos pasan por el modelo (ver get_cascade_stats).
+        
         Args:
             text: Texto extraído del documento
             use_ml: Si usar modelo de ML (si está disponible) o solo patrones
         """
-        if use_ml and self.model:
-            return self.classify_with_ml(text)
-        else:
-            return self.classify_by_patterns(text)
+        return self.classify_many([text], use_ml)[0]
@@ -0,0 +1,283 @@
+"""
+Artefacto versionado y mapeable en memoria del clasificador (TF-IDF o hashing + Naive Bayes)
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Union
+
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+from src.models.schemas import DocumentType
+from src.utils import generate_file_hash
+
+ARTIFACT_FORMAT = "docn8n-document-classifier"
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# Parámetros que se guardan en el manifiesto para reconstruir cada paso
+VECTORIZER_PARAMS = {
+    "TfidfVectorizer": [
+        "lowercase", "strip_accents", "token_pattern", "analyzer", "stop_words",
+        "ngram_range", "max_df", "min_df", "max_features", "binary",
+        "norm", "use_idf", "smooth_idf", "sublinear_tf"
+    ],
+    # Sin vocabulario: las columnas salen de un hash, no hay arreglos que guardar
+    "HashingVectorizer": [
+        "lowercase", "strip_accents", "token_pattern", "analyzer", "stop_words",
+        "ngram_range", "n_features", "binary", "norm", "alternate_sign"
+    ]
+}
+VECTORIZER_TYPES = {"TfidfVectorizer": TfidfVectorizer, "HashingVectorizer": HashingVectorizer}
+CLASSIFIER_ARRAYS = ["classes", "class_count", "class_log_prior", "feature_count", "feature_log_prob"]
+CLASSIFIER_PARAMS = ["alpha", "force_alpha", "fit_prior", "class_prior"]
+
+
+class IncompatibleArtifactError(ValueError):
+    """El artefacto no es compatible con esta versión o está dañado"""
+
+
+def _to_json(value: Any) -> Any:
+    """Convierte tuplas y arreglos de NumPy a tipos serializables en JSON"""
+    if isinstance(value, (tuple, list)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def save_classifier_artifact(model: Pipeline, artifact_dir: Union[str, Path]) -> Path:
+    """
+    Guarda el pipeline como arreglos NumPy sueltos más un manifiesto
+    
+    El vocabulario, los IDF y los parámetros del Naive Bayes se escriben como
+    archivos .npy que se pueden abrir con mmap; el manifiesto registra la
+    versión del formato, los parámetros de cada paso y el SHA-256 de cada
+    archivo.
+    
+    Cada guardado escribe un directorio de versión nuevo junto a
+    `artifact_dir` y luego reemplaza de forma atómica el enlace simbólico
+    `artifact_dir` para que apunte a él (ver _publish_version): un lector
+    siempre encuentra la versión anterior o la nueva completa, y una
+    interrupción a mitad del guardado deja publicada la anterior.
+    """
+    if len(model.steps) != 2:
+        raise ValueError("El artefacto solo soporta pipelines de vectorizador + MultinomialNB")
+    (vectorizer_step, vectorizer), (classifier_step, classifier) = model.steps
+    vectorizer_type = type(vectorizer).__name__
+    if VECTORIZER_TYPES.get(vectorizer_type) is not type(vectorizer) or not isinstance(classifier, MultinomialNB):
+        raise ValueError(
+            "El artefacto solo soporta TfidfVectorizer o HashingVectorizer con MultinomialNB"
+        )
+    
+    vectorizer_params = vectorizer.get_params()
+    for name in ("tokenizer", "preprocessor", "vocabulary"):
+        if vectorizer_params.get(name) is not None:
+            raise ValueError(f"El parámetro '{name}' del vectorizador no se puede guardar en el artefacto")
+    
+    arrays = {}
+    if vectorizer_type == "TfidfVectorizer":
+        # Términos ordenados por su índice de columna
+        terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        arrays["vocabulary"] = np.array(terms, dtype=str)
+        arrays["idf"] = np.asarray(vectorizer.idf_, dtype=np.float64)
+    arrays.update({
+        "classes": np.asarray(classifier.classes_).astype(str),
+        "class_count": np.asarray(classifier.class_count_, dtype=np.float64),
+        "class_log_prior": np.asarray(classifier.class_log_prior_, dtype=np.float64),
+        "feature_count": np.asarray(classifier.feature_count_, dtype=np.float64),
+        "feature_log_prob": np.asarray(classifier.feature_log_prob_, dtype=np.float64)
+    })
+    
+    artifact_dir = Path(artifact_dir)
+    artifact_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{artifact_dir.name}-", dir=artifact_dir.parent))
+    
+    try:
+        files = {}
+        for name, array in arrays.items():
+            path = tmp_dir / f"{name}.npy"
+            np.save(path, array, allow_pickle=False)
+            files[name] = {
+                "file": path.name,
+                "sha256": generate_file_hash(str(path), algorithm='sha256'),
+                "shape": list(array.shape),
+                "dtype": array.dtype.str
+            }
+        
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "created_at": datetime.now().isoformat(),
+            "sklearn_version": sklearn.__version__,
+            "vectorizer": {
+                "type": vectorizer_type,
+                "step": vectorizer_step,
+                "params": {
+                    name: _to_json(vectorizer_params[name]) for name in VECTORIZER_PARAMS[vectorizer_type]
+                }
+            },
+            "classifier": {
+                "type": "MultinomialNB",
+                "step": classifier_step,
+                "params": {name: _to_json(classifier.get_params()[name]) for name in CLASSIFIER_PARAMS}
+            },
+            "arrays": files
+        }
+        with open(tmp_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        
+        # mkdtemp crea el directorio con modo 0700; el artefacto publicado debe
+        # ser legible por los workers aunque corran con otro usuario
+        os.chmod(tmp_dir, 0o755)
+        
+        _publish_version(tmp_dir, artifact_dir)
+    
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    
+    return artifact_dir
+
+
+def _publish_version(version_dir: Path, artifact_dir: Path) -> None:
+    """
+    Apunta el enlace `artifact_dir` a `version_dir` con un solo rename atómico
+    
+    Se conserva la versión que queda reemplazada (un lector puede estar
+    cargándola) y se borran las anteriores. Un `artifact_dir` que todavía es
+    un directorio real (formato previo a los enlaces) se aparta primero; solo
+    esa migración deja un instante sin artefacto publicado.
+    """
+    previous = None
+    if artifact_dir.is_symlink():
+        previous = artifact_dir.parent / os.readlink(artifact_dir)
+    elif artifact_dir.exists():
+        previous = artifact_dir.parent / f".{artifact_dir.name}-legacy-{os.getpid()}"
+        os.replace(artifact_dir, previous)
+    
+    link = artifact_dir.parent / f".{artifact_dir.name}-link-{os.getpid()}"
+    if link.is_symlink():
+        link.unlink()
+    os.symlink(version_dir.name, link)
+    os.replace(link, artifact_dir)
+    
+    keep = {version_dir.name, previous.name if previous else None}
+    for sibling in artifact_dir.parent.glob(f".{artifact_dir.name}-*"):
+        # Solo versiones completas: un guardado concurrente aún sin manifiesto no se toca
+        if sibling.name not in keep and sibling.is_dir() and (sibling / MANIFEST_NAME).exists():
+            shutil.rmtree(sibling, ignore_errors=True)
+
+
+def read_manifest(artifact_dir: Union[str, Path]) -> Dict[str, Any]:
+    """Lee y valida el manifiesto de un artefacto"""
+    path = Path(artifact_dir) / MANIFEST_NAME
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise IncompatibleArtifactError(f"Manifiesto ilegible en {path}: {e}")
+    
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise IncompatibleArtifactError(f"Formato de artefacto desconocido: {manifest.get('format')}")
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise IncompatibleArtifactError(
+            f"Versión de artefacto {manifest.get('format_version')} no soportada "
+            f"(se esperaba {ARTIFACT_FORMAT_VERSION})"
+        )
+    if (manifest.get("vectorizer", {}).get("type") not in VECTORIZER_TYPES
+            or manifest.get("classifier", {}).get("type") != "MultinomialNB"):
+        raise IncompatibleArtifactError("El artefacto no corresponde a un pipeline vectorizador + Naive Bayes")
+    
+    return manifest
+
+
+def load_classifier_artifact(artifact_dir: Union[str, Path], mmap: bool = True,
+                             verify_checksums: bool = True) -> Pipeline:
+    """
+    Reconstruye el pipeline a partir de un artefacto
+    
+    Con `mmap` los arreglos se abren en modo solo lectura sobre la caché de
+    páginas del sistema, de modo que varios procesos comparten una misma
+    copia; para seguir entrenando el modelo con partial_fit se debe cargar
+    con mmap=False. Cualquier incompatibilidad (versión, checksum, forma o clases
+    desconocidas) se reporta con IncompatibleArtifactError al cargar, no
+    durante una solicitud.
+    """
+    # Resolver el enlace una sola vez: si se publica una versión nueva durante
+    # la carga, todos los archivos se siguen leyendo de la misma versión
+    artifact_dir = Path(artifact_dir).resolve()
+    manifest = read_manifest(artifact_dir)
+    
+    vectorizer_type = manifest["vectorizer"]["type"]
+    array_names = CLASSIFIER_ARRAYS
+    if vectorizer_type == "TfidfVectorizer":
+        array_names = ["vocabulary", "idf"] + CLASSIFIER_ARRAYS
+    
+    arrays = {}
+    for name in array_names:
+        entry = manifest["arrays"].get(name)
+        if entry is None:
+            raise IncompatibleArtifactError(f"Falta el arreglo '{name}' en el artefacto")
+        
+        path = artifact_dir / entry["file"]
+        if not path.is_file():
+            raise IncompatibleArtifactError(f"Falta el archivo {path.name} del artefacto")
+        if verify_checksums and generate_file_hash(str(path), algorithm='sha256') != entry["sha256"]:
+            raise IncompatibleArtifactError(f"Checksum inválido para {path.name}")
+        
+        try:
+            array = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise IncompatibleArtifactError(f"No se pudo leer {path.name}: {e}")
+        
+        if list(array.shape) != entry["shape"] or array.dtype.str != entry["dtype"]:
+            raise IncompatibleArtifactError(f"Forma o tipo inesperado en {path.name}")
+        arrays[name] = array
+    
+    vectorizer_params = dict(manifest["vectorizer"]["params"])
+    vectorizer_params["ngram_range"] = tuple(vectorizer_params["ngram_range"])
+    if vectorizer_type == "TfidfVectorizer":
+        expected_features = len(arrays["vocabulary"])
+        idf_features = len(arrays["idf"])
+    else:
+        expected_features = idf_features = vectorizer_params["n_features"]
+    
+    n_classes, n_features = arrays["feature_log_prob"].shape
+    if (expected_features != n_features or idf_features != n_features
+            or arrays["feature_count"].shape != (n_classes, n_features)
+            or len(arrays["classes"]) != n_classes
+            or len(arrays["class_count"]) != n_classes
+            or len(arrays["class_log_prior"]) != n_classes):
+        raise IncompatibleArtifactError("Dimensiones inconsistentes entre los arreglos del artefacto")
+    
+    classes = arrays["classes"].tolist()
+    known_types = {doc_type.value for doc_type in DocumentType}
+    unknown = [label for label in classes if label not in known_types]
+    if unknown:
+        raise IncompatibleArtifactError(f"Clases desconocidas en el artefacto: {unknown}")
+    
+    vectorizer = VECTORIZER_TYPES[vectorizer_type](**vectorizer_params)
+    if vectorizer_type == "TfidfVectorizer":
+        vectorizer.vocabulary_ = {term: index for index, term in enumerate(arrays["vocabulary"].tolist())}
+        vectorizer.idf_ = arrays["idf"]
+    
+    classifier = MultinomialNB(**manifest["classifier"]["params"])
+    classifier.classes_ = np.array(classes)
+    classifier.class_count_ = arrays["class_count"]
+    classifier.class_log_prior_ = arrays["class_log_prior"]
+    classifier.feature_count_ = arrays["feature_count"]
+    classifier.feature_log_prob_ = arrays["feature_log_prob"]
+    classifier.n_features_in_ = n_features
+    
+    return Pipeline([
+        (manifest["vectorizer"].get("step", "tfidf"), vectorizer),
+        (manifest["classifier"].get("step", "classifier"), classifier)
+    ])
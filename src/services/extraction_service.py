@@ -2,13 +2,82 @@
 Servicio de extracción de datos de documentos usando NLP
 """
 import re
+import threading
 import spacy
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Sequence, Tuple
 from loguru import logger
 
 from src.models.schemas import DocumentType, ExtractionResult
-from src.core.config import EXTRACTION_FIELDS
+from src.core.config import DOCUMENT_CONFIG, EXTRACTION_FIELDS, MODEL_CONFIG
+from src.services.regex_engine import FieldRegexEngine, leading_group
+from src.services.transaction_parser import parse_transactions
+
+# Limpiezas y patrones auxiliares precompilados (se usan en cada extracción)
+NON_DIGIT_PATTERN = re.compile(r'[^\d]')
+NON_AMOUNT_PATTERN = re.compile(r'[^\d,.]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+DATE_PATTERNS = [
+    re.compile(r'\d{1,2}/\d{1,2}/\d{4}'),
+    re.compile(r'\d{1,2}-\d{1,2}-\d{4}'),
+    re.compile(r'\d{1,2}\s+de\s+\w+\s+de\s+\d{4}')
+]
+SPANISH_DATE_PATTERN = re.compile(r'(\d{1,2})\s+de\s+(\w+)\s+de\s+(\d{4})')
+
+# Únicas entidades que lee el extractor
+NLP_ENTITY_LABELS = ("PER", "ORG", "MONEY")
+
+# Campos que puede llenar la extracción NLP (ver _fields_from_entities)
+NLP_FIELDS = {"nombres", "empleado", "empresa", "saldo", "salario", "fecha_nacimiento"}
+
+# Campos que se leen del documento completo (ver parse_transactions)
+FULL_TEXT_FIELDS = {"movimientos"}
+
+
+def text_windows(text: str, window_chars: int, overlap_chars: int) -> List[Tuple[int, int]]:
+    """
+    Intervalos (inicio, fin) de ventanas solapadas que cubren el texto
+    
+    Cada ventana mide a lo sumo `window_chars` y empieza `overlap_chars`
+    antes del fin de la anterior. El corte se mueve al último espacio de la
+    zona de solapamiento para no partir palabras.
+    """
+    if len(text) <= window_chars:
+        return [(0, len(text))]
+    
+    overlap_chars = min(overlap_chars, window_chars // 2)
+    spans = []
+    start = 0
+    while True:
+        end = min(len(text), start + window_chars)
+        if end < len(text):
+            cut = max(text.rfind(' ', end - overlap_chars, end), text.rfind('\n', end - overlap_chars, end))
+            if cut > start:
+                end = cut
+        spans.append((start, end))
+        if end >= len(text):
+            return spans
+        start = max(start + 1, end - overlap_chars)
+
+
+def load_ner_pipeline(model_name: str):
+    """
+    Carga un modelo de spaCy dejando activo solo el reconocimiento de entidades
+    
+    Se deshabilitan tagger, parser, lematizador y demás componentes cuyas
+    salidas no se leen; se conserva el tok2vec compartido solo si el NER lo
+    escucha.
+    """
+    nlp = spacy.load(model_name)
+    keep = {"ner"}
+    for name, component in nlp.pipeline:
+        if "ner" in (getattr(component, "listening_components", None) or []):
+            keep.add(name)
+    
+    for name in list(nlp.pipe_names):
+        if name not in keep:
+            nlp.disable_pipe(name)
+    return nlp
 
 
 class DataExtractionService:
@@ -16,13 +85,39 @@ class DataExtractionService:
     
     def __init__(self):
         try:
-            # Cargar modelo de spaCy para español
-            self.nlp = spacy.load("es_core_news_sm")
+            # Cargar modelo de spaCy para español (solo NER)
+            self.nlp = load_ner_pipeline(MODEL_CONFIG['spacy_model'])
         except OSError:
             logger.warning("Modelo spaCy no encontrado. Usando extracción basada en regex")
             self.nlp = None
         
         self.patterns = self._create_extraction_patterns()
+        
+        # Un motor compilado por tipo de documento: un solo recorrido del texto
+        self.regex_engines = {
+            doc_type: FieldRegexEngine(doc_patterns)
+            for doc_type, doc_patterns in self.patterns.items()
+        }
+        
+        # Etiquetas de cada campo, para ubicar las ventanas donde buscar con NLP
+        self.label_patterns = {
+            doc_type: {
+                field: re.compile(leading_group(pattern), re.IGNORECASE | re.MULTILINE)
+                for field, pattern in doc_patterns.items()
+                if leading_group(pattern)
+            }
+            for doc_type, doc_patterns in self.patterns.items()
+        }
+        self.nlp_stats = {'calls': 0, 'skipped': 0, 'windowed': 0}
+        self._stats_lock = threading.Lock()
+        
+        # Etiquetas impresas que acompañan al valor dentro de una zona de plantilla
+        self.zone_label_pattern = re.compile(
+            r"^\s*(?:N[UÚ]MERO|NUIP|APELLIDOS?|NOMBRES?|FECHA\s+DE\s+NACIMIENTO|"
+            r"LUGAR\s+DE\s+EXPEDICI[OÓ]N|FECHA\s+Y\s+LUGAR\s+DE\s+EXPEDICI[OÓ]N|"
+            r"PASAPORTE\s+N[Ooº°]?\.?|SURNAMES?|GIVEN\s+NAMES?)\s*:?\s*",
+            re.IGNORECASE
+        )
     
     def _create_extraction_patterns(self) -> Dict[str, Dict[str, str]]:
         """Crea patrones regex para extracción de campos específicos"""
@@ -54,31 +149,96 @@ class DataExtractionService:
             }
         }
     
-    def extract_with_regex(self, text: str, document_type: DocumentType) -> Dict[str, Any]:
-        """Extrae datos usando expresiones regulares"""
+    def extract_with_regex(self, text: str, document_type: DocumentType,
+                           fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Extrae datos usando expresiones regulares (opcionalmente solo los campos indicados)"""
         extracted_data = {}
         confidence_scores = {}
         
-        # Obtener patrones para el tipo de documento
+        # Motor compilado para el tipo de documento
+        engine = self.regex_engines.get(document_type.value)
+        if engine is None:
+            return extracted_data, confidence_scores
+        
+        # Primera coincidencia de cada campo en un solo recorrido del texto
+        for field, value in engine.search_first(text, fields).items():
+            value = value.strip()
+            
+            # Limpiar y formatear el valor
+            if field in ["numero_documento", "numero_cuenta"]:
+                value = NON_DIGIT_PATTERN.sub('', value)
+            elif field in ["saldo", "salario", "monto", "ingresos"]:
+                value = NON_AMOUNT_PATTERN.sub('', value)
+            elif field in ["fecha_nacimiento", "fecha_corte", "fecha_ingreso"]:
+                value = self._normalize_date(value)
+            
+            extracted_data[field] = value
+            confidence_scores[field] = 0.8  # Confianza fija para regex
+        
+        return extracted_data, confidence_scores
+    
+    @staticmethod
+    def merge_regex_results(accumulated: Tuple[Dict[str, Any], Dict[str, float]],
+                            page_results: Tuple[Dict[str, Any], Dict[str, float]]) -> None:
+        """
+        Incorpora los campos de una página a los acumulados del documento
+        
+        Con páginas procesadas en orden conserva la primera coincidencia, igual
+        que extract_with_regex sobre el texto completo.
+        """
+        data, scores = accumulated
+        page_data, page_scores = page_results
+        for field, value in page_data.items():
+            if field not in data:
+                data[field] = value
+                scores[field] = page_scores[field]
+    
+    def _clean_zone_value(self, field: str, snippet: str) -> Optional[str]:
+        """Limpia el texto de una zona de plantilla que no trae etiqueta reconocible"""
+        value = self.zone_label_pattern.sub('', snippet.strip()).strip()
+        if not value:
+            return None
+        
+        if field in ["numero_documento", "numero_cuenta"]:
+            value = NON_DIGIT_PATTERN.sub('', value)
+            return value if len(value) >= 6 else None
+        elif field.startswith("fecha"):
+            return self._normalize_date(value) or value
+        elif field == "mrz":
+            return WHITESPACE_PATTERN.sub('', value).upper()
+        
+        return ' '.join(value.split()).upper()
+    
+    def extract_from_zones(self, zone_fields: Dict[str, Dict[str, Any]],
+                           document_type: DocumentType) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        Extrae datos de los fragmentos por campo del OCR por zonas
+        
+        Args:
+            zone_fields: Resultado 'fields' de OCRService.extract_zones
+            document_type: Tipo de documento
+        
+        Returns:
+            (datos extraídos, confianza por campo)
+        """
+        extracted_data = {}
+        confidence_scores = {}
         doc_patterns = self.patterns.get(document_type.value, {})
         
-        for field, pattern in doc_patterns.items():
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-            
-            if matches:
-                # Tomar la primera coincidencia
-                value = matches[0].strip()
-                
-                # Limpiar y formatear el valor
-                if field in ["numero_documento", "numero_cuenta"]:
-                    value = re.sub(r'[^\d]', '', value)
-                elif field in ["saldo", "salario", "monto", "ingresos"]:
-                    value = re.sub(r'[^\d,.]', '', value)
-                elif field in ["fecha_nacimiento", "fecha_corte", "fecha_ingreso"]:
-                    value = self._normalize_date(value)
-                
+        for field, zone in zone_fields.items():
+            snippet = zone.get('text', '')
+            if not snippet:
+                continue
+            
+            # Primero el patrón del campo sobre el fragmento; si no hay etiqueta, limpiar el valor
+            regex_data = {}
+            if field in doc_patterns:
+                regex_data, _ = self.extract_with_regex(snippet, document_type, fields=[field])
+            value = regex_data.get(field) or self._clean_zone_value(field, snippet)
+            
+            if value:
                 extracted_data[field] = value
-                confidence_scores[field] = 0.8  # Confianza fija para regex
+                confidence_scores[field] = min(0.9, zone.get('confidence', 0.0))
         
         return extracted_data, confidence_scores
     
@@ -87,29 +247,110 @@ class DataExtractionService:
         if not self.nlp:
             return {}, {}
         
+        return self.extract_with_nlp_batch([text], [document_type])[0]
+    
+    def extract_entities_batch(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                               n_process: Optional[int] = None) -> Iterable[List[Tuple[str, str]]]:
+        """
+        Entidades (etiqueta, texto) de muchos textos con nlp.pipe
+        
+        Solo se retornan las etiquetas de NLP_ENTITY_LABELS, en orden de
+        aparición y un resultado por texto, en el mismo orden de entrada.
+        
+        Args:
+            texts: Textos a procesar
+            batch_size: Textos por lote (por defecto MODEL_CONFIG['nlp_batch_size'])
+            n_process: Procesos de spaCy (por defecto MODEL_CONFIG['nlp_n_process'])
+        """
+        for spans in self.extract_entity_spans_batch(texts, batch_size, n_process):
+            yield [(label, entity_text) for label, entity_text, _, _ in spans]
+    
+    def extract_entity_spans_batch(self, texts: Sequence[str], batch_size: Optional[int] = None,
+                                   n_process: Optional[int] = None) -> Iterator[List[Tuple[str, str, int, int]]]:
+        """
+        Entidades (etiqueta, texto, inicio, fin) de muchos textos, por ventanas
+        
+        Los textos largos se dividen con text_windows y cada ventana es un Doc
+        independiente, de modo que la memoria depende del tamaño de ventana y
+        no del largo del documento. Las posiciones se traducen al texto
+        original; en el solapamiento entre dos ventanas cada una conserva solo
+        las entidades que empiezan en su mitad, así ninguna se repite.
+        """
+        if not self.nlp:
+            yield from ([] for _ in texts)
+            return
+        
+        window_chars = min(MODEL_CONFIG['nlp_chunk_chars'], self.nlp.max_length)
+        overlap_chars = MODEL_CONFIG['nlp_chunk_overlap_chars']
+        
+        def windows():
+            for index, text in enumerate(texts):
+                spans = text_windows(text, window_chars, overlap_chars)
+                for i, (start, end) in enumerate(spans):
+                    # Zona propia de la ventana: desde la mitad del solapamiento
+                    # con la anterior hasta la mitad del solapamiento con la siguiente
+                    own_start = (start + spans[i - 1][1]) // 2 if i else 0
+                    own_end = (spans[i + 1][0] + end) // 2 if i + 1 < len(spans) else len(text)
+                    yield text[start:end], (index, i + 1 == len(spans), start, own_start, own_end)
+        
+        docs = self.nlp.pipe(
+            windows(),
+            as_tuples=True,
+            batch_size=batch_size or MODEL_CONFIG['nlp_batch_size'],
+            n_process=n_process or MODEL_CONFIG['nlp_n_process']
+        )
+        entities = []
+        for doc, (_, is_last, offset, own_start, own_end) in docs:
+            for ent in doc.ents:
+                start = offset + ent.start_char
+                if ent.label_ in NLP_ENTITY_LABELS and own_start <= start < own_end:
+                    entities.append((ent.label_, ent.text, start, offset + ent.end_char))
+            
+            if is_last:
+                yield entities
+                entities = []
+    
+    def extract_with_nlp_batch(self, texts: Sequence[str], document_types: Sequence[DocumentType],
+                               batch_size: Optional[int] = None,
+                               n_process: Optional[int] = None) -> List[Tuple[Dict[str, Any], Dict[str, float]]]:
+        """
+        Extracción NLP de muchos documentos en lotes
+        
+        Returns:
+            Un par (datos, confianzas) por texto, igual que extract_with_nlp
+        """
+        if not self.nlp:
+            return [({}, {}) for _ in texts]
+        
+        entities = self.extract_entities_batch(texts, batch_size, n_process)
+        return [
+            self._fields_from_entities(text, document_type, text_entities)
+            for text, document_type, text_entities in zip(texts, document_types, entities)
+        ]
+    
+    def _fields_from_entities(self, text: str, document_type: DocumentType,
+                              entities: List[Tuple[str, str]]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Asigna las entidades y fechas de un texto a los campos del documento"""
         extracted_data = {}
         confidence_scores = {}
         
-        # Procesar texto con spaCy
-        doc = self.nlp(text)
-        
         # Extraer entidades nombradas
-        for ent in doc.ents:
-            if ent.label_ == "PER":  # Personas
+        for label, entity_text in entities:
+            if label == "PER":  # Personas
                 if "nombres" not in extracted_data:
-                    extracted_data["nombres"] = ent.text
+                    extracted_data["nombres"] = entity_text
                     confidence_scores["nombres"] = 0.7
                 elif "empleado" not in extracted_data:
-                    extracted_data["empleado"] = ent.text
+                    extracted_data["empleado"] = entity_text
                     confidence_scores["empleado"] = 0.7
                     
-            elif ent.label_ == "ORG":  # Organizaciones
+            elif label == "ORG":  # Organizaciones
                 if "empresa" not in extracted_data:
-                    extracted_data["empresa"] = ent.text
+                    extracted_data["empresa"] = entity_text
                     confidence_scores["empresa"] = 0.7
                     
-            elif ent.label_ == "MONEY":  # Cantidades monetarias
-                money_value = re.sub(r'[^\d,.]', '', ent.text)
+            elif label == "MONEY":  # Cantidades monetarias
+                money_value = NON_AMOUNT_PATTERN.sub('', entity_text)
                 if "saldo" not in extracted_data and document_type == DocumentType.ESTADO_CUENTA:
                     extracted_data["saldo"] = money_value
                     confidence_scores["saldo"] = 0.6
@@ -118,23 +359,100 @@ class DataExtractionService:
                     confidence_scores["salario"] = 0.6
         
         # Extraer fechas usando patrones
-        date_patterns = [
-            r'\d{1,2}/\d{1,2}/\d{4}',
-            r'\d{1,2}-\d{1,2}-\d{4}',
-            r'\d{1,2}\s+de\s+\w+\s+de\s+\d{4}'
-        ]
-        
-        for pattern in date_patterns:
-            dates = re.findall(pattern, text)
-            for date in dates:
-                normalized_date = self._normalize_date(date)
-                if normalized_date and "fecha_nacimiento" not in extracted_data:
+        for pattern in DATE_PATTERNS:
+            if "fecha_nacimiento" in extracted_data:
+                break
+            for match in pattern.finditer(text):
+                normalized_date = self._normalize_date(match.group())
+                if normalized_date:
                     extracted_data["fecha_nacimiento"] = normalized_date
                     confidence_scores["fecha_nacimiento"] = 0.6
                     break
         
         return extracted_data, confidence_scores
     
+    def plan_nlp_fields(self, document_type: DocumentType, filled: Dict[str, Any]) -> List[str]:
+        """Campos esperados del tipo de documento aún sin valor que el NLP puede llenar"""
+        return [
+            field for field in EXTRACTION_FIELDS.get(document_type.value, [])
+            if field not in filled and field in NLP_FIELDS
+        ]
+    
+    def _nlp_windows(self, text: str, document_type: DocumentType, fields: List[str]) -> Optional[str]:
+        """
+        Fragmentos del texto alrededor de las etiquetas de los campos indicados
+        
+        Retorna None (usar el texto completo) si algún campo no tiene etiqueta
+        conocida o su etiqueta no aparece en el texto.
+        """
+        radius = DOCUMENT_CONFIG['nlp_window_chars']
+        per_field = DOCUMENT_CONFIG['nlp_windows_per_field']
+        labels = self.label_patterns.get(document_type.value, {})
+        
+        spans = []
+        for field in fields:
+            label = labels.get(field)
+            if label is None:
+                return None
+            
+            field_spans = []
+            for match in label.finditer(text):
+                field_spans.append((max(0, match.start() - radius), min(len(text), match.end() + radius)))
+                if len(field_spans) >= per_field:
+                    break
+            if not field_spans:
+                return None
+            spans.extend(field_spans)
+        
+        # Unir ventanas solapadas conservando el orden del texto
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return '\n'.join(text[start:end] for start, end in merged)
+    
+    def _extract_missing_with_nlp(self, text: str, document_type: DocumentType,
+                                  filled: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        Ejecuta NLP solo si faltan campos que puede llenar
+        
+        Cuando faltan, spaCy procesa solo las ventanas alrededor de sus
+        etiquetas; si alguna etiqueta no aparece, el texto completo. Los
+        tipos sin campos esperados en EXTRACTION_FIELDS (contratos, RUT,
+        pasaportes, etc.) no tienen con qué planear y siempre usan NLP.
+        """
+        if not DOCUMENT_CONFIG['nlp_planner']:
+            return self.extract_with_nlp(text, document_type)
+        
+        if document_type.value not in EXTRACTION_FIELDS:
+            with self._stats_lock:
+                self.nlp_stats['calls'] += 1
+            return self.extract_with_nlp(text, document_type)
+        
+        missing = self.plan_nlp_fields(document_type, filled)
+        windows = self._nlp_windows(text, document_type, missing) if missing else None
+        
+        with self._stats_lock:
+            self.nlp_stats['calls'] += 1
+            self.nlp_stats['skipped'] += not missing
+            self.nlp_stats['windowed'] += windows is not None
+        
+        if not missing:
+            return {}, {}
+        return self.extract_with_nlp(text if windows is None else windows, document_type)
+    
+    def get_nlp_stats(self) -> Dict[str, Any]:
+        """Retorna conteos y tasas de extracciones sin NLP y con NLP por ventanas"""
+        with self._stats_lock:
+            stats = dict(self.nlp_stats)
+        
+        calls = stats['calls']
+        stats['skip_rate'] = stats['skipped'] / calls if calls else 0.0
+        stats['window_rate'] = stats['windowed'] / calls if calls else 0.0
+        return stats
+    
     def _normalize_date(self, date_str: str) -> Optional[str]:
         """Normaliza fechas a formato DD/MM/YYYY"""
         try:
@@ -156,8 +474,7 @@ class DataExtractionService:
             }
             
             # Patrón: "día de mes de año"
-            pattern = r'(\d{1,2})\s+de\s+(\w+)\s+de\s+(\d{4})'
-            match = re.search(pattern, date_str.lower())
+            match = SPANISH_DATE_PATTERN.search(date_str.lower())
             
             if match:
                 day, month_name, year = match.groups()
@@ -171,25 +488,55 @@ class DataExtractionService:
             logger.warning(f"Error normalizando fecha '{date_str}': {e}")
             return None
     
-    def extract_data(self, text: str, document_type: DocumentType, use_nlp: bool = True) -> ExtractionResult:
+    def extract_data(self, text: str, document_type: DocumentType, use_nlp: bool = True,
+                     zone_fields: Optional[Dict[str, Dict[str, Any]]] = None,
+                     regex_results: Optional[Tuple[Dict[str, Any], Dict[str, float]]] = None) -> ExtractionResult:
         """
         Extrae datos estructurados de un documento
         
         Args:
             text: Texto del documento
             document_type: Tipo de documento
-            use_nlp: Si usar NLP además de regex
+            use_nlp: Si usar NLP además de regex (solo se ejecuta si faltan
+                campos esperados que el NLP puede llenar)
+            zone_fields: Fragmentos por campo del OCR por zonas; los campos
+                resueltos aquí no se buscan en el texto completo
+            regex_results: Resultado de regex ya calculado (p. ej. página por
+                página con merge_regex_results); evita volver a recorrer el texto
         """
         try:
-            # Extracción con regex
-            regex_data, regex_scores = self.extract_with_regex(text, document_type)
+            # Extracción desde zonas de plantilla (fragmentos pequeños por campo)
+            zone_data, zone_scores = {}, {}
+            if zone_fields:
+                zone_data, zone_scores = self.extract_from_zones(zone_fields, document_type)
+            
+            # Extracción con regex, solo para los campos que no resolvieron las zonas
+            pending_fields = None
+            if zone_data:
+                pending_fields = [
+                    field for field in self.patterns.get(document_type.value, {})
+                    if field not in zone_data
+                ]
+            if regex_results is not None:
+                regex_data, regex_scores = dict(regex_results[0]), dict(regex_results[1])
+            else:
+                regex_data, regex_scores = self.extract_with_regex(text, document_type, fields=pending_fields)
+            regex_data.update(zone_data)
+            regex_scores.update(zone_scores)
+            
+            # Movimientos del estado de cuenta, resumidos por mes
+            if document_type == DocumentType.ESTADO_CUENTA and "movimientos" not in regex_data:
+                transactions = parse_transactions(text)
+                if len(transactions):
+                    regex_data["movimientos"] = transactions.summary()
+                    regex_scores["movimientos"] = 0.8
             
-            # Extracción con NLP (si está disponible)
+            # Extracción con NLP (si está disponible), solo para campos faltantes
             nlp_data, nlp_scores = {}, {}
             if use_nlp:
-                nlp_data, nlp_scores = self.extract_with_nlp(text, document_type)
+                nlp_data, nlp_scores = self._extract_missing_with_nlp(text, document_type, regex_data)
             
-            # Combinar resultados, priorizando regex
+            # Combinar resultados, priorizando zonas y regex
             combined_data = {**nlp_data, **regex_data}
             combined_scores = {**nlp_scores, **regex_scores}
             
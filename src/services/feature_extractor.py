@@ -0,0 +1,79 @@
+"""
+Extracción vectorizada de características de texto para lotes de documentos
+"""
+import re
+from typing import Dict, Hashable, List, Sequence
+
+import numpy as np
+
+from src.services.keyword_automaton import KeywordAutomaton, fold_text
+
+# Expresiones precompiladas de las características de formato
+NUMBER_PATTERN = re.compile(r'\d+')
+DATE_PATTERN = re.compile(r'\d{1,2}/\d{1,2}/\d{4}')
+CURRENCY_PATTERN = re.compile(r'\$[\d,]+')
+
+FORMAT_FEATURES = ["has_numbers", "has_dates", "has_currency", "line_count", "word_count"]
+
+
+class BatchFeatureExtractor:
+    """
+    Convierte N textos en una matriz de características N x F de NumPy
+    
+    Las columnas son la proporción de palabras clave encontradas de cada grupo
+    (`pattern_<grupo>`, con un único recorrido del autómata por texto) seguidas
+    de las características de formato. Cada texto se tokeniza una sola vez y
+    las divisiones se hacen por columnas, sin dividir por cero en textos vacíos.
+    """
+    
+    def __init__(self, keyword_automaton: KeywordAutomaton):
+        self.keyword_automaton = keyword_automaton
+        self.groups: List[Hashable] = list(keyword_automaton.group_sizes)
+        self.group_sizes = np.array(
+            [keyword_automaton.group_sizes[group] for group in self.groups], dtype=np.float64
+        )
+        self._group_index = {group: i for i, group in enumerate(self.groups)}
+        self.feature_names = [
+            f"pattern_{getattr(group, 'value', group)}" for group in self.groups
+        ] + FORMAT_FEATURES
+    
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        """Matriz de características (filas en el orden de `texts`)"""
+        n_texts = len(texts)
+        if not n_texts:
+            return np.zeros((0, len(self.feature_names)))
+        
+        n_groups = len(self.groups)
+        hits = np.zeros((n_texts, n_groups), dtype=np.float64)
+        numbers = np.zeros(n_texts, dtype=np.float64)
+        has_dates = np.zeros(n_texts, dtype=np.float64)
+        has_currency = np.zeros(n_texts, dtype=np.float64)
+        line_count = np.zeros(n_texts, dtype=np.float64)
+        word_count = np.zeros(n_texts, dtype=np.float64)
+        
+        # Columna de cada palabra clave única (una por cada grupo que la contiene)
+        owners = [
+            [self._group_index[group] for group, _ in keyword_owners]
+            for keyword_owners in self.keyword_automaton.owners
+        ]
+        for row, text in enumerate(texts):
+            for keyword_id in self.keyword_automaton.find(fold_text(text)):
+                for column in owners[keyword_id]:
+                    hits[row, column] += 1
+            
+            numbers[row] = len(NUMBER_PATTERN.findall(text))
+            has_dates[row] = DATE_PATTERN.search(text) is not None
+            has_currency[row] = CURRENCY_PATTERN.search(text) is not None
+            line_count[row] = text.count('\n') + 1
+            word_count[row] = len(text.split())
+        
+        number_ratio = np.divide(numbers, word_count, out=np.zeros(n_texts), where=word_count > 0)
+        pattern_ratio = np.divide(hits, self.group_sizes, out=np.zeros_like(hits), where=self.group_sizes > 0)
+        return np.column_stack([
+            pattern_ratio,
+            number_ratio, has_dates, has_currency, line_count, word_count
+        ])
+    
+    def transform_one(self, text: str) -> Dict[str, float]:
+        """Características de un solo texto como diccionario nombre -> valor"""
+        return dict(zip(self.feature_names, self.transform([text])[0].tolist()))
@@ -0,0 +1,160 @@
+"""
+Autómata de Aho-Corasick para buscar muchas palabras clave en un solo recorrido
+"""
+import unicodedata
+from collections import deque
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # Dependencia opcional (pyahocorasick); sin ella se usa el autómata en Python
+    ahocorasick = None
+
+
+def fold_text(text: str) -> str:
+    """
+    Minúsculas sin tildes, para comparar palabras clave con texto de OCR
+    
+    "Número de Expedición" y "NUMERO DE EXPEDICION" quedan iguales. Las
+    palabras clave y el texto se deben normalizar con la misma función.
+    """
+    text = text.lower()
+    if text.isascii():
+        return text
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+class KeywordAutomaton:
+    """
+    Busca las palabras clave de varios grupos con un único recorrido del texto
+    
+    El autómata se construye una vez a partir de las listas de palabras clave
+    de cada grupo (por ejemplo, los patrones de cada tipo de documento), de
+    modo que el costo de una búsqueda depende del largo del texto y no de la
+    cantidad de palabras clave. La coincidencia es por subcadena y sensible a
+    mayúsculas, igual que el operador `in`.
+    """
+    
+    def __init__(self, keyword_groups: Dict[Hashable, List[str]],
+                 weight: Optional[Callable[[str], float]] = None,
+                 native: Optional[bool] = None):
+        """
+        Args:
+            keyword_groups: Palabras clave por grupo, en el orden de puntuación
+            weight: Peso de cada palabra clave (por defecto 1.0)
+            native: Si usar pyahocorasick (por defecto, cuando está instalado)
+        """
+        if native and ahocorasick is None:
+            raise ImportError("native=True requiere el paquete pyahocorasick")
+        self.native = ahocorasick is not None if native is None else native
+        weight = weight or (lambda keyword: 1.0)
+        
+        self.group_sizes = {group: len(keywords) for group, keywords in keyword_groups.items()}
+        self.weights = {
+            group: [weight(keyword) for keyword in keywords]
+            for group, keywords in keyword_groups.items()
+        }
+        
+        # Cada palabra clave única se busca una sola vez aunque aparezca en
+        # varios grupos; owners[i] son los (grupo, posición) donde aparece
+        self.keywords: List[str] = []
+        self.owners: List[List[Tuple[Hashable, int]]] = []
+        keyword_ids: Dict[str, int] = {}
+        for group, keywords in keyword_groups.items():
+            for position, keyword in enumerate(keywords):
+                if keyword not in keyword_ids:
+                    keyword_ids[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self.owners.append([])
+                self.owners[keyword_ids[keyword]].append((group, position))
+        
+        # La cadena vacía está contenida en cualquier texto
+        self._always = {keyword_ids['']} if '' in keyword_ids else set()
+        
+        if self.native:
+            self._automaton = self._build_native()
+        else:
+            self._goto, self._fail, self._output = self._build()
+    
+    def _build_native(self):
+        """Construye el autómata con pyahocorasick (implementación en C)"""
+        automaton = ahocorasick.Automaton()
+        for keyword_id, keyword in enumerate(self.keywords):
+            if keyword:
+                automaton.add_word(keyword, keyword_id)
+        automaton.make_automaton()
+        return automaton
+    
+    def _build(self) -> Tuple[List[Dict[str, int]], List[int], List[List[int]]]:
+        """Construye las tablas de transición, fallo y salida del autómata"""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[int]] = [[]]
+        
+        for keyword_id, keyword in enumerate(self.keywords):
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    output.append([])
+                state = next_state
+            output[state].append(keyword_id)
+        
+        # Enlaces de fallo por niveles (BFS); cada estado hereda las salidas de su fallo
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                output[next_state] = output[next_state] + output[fail[next_state]]
+        
+        return goto, fail, output
+    
+    def find(self, text: str) -> Set[int]:
+        """Identificadores de las palabras clave contenidas en el texto"""
+        found = set(self._always)
+        
+        if self.native:
+            if len(self._automaton):
+                found.update(keyword_id for _, keyword_id in self._automaton.iter(text))
+            return found
+        
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+    
+    def scan(self, text: str) -> Dict[Hashable, Tuple[int, float]]:
+        """
+        Recorre el texto una vez y retorna (coincidencias, peso) por grupo
+        
+        Los pesos se suman en el orden de las listas originales para obtener
+        exactamente el mismo valor que un recorrido palabra por palabra.
+        """
+        positions: Dict[Hashable, List[int]] = {group: [] for group in self.group_sizes}
+        for keyword_id in self.find(text):
+            for group, position in self.owners[keyword_id]:
+                positions[group].append(position)
+        
+        results = {}
+        for group, group_positions in positions.items():
+            weights = self.weights[group]
+            total = 0
+            for position in sorted(group_positions):
+                total += weights[position]
+            results[group] = (len(group_positions), total)
+        return results
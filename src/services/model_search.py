@@ -0,0 +1,248 @@
+"""
+Búsqueda de hiperparámetros del clasificador con validación cruzada en paralelo
+
+Evalúa combinaciones del vectorizador TF-IDF y del Naive Bayes con
+validación cruzada estratificada en todos los núcleos, mide la latencia de
+inferencia por documento de cada combinación y reporta la frontera
+precisión-latencia para elegir un modelo que cumpla el presupuesto de p99.
+
+Uso:
+    python -m src.services.model_search --data corpus.jsonl [--folds 5] [--jobs -1]
+        [--p99-budget-ms 5] [--output frontera.json] [--save]
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from joblib import Memory
+from loguru import logger
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+from src.core.config import MODEL_CONFIG
+from src.services.classification_service import DocumentClassifier, spanish_stop_words
+from src.services.training_data import iter_labelled_chunks
+
+
+def default_param_grid() -> Dict[str, List[Any]]:
+    """Espacio de búsqueda por defecto del vectorizador y del clasificador"""
+    stop_words = [None]
+    if spanish_stop_words() is not None:
+        stop_words.append(spanish_stop_words())
+    
+    return {
+        'tfidf__ngram_range': [(1, 1), (1, 2)],
+        'tfidf__max_features': [1000, 5000, 20000],
+        'tfidf__stop_words': stop_words,
+        'tfidf__sublinear_tf': [False, True],
+        'classifier__alpha': [0.01, 0.1, 1.0]
+    }
+
+
+def _describe_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Versión legible y serializable de los parámetros (las palabras vacías se resumen)"""
+    described = {}
+    for name, value in params.items():
+        if name == 'tfidf__stop_words' and isinstance(value, list):
+            value = 'spanish'
+        elif isinstance(value, tuple):
+            value = list(value)
+        described[name] = value
+    return described
+
+
+def cross_validate_grid(texts: List[str], labels: List[str],
+                        param_grid: Optional[Dict[str, List[Any]]] = None,
+                        folds: int = 5, n_jobs: int = -1,
+                        memory: Optional[Memory] = None) -> List[Dict[str, Any]]:
+    """
+    Evalúa cada combinación de parámetros con validación cruzada estratificada
+    
+    Las combinaciones y los pliegues se reparten entre `n_jobs` procesos. Con
+    `memory`, el TF-IDF ajustado de cada pliegue y configuración del
+    vectorizador se guarda en disco, de modo que las combinaciones que solo
+    cambian el clasificador reutilizan la misma matriz de características.
+    """
+    min_class_count = min(Counter(labels).values())
+    if min_class_count < folds:
+        logger.warning(
+            f"La clase menos frecuente tiene {min_class_count} documentos; "
+            f"se usan {max(2, min_class_count)} pliegues en lugar de {folds}"
+        )
+        folds = max(2, min_class_count)
+    
+    model = DocumentClassifier._create_model()
+    model.set_params(memory=memory)
+    
+    search = GridSearchCV(
+        model,
+        param_grid or default_param_grid(),
+        cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=42),
+        scoring='accuracy',
+        n_jobs=n_jobs,
+        refit=False
+    )
+    search.fit(texts, labels)
+    
+    results = search.cv_results_
+    return [
+        {
+            'params': params,
+            'accuracy': float(results['mean_test_score'][i]),
+            'accuracy_std': float(results['std_test_score'][i]),
+            'fit_time': float(results['mean_fit_time'][i])
+        }
+        for i, params in enumerate(results['params'])
+    ]
+
+
+def measure_latency(texts: List[str], labels: List[str], params: Dict[str, Any],
+                    sample_size: int = 200, memory: Optional[Memory] = None) -> Dict[str, float]:
+    """
+    Ajusta una combinación con todos los datos y mide la latencia por documento
+    
+    Cada documento de la muestra se clasifica por separado con predict_proba,
+    como en el agente, y se reportan los percentiles 50 y 99 en milisegundos.
+    """
+    model = DocumentClassifier._create_model(params)
+    model.set_params(memory=memory)
+    model.fit(texts, labels)
+    
+    sample = texts[:sample_size]
+    model.predict_proba(sample[:1])  # Calentamiento
+    latencies = []
+    for text in sample:
+        start_time = time.perf_counter()
+        model.predict_proba([text])
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99))
+    }
+
+
+def pareto_frontier(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Combinaciones no dominadas en precisión y latencia p99, de menor a mayor latencia
+    
+    Una combinación queda fuera si otra es al menos igual de precisa y
+    rápida, y estrictamente mejor en alguno de los dos ejes.
+    """
+    frontier = []
+    best_accuracy = -1.0
+    for candidate in sorted(candidates, key=lambda c: (c['p99_ms'], -c['accuracy'])):
+        if candidate['accuracy'] > best_accuracy:
+            frontier.append(candidate)
+            best_accuracy = candidate['accuracy']
+    return frontier
+
+
+def select_model(frontier: List[Dict[str, Any]], p99_budget_ms: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """La combinación más precisa de la frontera que cumple el presupuesto de p99"""
+    eligible = [
+        candidate for candidate in frontier
+        if p99_budget_ms is None or candidate['p99_ms'] <= p99_budget_ms
+    ]
+    return max(eligible, key=lambda c: c['accuracy']) if eligible else None
+
+
+def search_classifier(texts: List[str], labels: List[str],
+                      param_grid: Optional[Dict[str, List[Any]]] = None,
+                      folds: int = 5, n_jobs: int = -1,
+                      p99_budget_ms: Optional[float] = None,
+                      latency_sample: int = 200) -> Dict[str, Any]:
+    """
+    Ejecuta la búsqueda completa y retorna candidatos, frontera y selección
+    
+    Returns:
+        Diccionario con 'candidates' (todas las combinaciones con precisión y
+        latencia), 'frontier' (frontera de Pareto) y 'best' (la más precisa
+        dentro del presupuesto, o None si ninguna lo cumple)
+    """
+    start_time = time.time()
+    cache_dir = tempfile.mkdtemp(prefix='model_search_')
+    memory = Memory(cache_dir, verbose=0)
+    
+    try:
+        candidates = cross_validate_grid(texts, labels, param_grid, folds, n_jobs, memory)
+        logger.info(f"Validación cruzada de {len(candidates)} combinaciones en {time.time() - start_time:.1f}s")
+        
+        # La latencia se mide de forma secuencial para no medir contención entre procesos
+        for candidate in candidates:
+            candidate.update(measure_latency(texts, labels, candidate['params'], latency_sample, memory))
+    
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    
+    frontier = pareto_frontier(candidates)
+    best = select_model(frontier, p99_budget_ms)
+    if best is None:
+        logger.warning(f"Ninguna combinación cumple el presupuesto de p99 de {p99_budget_ms}ms")
+    
+    return {
+        'candidates': candidates,
+        'frontier': frontier,
+        'best': best,
+        'processing_time': time.time() - start_time
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help="Corpus etiquetado (.jsonl o .parquet)")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help="Procesos en paralelo (-1: todos los núcleos)")
+    parser.add_argument('--p99-budget-ms', type=float, default=None)
+    parser.add_argument('--latency-sample', type=int, default=200)
+    parser.add_argument('--output', help="Archivo JSON para la frontera y la selección")
+    parser.add_argument('--save', action='store_true', help="Entrenar y guardar el modelo seleccionado")
+    args = parser.parse_args()
+    
+    texts, labels = [], []
+    for chunk_texts, chunk_labels in iter_labelled_chunks(args.data, MODEL_CONFIG['training_chunk_size']):
+        texts.extend(chunk_texts)
+        labels.extend(chunk_labels)
+    
+    result = search_classifier(
+        texts, labels, folds=args.folds, n_jobs=args.jobs,
+        p99_budget_ms=args.p99_budget_ms, latency_sample=args.latency_sample
+    )
+    
+    print(f"{'precisión':>10} {'p50 ms':>8} {'p99 ms':>8}  parámetros")
+    for candidate in result['frontier']:
+        print(
+            f"{candidate['accuracy']:>10.4f} {candidate['p50_ms']:>8.3f} {candidate['p99_ms']:>8.3f}  "
+            f"{_describe_params(candidate['params'])}"
+        )
+    
+    best = result['best']
+    if best is not None:
+        print(f"\nSeleccionado: {_describe_params(best['params'])}")
+    
+    if args.output:
+        report = {
+            key: [
+                {**candidate, 'params': _describe_params(candidate['params'])}
+                for candidate in result[key]
+            ]
+            for key in ('candidates', 'frontier')
+        }
+        report['best'] = {**best, 'params': _describe_params(best['params'])} if best else None
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    if args.save and best is not None:
+        classifier = DocumentClassifier()
+        classifier.train_ml_model(
+            [{'text': text, 'document_type': label} for text, label in zip(texts, labels)],
+            params=best['params']
+        )
+
+
+if __name__ == '__main__':
+    main()
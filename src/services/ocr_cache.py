@@ -0,0 +1,160 @@
+"""
+Caché persistente de resultados de OCR direccionada por contenido
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+from loguru import logger
+
+from src.core.config import OCR_CONFIG
+from src.utils import generate_file_hash
+
+
+class OCRCache:
+    """
+    Caché en disco (SQLite) de resultados de OCR con desalojo LRU
+    
+    Las claves se derivan del hash del contenido del archivo, el motor de OCR,
+    la configuración de Tesseract y el número de página, de modo que un mismo
+    documento subido varias veces reutiliza el resultado sin repetir el OCR.
+    """
+    
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None,
+                 max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir or OCR_CONFIG['cache_dir'])
+        self.max_bytes = max_bytes or OCR_CONFIG['cache_max_bytes']
+        self.db_path = self.cache_dir / 'ocr_cache.sqlite3'
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Abre la conexión de forma perezosa (una por proceso, segura tras fork)"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS ocr_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'size INTEGER NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_ocr_cache_access ON ocr_cache(last_access)'
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+    
+    @staticmethod
+    def make_key(file_hash: str, engine: str, config: str, page: Optional[Union[int, str]] = None) -> str:
+        """Construye la clave de caché a partir de sus componentes"""
+        raw = '|'.join([file_hash, engine, config, str(page)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def key_for_file(self, file_path: str, engine: str, config: str,
+                     page: Optional[Union[int, str]] = None) -> Optional[str]:
+        """Clave de caché para un archivo; None si el archivo no se puede leer"""
+        try:
+            file_hash = generate_file_hash(file_path, algorithm='sha256')
+        except OSError:
+            return None
+        return self.make_key(file_hash, engine, config, page)
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtiene un resultado de la caché y actualiza su último acceso"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute('SELECT value FROM ocr_cache WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                
+                conn.execute('UPDATE ocr_cache SET last_access = ? WHERE key = ?', (time.time(), key))
+                conn.commit()
+                self.hits += 1
+            
+            result = json.loads(row[0])
+            result['from_cache'] = True
+            return result
+        
+        except sqlite3.Error as e:
+            logger.warning(f"Error leyendo caché de OCR: {e}")
+            return None
+    
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Guarda un resultado en la caché y desaloja entradas antiguas si es necesario"""
+        try:
+            # Los resultados de EasyOCR incluyen tipos de NumPy en las cajas
+            value = json.dumps(
+                result, ensure_ascii=False,
+                default=lambda o: o.tolist() if hasattr(o, 'tolist') else str(o)
+            )
+            size = len(value.encode('utf-8'))
+            if size > self.max_bytes:
+                return
+            
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO ocr_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+                    (key, value, size, time.time())
+                )
+                self._evict(conn)
+                conn.commit()
+        
+        except sqlite3.Error as e:
+            logger.warning(f"Error escribiendo caché de OCR: {e}")
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Elimina las entradas menos usadas recientemente hasta respetar max_bytes"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        
+        rows = conn.execute('SELECT key, size FROM ocr_cache ORDER BY last_access ASC').fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        
+        conn.executemany('DELETE FROM ocr_cache WHERE key = ?', evicted)
+        self.evictions += len(evicted)
+    
+    def clear(self) -> None:
+        """Vacía la caché"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM ocr_cache')
+            conn.commit()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna contadores de aciertos, fallos y ocupación de la caché"""
+        with self._lock:
+            conn = self._connection()
+            entries, size = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_cache'
+            ).fetchone()
+        
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_bytes': size,
+            'max_bytes': self.max_bytes
+        }
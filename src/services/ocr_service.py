@@ -1,34 +1,166 @@
 """
 Servicio de OCR para extracción de texto de documentos
 """
+import gc
+import math
+import threading
+import time
 import cv2
 import numpy as np
 import pytesseract
-import easyocr
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from PIL import Image
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from loguru import logger
 
-from src.core.config import DOCUMENT_CONFIG
+from src.core.config import DOCUMENT_CONFIG, EXTRACTION_FIELDS, OCR_CONFIG
+from src.models.schemas import DocumentType
+from src.services import tesseract_pool
+from src.services.ocr_cache import OCRCache
+from src.services.zone_templates import get_zone_template
+from src.utils import generate_file_hash
+from src.utils.memory import PeakRSSMonitor, current_rss_bytes
+
+
+# Imagen de entrada: ruta a archivo, imagen PIL o arreglo NumPy (BGR o escala de grises)
+ImageInput = Union[str, Image.Image, np.ndarray]
+
+# Instancia de OCRService de cada proceso del pool multipágina
+_worker_service = None
+
+# Modelos cargados en el proceso, compartidos por todas las instancias de
+# OCRService. Si se cargan antes de un fork, los procesos hijos los heredan
+# copy-on-write en lugar de volver a cargarlos.
+_shared_models: Dict[str, any] = {}
+_models_lock = threading.Lock()
+
+
+def get_easyocr_reader(languages: Tuple[str, ...] = ('es', 'en')):
+    """Retorna el lector de EasyOCR del proceso, cargándolo en el primer uso"""
+    key = f"easyocr:{','.join(languages)}"
+    reader = _shared_models.get(key)
+    if reader is None:
+        with _models_lock:
+            reader = _shared_models.get(key)
+            if reader is None:
+                # Importar aquí evita cargar torch en despliegues solo con Tesseract
+                import easyocr
+                
+                start_time = time.time()
+                reader = easyocr.Reader(list(languages))
+                _shared_models[key] = reader
+                logger.info(f"Modelo EasyOCR {languages} cargado en {time.time() - start_time:.2f}s")
+    return reader
+
+
+def _ocr_pdf_chunk(pdf_path: str, first_page: int, last_page: int,
+                   method: str, dpi: int) -> List[Dict[str, any]]:
+    """Procesa un bloque de páginas de un PDF dentro de un proceso del pool"""
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = OCRService()
+    return _worker_service._ocr_page_range(pdf_path, first_page, last_page, method, dpi)
 
 
 class OCRService:
     """Servicio de reconocimiento óptico de caracteres"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[OCRCache] = None, use_cache: bool = True):
         self.tesseract_config = '--oem 3 --psm 6 -l spa'
-        self.easyocr_reader = easyocr.Reader(['es', 'en'])
+        self.easyocr_languages = ('es', 'en')
+        self._easyocr_reader = None
         
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+        # Caché persistente de resultados por contenido del archivo; `cache=None`
+        # usa la de OCR_CONFIG y `use_cache=False` desactiva la caché (benchmarks)
+        if not use_cache:
+            cache = None
+        elif cache is None and OCR_CONFIG['cache_enabled']:
+            cache = OCRCache()
+        self.cache = cache
+        
+        # Pool para ejecutar ambos motores en paralelo (modo 'concurrent')
+        self._engine_executor = None
+        
+        # Pool para el OCR paralelo de zonas de plantilla
+        self._zone_executor = None
+        
+        # Estadísticas de qué motor resuelve cada imagen en 'cascade'/'concurrent'
+        self._stats_lock = threading.Lock()
+        self.engine_stats = {'calls': 0, 'tesseract': 0, 'easyocr': 0, 'escalations': 0}
+    
+    @property
+    def easyocr_reader(self):
+        """Lector de EasyOCR, cargado de forma perezosa en el primer uso"""
+        if self._easyocr_reader is None:
+            self._easyocr_reader = get_easyocr_reader(self.easyocr_languages)
+        return self._easyocr_reader
+    
+    @easyocr_reader.setter
+    def easyocr_reader(self, reader) -> None:
+        self._easyocr_reader = reader
+    
+    def warm_up(self, engines: Optional[List[str]] = None, freeze: bool = False) -> Dict[str, float]:
+        """
+        Carga por adelantado los motores de OCR (p. ej. al iniciar un servidor)
+        
+        Args:
+            engines: Motores a cargar (por defecto OCR_CONFIG['warmup_engines'])
+            freeze: Si congelar el heap con gc.freeze() para que los procesos
+                hijos creados por fork compartan los modelos sin copiarlos
+        
+        Returns:
+            Tiempo de carga en segundos por motor
+        """
+        engines = engines if engines is not None else OCR_CONFIG['warmup_engines']
+        timings = {}
+        
+        for engine in engines:
+            start_time = time.time()
+            if engine == 'tesseract':
+                if tesseract_pool.use_handle_pool():
+                    # Carga los datos de entrenamiento en un handle persistente
+                    lang, oem, _ = tesseract_pool.parse_tesseract_config(self.tesseract_config)
+                    tesseract_pool.get_tesseract_pool(lang, oem).warm_up()
+                else:
+                    # Verifica que el binario esté disponible
+                    pytesseract.get_tesseract_version()
+            elif engine == 'easyocr':
+                _ = self.easyocr_reader
+            else:
+                raise ValueError(f"Motor no soportado: {engine}")
+            timings[engine] = time.time() - start_time
+        
+        if freeze:
+            gc.collect()
+            gc.freeze()
+        
+        logger.info(f"Motores de OCR precargados: {timings}")
+        return timings
+        
+    @staticmethod
+    def _load_image(image: ImageInput) -> np.ndarray:
+        """Convierte la entrada en un arreglo NumPy BGR (o escala de grises) sin archivos intermedios"""
+        if isinstance(image, np.ndarray):
+            return image
+        
+        if isinstance(image, Image.Image):
+            if image.mode == 'L':
+                return np.asarray(image)
+            return cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+        
+        loaded = cv2.imread(image)
+        if loaded is None:
+            raise ValueError(f"No se pudo cargar la imagen: {image}")
+        return loaded
+    
+    def preprocess_image(self, image: ImageInput) -> np.ndarray:
         """Preprocesa la imagen para mejorar la calidad del OCR"""
         try:
             # Cargar imagen
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"No se pudo cargar la imagen: {image_path}")
+            image = self._load_image(image)
             
             # Convertir a escala de grises
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
             # Aplicar filtro de ruido
             denoised = cv2.medianBlur(gray, 3)
@@ -49,27 +181,17 @@ class OCRService:
             logger.error(f"Error en preprocesamiento de imagen: {e}")
             raise
     
-    def extract_with_tesseract(self, image_path: str) -> Dict[str, any]:
+    def extract_with_tesseract(self, image: ImageInput, config: Optional[str] = None) -> Dict[str, any]:
         """Extrae texto usando Tesseract OCR"""
+        config = config or self.tesseract_config
         try:
             # Preprocesar imagen
-            processed_image = self.preprocess_image(image_path)
+            processed_image = self.preprocess_image(image)
             
-            # Extraer texto
-            text = pytesseract.image_to_string(
-                processed_image, 
-                config=self.tesseract_config
-            )
-            
-            # Obtener datos detallados
-            data = pytesseract.image_to_data(
-                processed_image, 
-                config=self.tesseract_config,
-                output_type=pytesseract.Output.DICT
-            )
+            # Texto y confianzas por palabra en un único pase de reconocimiento
+            text, confidences = tesseract_pool.recognize(processed_image, config)
             
             # Calcular confianza promedio
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
             avg_confidence = sum(confidences) / len(confidences) if confidences else 0
             
             return {
@@ -89,94 +211,931 @@ class OCRService:
                 'error': str(e)
             }
     
-    def extract_with_easyocr(self, image_path: str) -> Dict[str, any]:
+    def extract_with_easyocr(self, image: ImageInput) -> Dict[str, any]:
         """Extrae texto usando EasyOCR"""
         try:
+            # EasyOCR acepta rutas y arreglos NumPy; las imágenes PIL se convierten en memoria
+            if isinstance(image, Image.Image):
+                image = self._load_image(image)
+            
             # Extraer texto
-            results = self.easyocr_reader.readtext(image_path)
+            results = self.easyocr_reader.readtext(image)
             
-            # Combinar texto y calcular confianza
-            text_parts = []
-            confidences = []
+            return self._build_easyocr_result(results)
             
-            for (bbox, text, confidence) in results:
-                text_parts.append(text)
-                confidences.append(confidence)
+        except Exception as e:
+            logger.error(f"Error en OCR con EasyOCR: {e}")
+            return self._easyocr_error(e)
+    
+    @staticmethod
+    def _build_easyocr_result(results: List) -> Dict[str, any]:
+        """Combina las detecciones de EasyOCR en un resultado con texto y confianza"""
+        text_parts = []
+        confidences = []
+        
+        for (bbox, text, confidence) in results:
+            text_parts.append(text)
+            confidences.append(confidence)
+        
+        full_text = ' '.join(text_parts)
+        avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+        
+        return {
+            'text': full_text.strip(),
+            'confidence': avg_confidence,
+            'word_count': len(full_text.split()),
+            'method': 'easyocr',
+            'bounding_boxes': results
+        }
+    
+    @staticmethod
+    def _easyocr_error(error: Exception) -> Dict[str, any]:
+        """Resultado vacío de EasyOCR con el error ocurrido"""
+        return {
+            'text': '',
+            'confidence': 0.0,
+            'word_count': 0,
+            'method': 'easyocr',
+            'error': str(error)
+        }
+    
+    def extract_batch(self, images: List[ImageInput], batch_size: Optional[int] = None) -> List[Dict[str, any]]:
+        """
+        Extrae texto de muchas imágenes o páginas con la inferencia por lotes de EasyOCR
+        
+        Las imágenes se agrupan por tamaño en cubetas de OCR_CONFIG['easyocr_bucket_px']
+        y se rellenan con blanco hasta el tamaño de su cubeta (sin reescalar, para
+        conservar la escala del texto y las coordenadas de las cajas). Cada cubeta
+        se procesa en lotes de `batch_size` imágenes.
+        
+        Args:
+            images: Rutas, imágenes PIL o arreglos NumPy
+            batch_size: Imágenes por lote (por defecto OCR_CONFIG['easyocr_batch_size'])
+        
+        Returns:
+            Un resultado por imagen, en el mismo orden de entrada
+        """
+        batch_size = batch_size or OCR_CONFIG['easyocr_batch_size']
+        step = OCR_CONFIG['easyocr_bucket_px']
+        results: List[Optional[Dict[str, any]]] = [None] * len(images)
+        
+        # Agrupar por tamaño redondeado hacia arriba
+        buckets: Dict[Tuple[int, int], List[Tuple[int, np.ndarray]]] = {}
+        for index, image in enumerate(images):
+            try:
+                array = self._load_image(image)
+            except Exception as e:
+                logger.error(f"Error cargando imagen {index} del lote: {e}")
+                results[index] = self._easyocr_error(e)
+                continue
             
-            full_text = ' '.join(text_parts)
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+            if array.ndim == 2:
+                array = cv2.cvtColor(array, cv2.COLOR_GRAY2BGR)
+            elif array.shape[2] == 4:
+                array = cv2.cvtColor(array, cv2.COLOR_BGRA2BGR)
             
-            return {
-                'text': full_text.strip(),
-                'confidence': avg_confidence,
-                'word_count': len(full_text.split()),
-                'method': 'easyocr',
-                'bounding_boxes': results
-            }
+            height, width = array.shape[:2]
+            bucket = (math.ceil(width / step) * step, math.ceil(height / step) * step)
+            buckets.setdefault(bucket, []).append((index, array))
+        
+        for (bucket_width, bucket_height), items in buckets.items():
+            for start in range(0, len(items), batch_size):
+                chunk = items[start:start + batch_size]
+                padded = [
+                    cv2.copyMakeBorder(
+                        array, 0, bucket_height - array.shape[0], 0, bucket_width - array.shape[1],
+                        cv2.BORDER_CONSTANT, value=(255, 255, 255)
+                    )
+                    for _, array in chunk
+                ]
+                
+                try:
+                    batch_results = self.easyocr_reader.readtext_batched(padded, batch_size=batch_size)
+                except Exception as e:
+                    logger.error(f"Error en lote de EasyOCR ({bucket_width}x{bucket_height}): {e}")
+                    for index, _ in chunk:
+                        results[index] = self._easyocr_error(e)
+                    continue
+                
+                for (index, _), detections in zip(chunk, batch_results):
+                    results[index] = self._build_easyocr_result(detections)
+        
+        logger.info(f"Lote de {len(images)} imágenes procesado en {len(buckets)} cubeta(s) de tamaño")
+        return results
+    
+    def _is_good_enough(self, result: Dict[str, any]) -> bool:
+        """Indica si un resultado supera el umbral de aceptación de la cascada"""
+        return (
+            'error' not in result
+            and result['confidence'] >= OCR_CONFIG['cascade_min_confidence']
+            and result['word_count'] >= OCR_CONFIG['cascade_min_words']
+        )
+    
+    @staticmethod
+    def _select_best(tesseract_result: Dict[str, any], easyocr_result: Dict[str, any]) -> Dict[str, any]:
+        """Elige el mejor resultado entre Tesseract y EasyOCR"""
+        # Elegir basado en confianza y cantidad de texto
+        if tesseract_result['confidence'] > easyocr_result['confidence']:
+            if tesseract_result['word_count'] >= easyocr_result['word_count'] * 0.8:
+                return tesseract_result
+        
+        return easyocr_result if easyocr_result['word_count'] > 0 else tesseract_result
+    
+    def _record_engine_hit(self, result: Dict[str, any], escalated: bool) -> None:
+        """Registra qué motor resolvió la imagen"""
+        with self._stats_lock:
+            self.engine_stats['calls'] += 1
+            self.engine_stats[result['method']] += 1
+            if escalated:
+                self.engine_stats['escalations'] += 1
+    
+    def get_engine_stats(self) -> Dict[str, any]:
+        """Retorna conteos y tasas de acierto por motor para ajustar los umbrales"""
+        with self._stats_lock:
+            stats = dict(self.engine_stats)
+        
+        calls = stats['calls']
+        stats['tesseract_hit_rate'] = stats['tesseract'] / calls if calls else 0.0
+        stats['easyocr_hit_rate'] = stats['easyocr'] / calls if calls else 0.0
+        stats['escalation_rate'] = stats['escalations'] / calls if calls else 0.0
+        return stats
+    
+    def _extract_cascade(self, image: ImageInput) -> Dict[str, any]:
+        """Tesseract primero; EasyOCR solo si Tesseract no supera el umbral"""
+        tesseract_result = self.extract_with_tesseract(image)
+        if self._is_good_enough(tesseract_result):
+            self._record_engine_hit(tesseract_result, escalated=False)
+            return tesseract_result
+        
+        easyocr_result = self.extract_with_easyocr(image)
+        result = self._select_best(tesseract_result, easyocr_result)
+        self._record_engine_hit(result, escalated=True)
+        return result
+    
+    def _extract_concurrent(self, image: ImageInput) -> Dict[str, any]:
+        """Ejecuta ambos motores a la vez y retorna el primero que supere el umbral"""
+        if self._engine_executor is None:
+            self._engine_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ocr-engine')
+        
+        pending = {
+            self._engine_executor.submit(self.extract_with_tesseract, image),
+            self._engine_executor.submit(self.extract_with_easyocr, image)
+        }
+        results = {}
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if self._is_good_enough(result):
+                    # El motor restante termina en segundo plano y se descarta
+                    self._record_engine_hit(result, escalated=False)
+                    return result
+                results[result['method']] = result
+        
+        result = self._select_best(results['tesseract'], results['easyocr'])
+        self._record_engine_hit(result, escalated=True)
+        return result
+    
+    def _cache_key(self, file_path: str, engine: str, page=None,
+                   file_hash: Optional[str] = None) -> Optional[str]:
+        """
+        Clave de caché para un archivo, o None si la caché está deshabilitada
+        
+        Con `file_hash` (p. ej. al consultar muchas páginas del mismo archivo)
+        no se vuelve a leer el archivo para calcular el hash.
+        """
+        if self.cache is None:
+            return None
+        dpi = 'adaptive' if OCR_CONFIG['adaptive_dpi'] else OCR_CONFIG['pdf_dpi']
+        config = f"{self.tesseract_config}|dpi={dpi}"
+        if file_hash is not None:
+            return self.cache.make_key(file_hash, engine, config, page)
+        return self.cache.key_for_file(file_path, engine, config, page)
+    
+    def _cached(self, cache_key: Optional[str], extract) -> Dict[str, any]:
+        """Retorna el resultado en caché o lo calcula y lo almacena"""
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = extract()
+        
+        # No se almacenan errores para reintentar en la siguiente subida
+        if cache_key is not None and 'error' not in result:
+            self.cache.put(cache_key, result)
+        
+        return result
+    
+    def get_cache_stats(self) -> Dict[str, any]:
+        """Retorna las estadísticas de la caché de OCR"""
+        return self.cache.get_stats() if self.cache is not None else {}
+    
+    def extract_text(self, image: ImageInput, method: str = 'best', use_cache: bool = True) -> Dict[str, any]:
+        """
+        Extrae texto de una imagen usando el método especificado
+        
+        Args:
+            image: Ruta a la imagen, imagen PIL o arreglo NumPy
+            method: 'tesseract', 'easyocr', 'best' (usa ambos y elige el mejor),
+                'cascade' (Tesseract y EasyOCR solo si no alcanza el umbral) o
+                'concurrent' (ambos en paralelo, gana el primero que alcance el umbral)
+            use_cache: Si consultar y poblar la caché persistente de resultados
+                (solo aplica a rutas de archivo)
+        """
+        if method not in ('tesseract', 'easyocr', 'best', 'cascade', 'concurrent'):
+            raise ValueError(f"Método no soportado: {method}")
+        
+        cache_key = None
+        if use_cache and isinstance(image, str):
+            cache_key = self._cache_key(image, method)
+        return self._cached(cache_key, lambda: self._extract_text_uncached(image, method))
+    
+    def _extract_text_uncached(self, image: ImageInput, method: str) -> Dict[str, any]:
+        """Ejecuta el motor de OCR indicado sin pasar por la caché"""
+        if method == 'tesseract':
+            return self.extract_with_tesseract(image)
+        elif method == 'easyocr':
+            return self.extract_with_easyocr(image)
+        
+        # Con dos motores, decodificar la imagen una sola vez y compartirla en memoria
+        if not isinstance(image, np.ndarray):
+            try:
+                image = self._load_image(image)
+            except Exception:
+                # Cada motor reporta el error en su resultado
+                pass
+        
+        if method == 'best':
+            # Usar ambos métodos y elegir el mejor resultado
+            tesseract_result = self.extract_with_tesseract(image)
+            easyocr_result = self.extract_with_easyocr(image)
+            return self._select_best(tesseract_result, easyocr_result)
+        elif method == 'cascade':
+            return self._extract_cascade(image)
+        elif method == 'concurrent':
+            return self._extract_concurrent(image)
+        else:
+            raise ValueError(f"Método no soportado: {method}")
+    
+    def extract_from_pdf(self, pdf_path: str, page_num: int = 0, use_cache: bool = True) -> Dict[str, any]:
+        """Extrae texto de una página específica de un PDF"""
+        cache_key = self._cache_key(pdf_path, 'best', page_num) if use_cache else None
+        return self._cached(cache_key, lambda: self._extract_from_pdf_uncached(pdf_path, page_num))
+    
+    def _extract_from_pdf_uncached(self, pdf_path: str, page_num: int) -> Dict[str, any]:
+        """Rasteriza y procesa una página de un PDF sin pasar por la caché"""
+        try:
+            if OCR_CONFIG['adaptive_dpi']:
+                result = self._ocr_pdf_page_adaptive(pdf_path, page_num)
+            else:
+                # Convertir página PDF a imagen
+                dpi = OCR_CONFIG['pdf_dpi']
+                image = self._rasterize_page(pdf_path, page_num, dpi)
+                
+                # Extraer texto directamente de la imagen en memoria
+                result = self.extract_text(image, use_cache=False)
+                result['dpi'] = dpi
+            
+            result['source'] = f"PDF página {page_num}"
+            
+            return result
             
         except Exception as e:
-            logger.error(f"Error en OCR con EasyOCR: {e}")
+            logger.error(f"Error extrayendo texto de PDF: {e}")
             return {
                 'text': '',
                 'confidence': 0.0,
                 'word_count': 0,
-                'method': 'easyocr',
+                'method': 'pdf_ocr',
                 'error': str(e)
             }
+
+    @staticmethod
+    def _rasterize_page(pdf_path: str, page_num: int, dpi: int, grayscale: bool = False) -> Image.Image:
+        """Convierte una página (base 0) de un PDF en imagen PIL"""
+        from pdf2image import convert_from_path
+        
+        images = convert_from_path(
+            pdf_path, dpi=dpi, first_page=page_num + 1, last_page=page_num + 1, grayscale=grayscale
+        )
+        if not images:
+            raise ValueError(f"No se pudo convertir la página {page_num} del PDF")
+        return images[0]
     
-    def extract_text(self, image_path: str, method: str = 'best') -> Dict[str, any]:
+    @staticmethod
+    def estimate_text_height(image: ImageInput) -> Optional[float]:
         """
-        Extrae texto de una imagen usando el método especificado
+        Estima la altura típica del texto en píxeles
         
-        Args:
-            image_path: Ruta a la imagen
-            method: 'tesseract', 'easyocr' o 'best' (usa ambos y elige el mejor)
+        Usa la mediana de la altura de los componentes conexos de la imagen
+        binarizada. Retorna None si no se detecta texto (página en blanco).
         """
-        if method == 'tesseract':
-            return self.extract_with_tesseract(image_path)
-        elif method == 'easyocr':
-            return self.extract_with_easyocr(image_path)
-        elif method == 'best':
-            # Usar ambos métodos y elegir el mejor resultado
-            tesseract_result = self.extract_with_tesseract(image_path)
-            easyocr_result = self.extract_with_easyocr(image_path)
-            
-            # Elegir basado en confianza y cantidad de texto
-            if tesseract_result['confidence'] > easyocr_result['confidence']:
-                if tesseract_result['word_count'] >= easyocr_result['word_count'] * 0.8:
-                    return tesseract_result
+        image = OCRService._load_image(image)
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        heights = stats[1:, cv2.CC_STAT_HEIGHT]
+        widths = stats[1:, cv2.CC_STAT_WIDTH]
+        
+        # Descartar ruido y elementos que no son caracteres (líneas, recuadros, fotos)
+        is_glyph = (heights >= 2) & (heights < gray.shape[0] / 4) & (widths < gray.shape[1] / 4)
+        if not is_glyph.any():
+            return None
+        
+        return float(np.median(heights[is_glyph]))
+    
+    def plan_page_dpi(self, pdf_path: str, page_num: int) -> Tuple[int, Optional[float]]:
+        """
+        Elige la DPI más baja con la que el texto de la página alcanza la altura objetivo
+        
+        Rasteriza la página a una DPI de sondeo baja para estimar la altura
+        del texto y escala a la menor DPI candidata que la lleve al menos a
+        OCR_CONFIG['target_text_height_px']. La DPI planificada nunca supera
+        la fija (pdf_dpi): solo la letra grande baja de ella, y subir por
+        encima queda para el reintento por baja confianza de
+        _ocr_pdf_page_adaptive. Con el sondeo a 100 DPI, el texto de 10 pt
+        mide unos 8 px y se planifica a 200 DPI; el de 12 pt, a 150.
+        
+        Returns:
+            (DPI elegida, altura estimada del texto en pulgadas o None si no hay texto)
+        """
+        candidates = [dpi for dpi in sorted(OCR_CONFIG['dpi_candidates']) if dpi <= OCR_CONFIG['pdf_dpi']]
+        candidates = candidates or [OCR_CONFIG['pdf_dpi']]
+        probe_dpi = OCR_CONFIG['dpi_probe']
+        
+        probe = self._rasterize_page(pdf_path, page_num, probe_dpi, grayscale=True)
+        text_height = self.estimate_text_height(probe)
+        probe.close()
+        
+        if text_height is None:
+            return candidates[0], None
+        
+        required_dpi = OCR_CONFIG['target_text_height_px'] * probe_dpi / text_height
+        for dpi in candidates:
+            if dpi >= required_dpi:
+                return dpi, text_height / probe_dpi
+        return candidates[-1], text_height / probe_dpi
+    
+    def _ocr_pdf_page_adaptive(self, pdf_path: str, page_num: int, method: str = 'best',
+                               max_dpi: Optional[int] = None) -> Dict[str, any]:
+        """
+        Aplica OCR a una página con la DPI del planificador
+        
+        Si la confianza queda por debajo del umbral de la cascada menos la
+        tolerancia, repite una sola vez con la siguiente DPI candidata (que
+        puede superar pdf_dpi) y conserva el mejor resultado, de modo que una
+        página nunca pasa por más de dos rasterizaciones. `max_dpi` acota las
+        candidatas para respetar el techo de memoria del documento.
+        """
+        candidates = sorted(OCR_CONFIG['dpi_candidates'])
+        if max_dpi is not None:
+            candidates = [candidate for candidate in candidates if candidate <= max_dpi] or [max_dpi]
+        min_confidence = OCR_CONFIG['cascade_min_confidence'] - OCR_CONFIG['dpi_confidence_tolerance']
+        dpi, text_height = self.plan_page_dpi(pdf_path, page_num)
+        dpi = min(dpi, candidates[-1])
+        
+        result = self._ocr_page_at_dpi(pdf_path, page_num, method, dpi)
+        
+        higher = [candidate for candidate in candidates if candidate > dpi]
+        # Una página sin texto detectable no mejora subiendo la DPI
+        if result['confidence'] >= min_confidence or not higher or text_height is None:
+            return result
+        
+        retry = self._ocr_page_at_dpi(pdf_path, page_num, method, higher[0])
+        return retry if retry['confidence'] > result['confidence'] else result
+    
+    def _ocr_page_at_dpi(self, pdf_path: str, page_num: int, method: str, dpi: int) -> Dict[str, any]:
+        """Rasteriza una página a `dpi` y le aplica OCR, liberando la imagen al terminar"""
+        image = self._rasterize_page(pdf_path, page_num, dpi)
+        try:
+            result = self.extract_text(image, method, use_cache=False)
+        finally:
+            image.close()
+        result['dpi'] = dpi
+        return result
+    
+    def _ocr_page_range(self, pdf_path: str, first_page: int, last_page: int,
+                        method: str = 'best', dpi: int = 200) -> List[Dict[str, any]]:
+        """
+        Rasteriza y procesa las páginas [first_page, last_page] (base 0) de un PDF
+        
+        Las páginas se rasterizan en ventanas de OCR_CONFIG['raster_window_pages']
+        y cada imagen se libera apenas termina su OCR, de modo que la memoria
+        del proceso no crece con el tamaño del bloque. Con
+        OCR_CONFIG['adaptive_dpi'] cada página usa la DPI de plan_page_dpi,
+        acotada a `dpi`; en caso contrario todas se rasterizan a `dpi`.
+        Cada resultado incluye la RSS del proceso medida con la imagen aún en
+        memoria ('rss_mb').
+        """
+        from pdf2image import convert_from_path
+        
+        page_results = []
+        
+        if OCR_CONFIG['adaptive_dpi']:
+            for page_num in range(first_page, last_page + 1):
+                start_time = time.time()
+                result = self._ocr_pdf_page_adaptive(pdf_path, page_num, method, max_dpi=dpi)
+                result['page'] = page_num
+                result['processing_time'] = time.time() - start_time
+                result['rss_mb'] = current_rss_bytes() / (1024 * 1024)
+                page_results.append(result)
+            return page_results
+        
+        window = max(1, OCR_CONFIG['raster_window_pages'])
+        for window_start in range(first_page, last_page + 1, window):
+            window_end = min(window_start + window - 1, last_page)
+            images = convert_from_path(
+                pdf_path, dpi=dpi, first_page=window_start + 1, last_page=window_end + 1
+            )
             
-            return easyocr_result if easyocr_result['word_count'] > 0 else tesseract_result
+            for offset in range(len(images)):
+                image = images[offset]
+                # Soltar la referencia de la lista para liberar la imagen tras su OCR
+                images[offset] = None
+                
+                start_time = time.time()
+                result = self.extract_text(image, method, use_cache=False)
+                result['dpi'] = dpi
+                result['page'] = window_start + offset
+                result['processing_time'] = time.time() - start_time
+                result['rss_mb'] = current_rss_bytes() / (1024 * 1024)
+                page_results.append(result)
+                image.close()
+                del image
+        
+        return page_results
+    
+    @staticmethod
+    def _merge_page_results(page_results: List[Dict[str, any]]) -> Dict[str, any]:
+        """Combina los resultados por página en un único resultado de documento"""
+        page_results = sorted(page_results, key=lambda r: r['page'])
+        total_words = sum(r['word_count'] for r in page_results)
+        
+        # Confianza promedio ponderada por cantidad de palabras
+        if total_words:
+            confidence = sum(r['confidence'] * r['word_count'] for r in page_results) / total_words
         else:
-            raise ValueError(f"Método no soportado: {method}")
+            confidence = 0.0
+        
+        return {
+            'text': '\n\n'.join(r['text'] for r in page_results if r['text']),
+            'confidence': confidence,
+            'word_count': total_words,
+            'method': 'pdf_ocr_multipage',
+            'page_count': len(page_results),
+            'pages': [
+                {
+                    'page': r['page'],
+                    'text': r['text'],
+                    'confidence': r['confidence'],
+                    'word_count': r['word_count'],
+                    'method': r['method'],
+                    'processing_time': r.get('processing_time', 0.0),
+                    **({'dpi': r['dpi']} if 'dpi' in r else {}),
+                    **({'rss_mb': r['rss_mb']} if 'rss_mb' in r else {}),
+                    **({'error': r['error']} if 'error' in r else {})
+                }
+                for r in page_results
+            ]
+        }
     
-    def extract_from_pdf(self, pdf_path: str, page_num: int = 0) -> Dict[str, any]:
-        """Extrae texto de una página específica de un PDF"""
+    def extract_pdf_text_layer(self, pdf_path: str) -> Optional[List[str]]:
+        """
+        Lee la capa de texto embebida de cada página de un PDF con PyPDF2
+        
+        Retorna None si el PDF no se puede leer (cifrado, dañado, etc.).
+        """
         try:
-            from pdf2image import convert_from_path
+            from PyPDF2 import PdfReader
             
-            # Convertir página PDF a imagen
-            images = convert_from_path(pdf_path, first_page=page_num+1, last_page=page_num+1)
+            reader = PdfReader(pdf_path)
+            return [page.extract_text() or '' for page in reader.pages]
             
-            if not images:
-                raise ValueError(f"No se pudo convertir la página {page_num} del PDF")
+        except Exception as e:
+            logger.warning(f"No se pudo leer la capa de texto del PDF: {e}")
+            return None
+    
+    @staticmethod
+    def _is_usable_text_layer(text: str) -> bool:
+        """Determina si el texto embebido de una página es confiable o requiere OCR"""
+        stripped = ''.join(text.split())
+        if len(stripped) < OCR_CONFIG['text_layer_min_chars']:
+            return False
+        
+        # Glifos sin mapeo Unicode: caracteres de reemplazo, uso privado o "(cid:NN)"
+        if '(cid:' in text:
+            return False
+        valid_chars = sum(
+            1 for c in stripped
+            if c.isalnum() or c in '.,;:$%/()-_#*+=@&\'"¿?¡!°'
+        )
+        if valid_chars / len(stripped) < OCR_CONFIG['text_layer_min_valid_ratio']:
+            return False
+        
+        # Palabras excesivamente largas indican que no se extrajeron los espacios
+        words = text.split()
+        return len(stripped) / len(words) <= OCR_CONFIG['text_layer_max_avg_word_length']
+    
+    @staticmethod
+    def _page_ranges(pages: List[int], chunk_size: int) -> List[Tuple[int, int]]:
+        """Agrupa páginas en rangos contiguos [first, last] de máximo chunk_size páginas"""
+        ranges = []
+        for page in sorted(pages):
+            if ranges and page == ranges[-1][1] + 1 and page - ranges[-1][0] < chunk_size:
+                ranges[-1] = (ranges[-1][0], page)
+            else:
+                ranges.append((page, page))
+        return ranges
+    
+    @staticmethod
+    def _largest_page_size(pdf_path: str) -> Tuple[float, float]:
+        """Ancho y alto en pulgadas de la página más grande del PDF (carta si no se puede leer)"""
+        try:
+            from PyPDF2 import PdfReader
             
-            # Guardar temporalmente la imagen
-            temp_image_path = f"/tmp/pdf_page_{page_num}.png"
-            images[0].save(temp_image_path, 'PNG')
+            sizes = [
+                (float(page.mediabox.width) / 72, float(page.mediabox.height) / 72)
+                for page in PdfReader(pdf_path).pages
+            ]
+            return max(sizes, key=lambda size: size[0] * size[1])
             
-            # Extraer texto
-            result = self.extract_text(temp_image_path)
-            result['source'] = f"PDF página {page_num}"
+        except Exception:
+            return 8.5, 11.0
+    
+    def plan_raster_memory(self, pdf_path: str, max_workers: int) -> Tuple[int, int]:
+        """
+        Ajusta la DPI máxima y los procesos para respetar el techo de memoria
+        
+        Estima los bytes de una ventana de páginas rasterizadas (RGB, con
+        OCR_CONFIG['raster_memory_factor'] copias vivas durante el
+        preprocesamiento) y limita los procesos simultáneos para que el total
+        no supere OCR_CONFIG['max_document_memory_mb']. Si una sola ventana
+        excede el techo, se reduce la DPI.
+        
+        Returns:
+            Tupla (dpi, procesos)
+        """
+        if OCR_CONFIG['adaptive_dpi']:
+            dpi = max(OCR_CONFIG['dpi_candidates'])
+        else:
+            dpi = OCR_CONFIG['pdf_dpi']
+        
+        ceiling = OCR_CONFIG['max_document_memory_mb'] * 1024 * 1024
+        width_in, height_in = self._largest_page_size(pdf_path)
+        bytes_per_dpi2 = (
+            width_in * height_in * 3 * OCR_CONFIG['raster_memory_factor']
+            * max(1, OCR_CONFIG['raster_window_pages'])
+        )
+        
+        window_bytes = bytes_per_dpi2 * dpi * dpi
+        if window_bytes > ceiling:
+            reduced_dpi = max(1, int(math.sqrt(ceiling / bytes_per_dpi2)))
+            logger.warning(
+                f"DPI reducida de {dpi} a {reduced_dpi} para respetar el techo de "
+                f"{OCR_CONFIG['max_document_memory_mb']}MB por documento"
+            )
+            dpi = reduced_dpi
+            window_bytes = bytes_per_dpi2 * dpi * dpi
+        
+        workers = max(1, min(max_workers, int(ceiling // window_bytes)))
+        return dpi, workers
+    
+    def _ocr_pdf_pages(self, pdf_path: str, pages: List[int], method: str,
+                       max_workers: Optional[int], chunk_size: Optional[int]) -> List[Dict[str, any]]:
+        """Rasteriza y aplica OCR a las páginas indicadas usando el pool de procesos"""
+        dpi, max_workers = self.plan_raster_memory(pdf_path, max_workers or OCR_CONFIG['max_workers'])
+        chunk_size = chunk_size or OCR_CONFIG['pdf_chunk_size']
+        
+        # Reducir el bloque si hace falta para repartir trabajo a todos los procesos
+        chunk_size = max(1, min(chunk_size, math.ceil(len(pages) / max_workers)))
+        page_ranges = self._page_ranges(pages, chunk_size)
+        workers = min(max_workers, len(page_ranges))
+        
+        if workers <= 1:
+            chunks = [
+                self._ocr_page_range(pdf_path, first, last, method, dpi)
+                for first, last in page_ranges
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_ocr_pdf_chunk, pdf_path, first, last, method, dpi)
+                    for first, last in page_ranges
+                ]
+                chunks = [future.result() for future in futures]
+        
+        return [page for chunk in chunks for page in chunk]
+    
+    @staticmethod
+    def _pdf_page_count(pdf_path: str, text_layer: Optional[List[str]] = None) -> int:
+        """Cantidad de páginas del PDF (de la capa de texto si ya se leyó)"""
+        if text_layer is not None:
+            page_count = len(text_layer)
+        else:
+            from pdf2image import pdfinfo_from_path
+            page_count = pdfinfo_from_path(pdf_path)['Pages']
+        
+        if page_count == 0:
+            raise ValueError(f"El PDF no tiene páginas: {pdf_path}")
+        return page_count
+    
+    def _text_layer_page(self, page_num: int, text_layer: Optional[List[str]]) -> Optional[Dict[str, any]]:
+        """Resultado de página desde la capa de texto, o None si la página requiere OCR"""
+        page_start = time.time()
+        if text_layer is None or not self._is_usable_text_layer(text_layer[page_num]):
+            return None
+        
+        text = text_layer[page_num].strip()
+        return {
+            'page': page_num,
+            'text': text,
+            'confidence': 1.0,
+            'word_count': len(text.split()),
+            'method': 'text_layer',
+            'processing_time': time.time() - page_start
+        }
+    
+    def extract_from_pdf_pages(self, pdf_path: str, method: str = 'best',
+                               max_workers: Optional[int] = None,
+                               chunk_size: Optional[int] = None,
+                               use_text_layer: bool = True,
+                               use_cache: bool = True) -> Dict[str, any]:
+        """
+        Extrae texto de todas las páginas de un PDF
+        
+        Las páginas con capa de texto embebida utilizable se leen directamente.
+        El resto se rasteriza en bloques acotados y cada bloque se procesa con
+        OCR en un proceso del pool, de modo que la memoria por proceso no crece
+        con el tamaño del documento. La DPI y la cantidad de procesos se
+        ajustan al techo OCR_CONFIG['max_document_memory_mb'] (ver
+        plan_raster_memory) y el resultado reporta el pico de RSS del
+        documento ('peak_rss_mb' y 'worker_peak_rss_mb').
+        
+        Args:
+            pdf_path: Ruta al PDF
+            method: Método de OCR por página (ver extract_text)
+            max_workers: Procesos del pool (por defecto OCR_CONFIG['max_workers'])
+            chunk_size: Páginas por bloque (por defecto OCR_CONFIG['pdf_chunk_size'])
+            use_text_layer: Si intentar primero la capa de texto del PDF
+            use_cache: Si consultar y poblar la caché persistente de resultados
+        """
+        engine = f"{method}|text_layer={use_text_layer}"
+        cache_key = self._cache_key(pdf_path, engine, 'all') if use_cache else None
+        return self._cached(
+            cache_key,
+            lambda: self._extract_from_pdf_pages_uncached(
+                pdf_path, method, max_workers, chunk_size, use_text_layer
+            )
+        )
+    
+    def _extract_from_pdf_pages_uncached(self, pdf_path: str, method: str,
+                                         max_workers: Optional[int], chunk_size: Optional[int],
+                                         use_text_layer: bool) -> Dict[str, any]:
+        """Extrae texto de todas las páginas de un PDF sin pasar por la caché"""
+        start_time = time.time()
+        
+        try:
+            with PeakRSSMonitor() as memory:
+                text_layer = self.extract_pdf_text_layer(pdf_path) if use_text_layer else None
+                page_count = self._pdf_page_count(pdf_path, text_layer)
+                
+                page_results = []
+                ocr_pages = []
+                for page_num in range(page_count):
+                    page_result = self._text_layer_page(page_num, text_layer)
+                    if page_result is not None:
+                        page_results.append(page_result)
+                    else:
+                        ocr_pages.append(page_num)
+                
+                if ocr_pages:
+                    page_results.extend(
+                        self._ocr_pdf_pages(pdf_path, ocr_pages, method, max_workers, chunk_size)
+                    )
+            
+            result = self._merge_page_results(page_results)
+            result['method'] = 'pdf_ocr_multipage' if ocr_pages else 'pdf_text_layer'
+            result['ocr_page_count'] = len(ocr_pages)
+            result['source'] = f"PDF {page_count} páginas"
+            result['processing_time'] = time.time() - start_time
+            
+            # Pico de RSS del proceso principal y mayor RSS medida en los procesos de OCR
+            result['peak_rss_mb'] = memory.peak_mb
+            result['worker_peak_rss_mb'] = max(
+                (r['rss_mb'] for r in page_results if 'rss_mb' in r), default=0.0
+            )
+            result['memory_ceiling_mb'] = OCR_CONFIG['max_document_memory_mb']
+            
+            logger.info(
+                f"PDF de {page_count} páginas procesado en {result['processing_time']:.2f}s "
+                f"({len(ocr_pages)} con OCR, pico RSS {result['peak_rss_mb']:.0f}MB, "
+                f"procesos {result['worker_peak_rss_mb']:.0f}MB)"
+            )
             
             return result
             
         except Exception as e:
-            logger.error(f"Error extrayendo texto de PDF: {e}")
+            logger.error(f"Error extrayendo texto de PDF multipágina: {e}")
             return {
                 'text': '',
                 'confidence': 0.0,
                 'word_count': 0,
-                'method': 'pdf_ocr',
+                'method': 'pdf_ocr_multipage',
+                'error': str(e)
+            }
+
+    def iter_pdf_pages(self, pdf_path: str, method: str = 'best',
+                       max_workers: Optional[int] = None,
+                       use_text_layer: bool = True,
+                       use_cache: bool = True) -> Iterator[Dict[str, any]]:
+        """
+        Genera el resultado de cada página de un PDF tan pronto como está listo
+        
+        Las páginas se entregan en orden. Las que tienen capa de texto o un
+        resultado en la caché persistente se entregan de inmediato; las demás
+        se procesan con OCR de a una por tarea en el pool, con una ventana
+        acotada de páginas en vuelo, de modo que la primera página llega en
+        aproximadamente el tiempo de OCR de una página. El pool no tiene más
+        procesos que páginas por OCR. Cerrar el generador antes de terminar
+        cancela las páginas pendientes.
+        
+        Cada página incluye el pico de RSS del proceso principal hasta ese
+        momento ('peak_rss_mb'); las páginas con OCR traen además la RSS del
+        proceso que las procesó ('rss_mb').
+        
+        Args:
+            pdf_path: Ruta al PDF
+            method: Método de OCR por página (ver extract_text)
+            max_workers: Procesos del pool (por defecto OCR_CONFIG['max_workers'])
+            use_text_layer: Si intentar primero la capa de texto del PDF
+            use_cache: Si consultar y poblar la caché persistente por página
+        """
+        start_time = time.time()
+        executor = None
+        cached_pages = 0
+        ocr_pages: List[int] = []
+        
+        with PeakRSSMonitor() as memory:
+            try:
+                text_layer = self.extract_pdf_text_layer(pdf_path) if use_text_layer else None
+                page_count = self._pdf_page_count(pdf_path, text_layer)
+                
+                # Hash del archivo una sola vez para las claves de todas las páginas
+                file_hash = None
+                if use_cache and self.cache is not None:
+                    try:
+                        file_hash = generate_file_hash(pdf_path, algorithm='sha256')
+                    except OSError:
+                        file_hash = None
+                engine = f"{method}|page"
+                
+                # Páginas listas sin OCR (capa de texto o caché); el resto va al pool
+                ready: Dict[int, Dict[str, any]] = {}
+                cache_keys: Dict[int, str] = {}
+                for page_num in range(page_count):
+                    page_result = self._text_layer_page(page_num, text_layer)
+                    if page_result is None and file_hash is not None:
+                        cache_keys[page_num] = self._cache_key(pdf_path, engine, page_num, file_hash)
+                        page_result = self.cache.get(cache_keys[page_num])
+                        cached_pages += page_result is not None
+                    if page_result is None:
+                        ocr_pages.append(page_num)
+                    else:
+                        ready[page_num] = page_result
+                
+                workers = 0
+                if ocr_pages:
+                    dpi, workers = self.plan_raster_memory(pdf_path, max_workers or OCR_CONFIG['max_workers'])
+                    workers = min(workers, len(ocr_pages))
+                    if workers > 1:
+                        executor = ProcessPoolExecutor(max_workers=workers)
+                
+                in_flight: Dict[int, any] = {}
+                pending = iter(ocr_pages)
+                for page_num in range(page_count):
+                    if page_num in ready:
+                        page_result = ready.pop(page_num)
+                    else:
+                        # Mantener hasta dos páginas por proceso en vuelo
+                        while executor is not None and len(in_flight) < 2 * workers:
+                            next_page = next(pending, None)
+                            if next_page is None:
+                                break
+                            in_flight[next_page] = executor.submit(
+                                _ocr_pdf_chunk, pdf_path, next_page, next_page, method, dpi
+                            )
+                        
+                        future = in_flight.pop(page_num, None)
+                        if future is None:
+                            page_result = self._ocr_page_range(pdf_path, page_num, page_num, method, dpi)[0]
+                        else:
+                            page_result = future.result()[0]
+                        
+                        if page_num in cache_keys and 'error' not in page_result:
+                            self.cache.put(cache_keys[page_num], page_result)
+                    
+                    page_result['peak_rss_mb'] = max(memory.peak_mb, current_rss_bytes() / (1024 * 1024))
+                    yield page_result
+            
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                logger.info(
+                    f"PDF entregado por páginas en {time.time() - start_time:.2f}s "
+                    f"({len(ocr_pages)} con OCR, {cached_pages} desde caché, "
+                    f"pico RSS {max(memory.peak_mb, current_rss_bytes() / (1024 * 1024)):.0f}MB)"
+                )
+    
+    def extract_zones(self, image: ImageInput, document_type: DocumentType,
+                      method: str = 'tesseract') -> Dict[str, any]:
+        """
+        Aplica OCR solo a las zonas de plantilla de un tipo de documento conocido
+        
+        Cada zona se recorta de la imagen en memoria y se procesa en paralelo,
+        de modo que el volumen de píxeles es una fracción de la imagen completa.
+        
+        Args:
+            image: Ruta a la imagen, imagen PIL o arreglo NumPy
+            document_type: Tipo de documento (debe tener plantilla registrada)
+            method: 'tesseract' (una línea por zona) o 'easyocr'
+        
+        Returns:
+            Diccionario con 'fields' (texto y confianza por campo), 'text' con
+            los fragmentos concatenados y 'pixel_ratio' procesado
+        """
+        start_time = time.time()
+        
+        template = get_zone_template(document_type)
+        if template is None:
+            raise ValueError(f"No hay plantilla de zonas para: {document_type}")
+        
+        # Limitar a los campos que se extraen para el tipo, si están definidos
+        expected_fields = EXTRACTION_FIELDS.get(document_type.value)
+        if expected_fields:
+            template = {field: zone for field, zone in template.items() if field in expected_fields}
+        
+        try:
+            image = self._load_image(image)
+            height, width = image.shape[:2]
+            
+            crops = {}
+            for field, (x0, y0, x1, y1) in template.items():
+                crops[field] = image[int(y0 * height):int(y1 * height), int(x0 * width):int(x1 * width)]
+            
+            if method == 'tesseract':
+                # Cada zona contiene una sola línea de texto
+                zone_config = self.tesseract_config.replace('--psm 6', '--psm 7')
+                
+                def extract(crop):
+                    return self.extract_with_tesseract(crop, config=zone_config)
+            elif method == 'easyocr':
+                extract = self.extract_with_easyocr
+            else:
+                raise ValueError(f"Método no soportado para zonas: {method}")
+            
+            if self._zone_executor is None:
+                self._zone_executor = ThreadPoolExecutor(
+                    max_workers=OCR_CONFIG['zone_workers'], thread_name_prefix='ocr-zone'
+                )
+            futures = {field: self._zone_executor.submit(extract, crop) for field, crop in crops.items()}
+            
+            fields = {}
+            for field, future in futures.items():
+                result = future.result()
+                fields[field] = {
+                    'text': result['text'],
+                    'confidence': result['confidence'],
+                    'word_count': result['word_count'],
+                    **({'error': result['error']} if 'error' in result else {})
+                }
+            
+            zone_pixels = sum(crop.shape[0] * crop.shape[1] for crop in crops.values())
+            word_count = sum(field['word_count'] for field in fields.values())
+            confidence = (
+                sum(field['confidence'] * field['word_count'] for field in fields.values()) / word_count
+                if word_count else 0.0
+            )
+            
+            return {
+                'text': '\n'.join(field['text'] for field in fields.values() if field['text']),
+                'confidence': confidence,
+                'word_count': word_count,
+                'method': f"zones_{method}",
+                'fields': fields,
+                'pixel_ratio': zone_pixels / (height * width),
+                'processing_time': time.time() - start_time
+            }
+            
+        except Exception as e:
+            logger.error(f"Error en OCR por zonas: {e}")
+            return {
+                'text': '',
+                'confidence': 0.0,
+                'word_count': 0,
+                'method': f"zones_{method}",
+                'fields': {},
                 'error': str(e)
             }
@@ -0,0 +1,94 @@
+"""
+Motor de extracción por regex compilado: un solo recorrido del texto por tipo de documento
+"""
+import re
+from typing import Dict, Iterable, Optional
+
+
+def leading_group(pattern: str) -> Optional[str]:
+    """
+    Primer grupo de nivel superior del patrón, si el patrón empieza con uno
+    
+    En los patrones de extracción es la alternativa de etiquetas, por ejemplo
+    `(?:Saldo|Disponible)` en `(?:Saldo|Disponible)\\s*:?\\s*\\$?([\\d,]+)`.
+    """
+    if not pattern.startswith('('):
+        return None
+    
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return pattern[:i + 1]
+        i += 1
+    return None
+
+
+class FieldRegexEngine:
+    """
+    Extrae la primera coincidencia de cada campo recorriendo el texto una vez
+    
+    Las etiquetas de todos los campos se combinan en un único patrón dentro
+    de una búsqueda anticipada, de modo que un solo recorrido encuentra todas las posiciones donde puede empezar un campo.
+    En cada una se prueba el patrón completo de los campos aún sin valor; al
+    completar todos los campos pedidos el recorrido se detiene. El resultado
+    es el mismo que buscar la primera coincidencia de cada patrón por
+    separado, porque toda coincidencia de un campo empieza con una de sus
+    etiquetas.
+    """
+    
+    def __init__(self, field_patterns: Dict[str, str], flags: int = re.IGNORECASE | re.MULTILINE):
+        self.fields = list(field_patterns)
+        self.field_regexes = {
+            field: re.compile(pattern, flags) for field, pattern in field_patterns.items()
+        }
+        
+        # Sin grupo inicial de etiquetas, el propio patrón sirve de disparador.
+        # Varias etiquetas pueden empezar en la misma posición, por eso cada
+        # posición se verifica contra todos los campos pendientes.
+        triggers = [
+            leading_group(pattern) or f"(?:{pattern})" for pattern in field_patterns.values()
+        ]
+        self.scanner = re.compile(f"(?=(?:{'|'.join(triggers)}))", flags) if triggers else None
+    
+    def search_first(self, text: str, fields: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """
+        Primera coincidencia (grupo 1) de cada campo pedido
+        
+        Args:
+            text: Texto del documento
+            fields: Campos a buscar (por defecto todos)
+        """
+        pending = [field for field in self.fields if fields is None or field in fields]
+        found: Dict[str, str] = {}
+        if not pending or self.scanner is None:
+            return found
+        
+        for candidate in self.scanner.finditer(text):
+            position = candidate.start()
+            matched = False
+            for field in pending:
+                match = self.field_regexes[field].match(text, position)
+                if match:
+                    found[field] = match.group(1)
+                    matched = True
+            
+            if matched:
+                pending = [field for field in pending if field not in found]
+                if not pending:
+                    break
+        
+        return found
@@ -0,0 +1,163 @@
+"""
+Reconocimiento con Tesseract en un solo pase, con handles persistentes en proceso
+"""
+import os
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytesseract
+from PIL import Image
+from loguru import logger
+
+from src.core.config import OCR_CONFIG
+
+try:
+    import tesserocr
+except ImportError:  # Dependencia opcional; sin ella se usa pytesseract
+    tesserocr = None
+
+
+def parse_tesseract_config(config: str) -> Tuple[str, int, int]:
+    """Obtiene (idioma, oem, psm) de una configuración estilo línea de comandos"""
+    lang = re.search(r'-l\s+(\S+)', config)
+    oem = re.search(r'--oem\s+(\d+)', config)
+    psm = re.search(r'--psm\s+(\d+)', config)
+    return (
+        lang.group(1) if lang else 'eng',
+        int(oem.group(1)) if oem else 3,
+        int(psm.group(1)) if psm else 3
+    )
+
+
+class TesseractHandlePool:
+    """
+    Pool de handles de la API de Tesseract (tesserocr) cargados en el proceso
+    
+    Cada handle mantiene los datos de entrenamiento del idioma en memoria, de
+    modo que reconocer una imagen no lanza un subproceso ni escribe archivos
+    temporales. Los handles se crean bajo demanda hasta `size` y se reutilizan.
+    """
+    
+    def __init__(self, lang: str, oem: int, size: int):
+        self.lang = lang
+        self.oem = oem
+        self.size = size
+        self._available = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _create_handle(self):
+        """Crea un handle nuevo cargando el idioma configurado"""
+        # tesserocr.OEM y tesserocr.PSM son espacios de constantes enteras, no
+        # enums invocables: se pasan los enteros directamente
+        return tesserocr.PyTessBaseAPI(lang=self.lang, oem=self.oem)
+    
+    @contextmanager
+    def handle(self):
+        """Presta un handle del pool durante un reconocimiento"""
+        try:
+            api = self._available.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    api = self._create_handle()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                api = self._available.get()
+        
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._available.put(api)
+    
+    def warm_up(self) -> None:
+        """Crea un handle para cargar el idioma antes de la primera solicitud"""
+        with self.handle():
+            pass
+    
+    def recognize(self, image: np.ndarray, psm: int) -> Tuple[str, List[float]]:
+        """Reconoce la imagen y retorna texto y confianzas por palabra en un solo pase"""
+        with self.handle() as api:
+            api.SetPageSegMode(psm)
+            api.SetImage(Image.fromarray(image))
+            api.Recognize()
+            return api.GetUTF8Text(), [float(conf) for conf in api.AllWordConfidences() if conf > 0]
+
+
+# Pools por proceso e idioma; los handles no se comparten entre procesos
+_pools: Dict[Tuple[int, str, int], TesseractHandlePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_tesseract_pool(lang: str, oem: int) -> TesseractHandlePool:
+    """Retorna el pool de handles del proceso actual para el idioma y motor dados"""
+    key = (os.getpid(), lang, oem)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = TesseractHandlePool(lang, oem, OCR_CONFIG['tesseract_pool_size'])
+                _pools[key] = pool
+                logger.info(f"Pool de Tesseract creado (lang={lang}, tamaño={pool.size})")
+    return pool
+
+
+def use_handle_pool() -> bool:
+    """Indica si se usan handles persistentes (tesserocr) o pytesseract"""
+    backend = OCR_CONFIG['tesseract_backend']
+    if backend == 'tesserocr' and tesserocr is None:
+        raise ImportError("tesseract_backend='tesserocr' requiere el paquete tesserocr")
+    return backend != 'pytesseract' and tesserocr is not None
+
+
+def recognize_with_pytesseract(image: np.ndarray, config: str) -> Tuple[str, List[float]]:
+    """Reconoce con una sola llamada a image_to_data y reconstruye el texto por líneas"""
+    data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+    
+    lines = []
+    confidences = []
+    current_line = None
+    current_block = None
+    for i, word in enumerate(data['text']):
+        if data['level'][i] != 5:
+            continue
+        
+        line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if line_key != current_line:
+            # Línea en blanco entre bloques, como en image_to_string
+            if current_block is not None and data['block_num'][i] != current_block:
+                lines.append('')
+            lines.append([])
+            current_line = line_key
+            current_block = data['block_num'][i]
+        
+        if word.strip():
+            lines[-1].append(word)
+        
+        conf = float(data['conf'][i])
+        if conf > 0:
+            confidences.append(conf)
+    
+    text = '\n'.join(' '.join(line) if isinstance(line, list) else line for line in lines)
+    return text, confidences
+
+
+def recognize(image: np.ndarray, config: str) -> Tuple[str, List[float]]:
+    """Reconoce una imagen preprocesada con el backend configurado en un solo pase"""
+    if use_handle_pool():
+        lang, oem, psm = parse_tesseract_config(config)
+        return get_tesseract_pool(lang, oem).recognize(image, psm)
+    return recognize_with_pytesseract(image, config)
@@ -0,0 +1,89 @@
+"""
+Lectura por bloques de corpus etiquetados para el entrenamiento incremental
+"""
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from loguru import logger
+
+# Fuente de entrenamiento: archivo JSONL/Parquet o documentos ya en memoria
+TrainingSource = Union[str, Path, Iterable[Dict]]
+
+
+def _chunk_records(records: Iterable[Dict], chunk_size: int) -> Iterator[Tuple[List[str], List[str]]]:
+    """Agrupa registros {'text', 'document_type'} en bloques (textos, etiquetas); omite registros inválidos"""
+    texts, labels = [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict) or not record.get('text') or not record.get('document_type'):
+            logger.warning(f"Registro {index} sin texto o tipo; se omite")
+            continue
+        texts.append(record['text'])
+        labels.append(record['document_type'])
+        if len(texts) >= chunk_size:
+            yield texts, labels
+            texts, labels = [], []
+    if texts:
+        yield texts, labels
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict]:
+    """Registros de un archivo JSONL, uno por línea; omite líneas inválidas"""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Línea {line_number} inválida en {path.name}; se omite")
+                continue
+            if not record.get('text') or not record.get('document_type'):
+                logger.warning(f"Línea {line_number} de {path.name} sin texto o tipo; se omite")
+                continue
+            yield record
+
+
+def _iter_parquet(path: Path, chunk_size: int) -> Iterator[Tuple[List[str], List[str]]]:
+    """Bloques (textos, etiquetas) de un archivo Parquet leídos por lotes de filas"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Leer corpus Parquet requiere el paquete pyarrow")
+    
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=['text', 'document_type']):
+        columns = batch.to_pydict()
+        pairs = [
+            (text, label) for text, label in zip(columns['text'], columns['document_type'])
+            if text and label
+        ]
+        if pairs:
+            texts, labels = zip(*pairs)
+            yield list(texts), list(labels)
+
+
+def iter_labelled_chunks(source: TrainingSource, chunk_size: int) -> Iterator[Tuple[List[str], List[str]]]:
+    """
+    Genera bloques (textos, etiquetas) de a lo sumo `chunk_size` documentos
+    
+    Los archivos se leen de forma perezosa, de modo que solo un bloque está
+    en memoria a la vez sin importar el tamaño del corpus.
+    
+    Args:
+        source: Ruta a un archivo .jsonl/.parquet con campos 'text' y
+            'document_type', o un iterable de diccionarios con esos campos
+        chunk_size: Documentos por bloque
+    """
+    if not isinstance(source, (str, Path)):
+        yield from _chunk_records(source, chunk_size)
+        return
+    
+    path = Path(source)
+    suffix = path.suffix.lower()
+    if suffix in ('.jsonl', '.ndjson'):
+        yield from _chunk_records(_iter_jsonl(path), chunk_size)
+    elif suffix == '.parquet':
+        yield from _iter_parquet(path, chunk_size)
+    else:
+        raise ValueError(f"Formato de corpus no soportado: {suffix}")
@@ -0,0 +1,190 @@
+"""
+Lectura de movimientos de estados de cuenta en columnas de NumPy
+"""
+import re
+from array import array
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+
+# Un monto debe parecer dinero: con "$", con separadores de miles o con
+# decimales. Así un número al final de la descripción ("PAGO CUOTA 3") no
+# se confunde con el monto.
+MONEY_PATTERN = (
+    r'-?[ \t]*(?:'
+    r'\$[ \t]*-?\d[\d.,]*'
+    r'|\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?'
+    r'|\d+[.,]\d{1,2}'
+    r')'
+)
+
+# Una línea de movimiento: fecha, descripción, monto y saldo opcional.
+# Los débitos llevan signo negativo ("-45.000" o "-$45.000").
+TRANSACTION_LINE_PATTERN = re.compile(
+    r'^[ \t]*(\d{1,2})[/-](\d{1,2})[/-](\d{4})[ \t]+'
+    r'(.+?)[ \t]+'
+    rf'({MONEY_PATTERN})'
+    rf'(?:[ \t]+({MONEY_PATTERN}))?[ \t]*$',
+    re.MULTILINE
+)
+
+# Filas de saldo (anterior, inicial, final): informan el saldo, no son movimientos
+BALANCE_ROW_PATTERN = re.compile(r'^saldo\b', re.IGNORECASE)
+
+# Diferencia máxima entre el monto y la variación del saldo para deducir el signo
+BALANCE_DELTA_TOLERANCE = 0.01
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+TransactionRow = Tuple[int, str, float, float]
+
+
+def parse_amount(value: str) -> float:
+    """
+    Convierte un monto impreso a número
+    
+    El separador decimal es el último punto o coma seguido de uno o dos
+    dígitos; los demás separadores son de miles ("1.234.567,89" y
+    "1,234,567.89" dan 1234567.89, "45.000" da 45000).
+    """
+    negative = '-' in value
+    digits = value.replace('$', '').replace('-', '').replace(' ', '').replace('\t', '')
+    
+    separator = max(digits.rfind('.'), digits.rfind(','))
+    if separator != -1 and len(digits) - separator - 1 in (1, 2):
+        integer, decimals = digits[:separator], digits[separator + 1:]
+    else:
+        integer, decimals = digits, '0'
+    
+    number = float(f"{integer.replace('.', '').replace(',', '')}.{decimals}")
+    return -number if negative else number
+
+
+def iter_transaction_rows(source: Union[str, Iterable[str]]) -> Iterator[TransactionRow]:
+    """
+    Recorre las líneas de movimientos sin cargar una lista de líneas
+    
+    Un monto sin signo en una fila con saldo toma el signo de la variación
+    del saldo respecto de la fila anterior (incluidas las filas de saldo
+    anterior), para los extractos que imprimen los débitos sin "-". Si no se
+    conoce el saldo anterior o la variación no coincide con el monto, se
+    conserva el signo impreso.
+    
+    Args:
+        source: Texto completo o iterable de líneas (p. ej. un archivo abierto)
+    
+    Yields:
+        (día desde 1970-01-01, descripción, monto, saldo o NaN)
+    """
+    if isinstance(source, str):
+        matches = TRANSACTION_LINE_PATTERN.finditer(source)
+    else:
+        matches = (TRANSACTION_LINE_PATTERN.match(line.rstrip('\r\n')) for line in source)
+    
+    previous_balance = None
+    for match in matches:
+        if match is None:
+            continue
+        
+        day, month, year, description, amount, balance = match.groups()
+        description = description.strip()
+        if BALANCE_ROW_PATTERN.match(description):
+            # La fila de saldo trae el saldo en la última columna con monto
+            previous_balance = parse_amount(balance or amount)
+            continue
+        
+        try:
+            days = date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+        except ValueError:
+            continue  # Fecha imposible: no es una línea de movimiento
+        
+        value = parse_amount(amount)
+        balance_value = parse_amount(balance) if balance else float('nan')
+        if balance and previous_balance is not None and '-' not in amount:
+            delta = balance_value - previous_balance
+            if abs(abs(delta) - value) <= BALANCE_DELTA_TOLERANCE:
+                value = -value if delta < 0 else value
+        previous_balance = balance_value if balance else None
+        
+        yield days, description, value, balance_value
+
+
+class TransactionTable:
+    """
+    Movimientos de un estado de cuenta en columnas
+    
+    `dates` es datetime64[D]; `amounts` y `balances` son float64 (los débitos
+    son negativos y el saldo es NaN cuando la línea no lo trae).
+    """
+    
+    def __init__(self, dates: np.ndarray, descriptions: List[str],
+                 amounts: np.ndarray, balances: np.ndarray):
+        self.dates = dates
+        self.descriptions = descriptions
+        self.amounts = amounts
+        self.balances = balances
+    
+    def __len__(self) -> int:
+        return len(self.amounts)
+    
+    @classmethod
+    def from_rows(cls, rows: Iterable[TransactionRow]) -> 'TransactionTable':
+        """Construye la tabla consumiendo las filas una a una en arreglos compactos"""
+        days = array('q')
+        amounts = array('d')
+        balances = array('d')
+        descriptions = []
+        for row_days, description, amount, balance in rows:
+            days.append(row_days)
+            descriptions.append(description)
+            amounts.append(amount)
+            balances.append(balance)
+        
+        return cls(
+            np.frombuffer(days, dtype=np.int64).astype('datetime64[D]'),
+            descriptions,
+            np.frombuffer(amounts, dtype=np.float64),
+            np.frombuffer(balances, dtype=np.float64)
+        )
+    
+    def monthly_flows(self) -> Dict[str, np.ndarray]:
+        """Entradas, salidas y neto por mes (meses en orden cronológico)"""
+        months, month_index = np.unique(self.dates.astype('datetime64[M]'), return_inverse=True)
+        inflow = np.bincount(month_index, weights=np.clip(self.amounts, 0, None), minlength=len(months))
+        outflow = np.bincount(month_index, weights=np.clip(-self.amounts, 0, None), minlength=len(months))
+        return {
+            'months': months,
+            'inflow': inflow,
+            'outflow': outflow,
+            'net': inflow - outflow,
+            'count': np.bincount(month_index, minlength=len(months))
+        }
+    
+    def summary(self) -> Dict[str, Any]:
+        """Resumen serializable en JSON para los datos extraídos del documento"""
+        flows = self.monthly_flows()
+        return {
+            'count': len(self),
+            'start_date': str(self.dates.min()) if len(self) else None,
+            'end_date': str(self.dates.max()) if len(self) else None,
+            'total_inflow': float(flows['inflow'].sum()),
+            'total_outflow': float(flows['outflow'].sum()),
+            'monthly': [
+                {
+                    'month': str(month),
+                    'inflow': float(inflow),
+                    'outflow': float(outflow),
+                    'net': float(net),
+                    'count': int(count)
+                }
+                for month, inflow, outflow, net, count in zip(
+                    flows['months'], flows['inflow'], flows['outflow'], flows['net'], flows['count']
+                )
+            ]
+        }
+
+
+def parse_transactions(source: Union[str, Iterable[str]]) -> TransactionTable:
+    """Lee los movimientos de un estado de cuenta en una TransactionTable"""
+    return TransactionTable.from_rows(iter_transaction_rows(source))
@@ -0,0 +1,47 @@
+"""
+Plantillas de zonas para OCR de documentos con diseño fijo
+"""
+from typing import Dict, Optional, Tuple
+
+from src.models.schemas import DocumentType
+
+# Zona relativa (x0, y0, x1, y1) como fracción del ancho y alto de la imagen
+Zone = Tuple[float, float, float, float]
+
+
+# Las coordenadas son aproximadas para escaneos recortados al borde del
+# documento y deben ajustarse con muestras reales de cada emisor.
+ZONE_TEMPLATES: Dict[DocumentType, Dict[str, Zone]] = {
+    # Cédula amarilla con hologramas, anverso (mitad superior) y reverso
+    # (mitad inferior) en una misma imagen, como en las fotocopias ampliadas
+    DocumentType.CEDULA: {
+        "numero_documento": (0.05, 0.08, 0.65, 0.16),
+        "apellidos": (0.05, 0.17, 0.65, 0.27),
+        "nombres": (0.05, 0.27, 0.65, 0.37),
+        "fecha_nacimiento": (0.05, 0.55, 0.60, 0.63),
+        "lugar_expedicion": (0.05, 0.75, 0.70, 0.85)
+    },
+    # Página de datos del pasaporte colombiano
+    DocumentType.PASAPORTE: {
+        "numero_documento": (0.70, 0.10, 0.98, 0.20),
+        "apellidos": (0.33, 0.20, 0.98, 0.30),
+        "nombres": (0.33, 0.30, 0.98, 0.40),
+        "fecha_nacimiento": (0.33, 0.45, 0.70, 0.53),
+        "mrz": (0.02, 0.78, 0.98, 0.98)
+    }
+}
+
+
+def register_zone_template(document_type: DocumentType, zones: Dict[str, Zone]) -> None:
+    """Registra (o reemplaza) la plantilla de zonas de un tipo de documento"""
+    for field, (x0, y0, x1, y1) in zones.items():
+        if not (0.0 <= x0 < x1 <= 1.0 and 0.0 <= y0 < y1 <= 1.0):
+            raise ValueError(f"Zona inválida para '{field}': {(x0, y0, x1, y1)}")
+    ZONE_TEMPLATES[document_type] = dict(zones)
+
+
+def get_zone_template(document_type: Optional[DocumentType]) -> Optional[Dict[str, Zone]]:
+    """Retorna la plantilla de zonas de un tipo de documento, si existe"""
+    if document_type is None:
+        return None
+    return ZONE_TEMPLATES.get(document_type)
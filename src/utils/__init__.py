@@ -15,7 +15,7 @@ def generate_file_hash(file_path: str, algorithm: str = 'md5') -> str:
     hash_func = hashlib.new(algorithm)
     
     with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
             hash_func.update(chunk)
     
     return hash_func.hexdigest()
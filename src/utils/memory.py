@@ -0,0 +1,70 @@
+"""
+Medición de memoria residente (RSS) del proceso
+"""
+import os
+import sys
+import threading
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss_bytes() -> int:
+    """Memoria residente actual del proceso en bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0
+        # Sin /proc solo está disponible el pico de toda la vida del proceso
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class PeakRSSMonitor:
+    """
+    Registra el pico de memoria residente mientras dura un bloque
+    
+    Muestrea la RSS del proceso en un hilo en segundo plano, de modo que el
+    pico corresponde al trabajo hecho dentro del bloque y no a toda la vida
+    del proceso.
+    """
+    
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.baseline_bytes = 0
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _sample(self) -> None:
+        self.peak_bytes = max(self.peak_bytes, current_rss_bytes())
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+    
+    def __enter__(self) -> 'PeakRSSMonitor':
+        self.baseline_bytes = self.peak_bytes = current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, name='rss-monitor', daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+    
+    @property
+    def peak_mb(self) -> float:
+        """Pico de RSS en MB"""
+        return self.peak_bytes / (1024 * 1024)
+    
+    @property
+    def growth_mb(self) -> float:
+        """Crecimiento del pico respecto a la RSS al entrar al bloque, en MB"""
+        return (self.peak_bytes - self.baseline_bytes) / (1024 * 1024)
@@ -2,7 +2,9 @@
 Tests para el servicio de clasificación
 """
 import pytest
+import numpy as np
 from src.services.classification_service import DocumentClassifier
+from src.services.keyword_automaton import fold_text
 from src.models.schemas import DocumentType
 
 
@@ -117,6 +119,312 @@ class TestDocumentClassifier:
         assert features['has_dates'] == True
         assert features['has_currency'] == True
     
+    @pytest.mark.parametrize("native", [True, False])
+    def test_keyword_automaton_matches_substring_scan(self, classifier, native):
+        """Test autómata de palabras clave: mismos scores que la búsqueda con `in` por patrón"""
+        from src.services.keyword_automaton import KeywordAutomaton, ahocorasick
+        
+        if native and ahocorasick is None:
+            pytest.skip("pyahocorasick no está instalado")
+        
+        patterns = {
+            doc_type: [fold_text(pattern) for pattern in doc_patterns]
+            for doc_type, doc_patterns in classifier.patterns.items()
+        }
+        automaton = KeywordAutomaton(
+            patterns, weight=lambda pattern: len(pattern.split()) / 10 + 0.1, native=native
+        )
+        texts = [
+            "ESTADO DE CUENTA\nBanco: Banco Ejemplo\nSaldo: $1,500,000\nFecha de corte: 31/12/2023",
+            "CERTIFICACIÓN LABORAL: el empleado con contrato de trabajo, cargo analista",
+            "DIAN - Declaración de renta, formulario 210, año gravable 2023, régimen tributario",
+            "CC 12345678 tipo P",
+            "",
+        ]
+        
+        for text in texts:
+            text_lower = fold_text(text)
+            scan = automaton.scan(text_lower)
+            for doc_type, doc_patterns in patterns.items():
+                expected_hits = 0
+                expected_weight = 0
+                for pattern in doc_patterns:
+                    if pattern in text_lower:
+                        expected_hits += 1
+                        expected_weight += len(pattern.split()) / 10 + 0.1
+                assert scan[doc_type] == (expected_hits, expected_weight)
+    
+    def test_keyword_automaton_overlapping_keywords(self):
+        """Test palabras clave solapadas y compartidas entre grupos"""
+        from src.services.keyword_automaton import KeywordAutomaton
+        
+        automaton = KeywordAutomaton({
+            'a': ['he', 'she', 'his', 'hers'],
+            'b': ['hers', 'rs', 'x'],
+        }, native=False)
+        
+        assert automaton.scan('ushers') == {'a': (3, 3.0), 'b': (2, 2.0)}
+    
+    def test_classify_many_single_vectorization(self, classifier):
+        """Test clasificación por lotes: una sola llamada a predict_proba y orden preservado"""
+        from unittest.mock import Mock
+        
+        classifier.model = Mock()
+        classifier.model.classes_ = np.array(['cedula', 'estado_cuenta'])
+        classifier.model.predict_proba = Mock(return_value=np.array([[0.2, 0.8], [0.9, 0.1], [0.4, 0.6]]))
+        
+        results = classifier.classify_many(["extracto", "cedula", "extracto 2"])
+        
+        classifier.model.predict_proba.assert_called_once_with(["extracto", "cedula", "extracto 2"])
+        classifier.model.predict.assert_not_called()
+        assert [r.document_type for r in results] == [
+            DocumentType.ESTADO_CUENTA, DocumentType.CEDULA, DocumentType.ESTADO_CUENTA
+        ]
+        assert [r.confidence for r in results] == pytest.approx([0.8, 0.9, 0.6])
+        
+        single = classifier.classify_with_ml("extracto")
+        assert single.document_type == DocumentType.ESTADO_CUENTA
+        assert classifier.model.predict_proba.call_count == 2
+    
+    def test_classify_many_without_model(self, classifier):
+        """Test clasificación por lotes sin modelo: usa patrones"""
+        classifier.model = None
+        texts = ["ESTADO DE CUENTA Banco Saldo", "CÉDULA DE CIUDADANÍA"]
+        
+        results = classifier.classify_many(texts)
+        
+        assert [r.reasoning for r in results] == [classifier.classify_by_patterns(t).reasoning for t in texts]
+        assert classifier.classify_many([]) == []
+    
+    @pytest.fixture
+    def trained_pipeline(self):
+        """Pipeline TF-IDF + Naive Bayes entrenado con textos mínimos"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+        
+        texts = [
+            "cédula de ciudadanía número de documento", "registraduría fecha de nacimiento",
+            "estado de cuenta saldo movimientos", "extracto bancario fecha de corte",
+            "certificación laboral salario cargo", "carta laboral empresa empleado",
+        ]
+        labels = ["cedula", "cedula", "estado_cuenta", "estado_cuenta", "carta_laboral", "carta_laboral"]
+        model = Pipeline([
+            ('tfidf', TfidfVectorizer(ngram_range=(1, 2))),
+            ('classifier', MultinomialNB())
+        ])
+        return model.fit(texts, labels)
+    
+    def test_classifier_artifact_roundtrip(self, trained_pipeline, tmp_path):
+        """Test artefacto: el modelo cargado con mmap predice igual que el original"""
+        from src.services.classifier_artifact import load_classifier_artifact, save_classifier_artifact
+        
+        artifact_dir = save_classifier_artifact(trained_pipeline, tmp_path / "clasificador")
+        loaded = load_classifier_artifact(tmp_path / "clasificador")
+        
+        assert artifact_dir.stat().st_mode & 0o777 == 0o755
+        texts = ["saldo del extracto", "salario del empleado", "documento de la registraduría"]
+        assert isinstance(loaded.named_steps['classifier'].feature_log_prob_, np.memmap)
+        assert list(loaded.predict(texts)) == list(trained_pipeline.predict(texts))
+        np.testing.assert_allclose(loaded.predict_proba(texts), trained_pipeline.predict_proba(texts))
+    
+    def test_classifier_artifact_rejects_incompatible(self, classifier, trained_pipeline, tmp_path):
+        """Test artefacto: versión o checksum inválidos se rechazan al cargar"""
+        import json
+        from src.services.classifier_artifact import (
+            IncompatibleArtifactError, load_classifier_artifact, save_classifier_artifact
+        )
+        
+        artifact_dir = save_classifier_artifact(trained_pipeline, tmp_path / "clasificador")
+        np.save(artifact_dir / "idf.npy", np.zeros(len(trained_pipeline.named_steps['tfidf'].idf_)))
+        with pytest.raises(IncompatibleArtifactError, match="Checksum"):
+            load_classifier_artifact(artifact_dir)
+        
+        artifact_dir = save_classifier_artifact(trained_pipeline, tmp_path / "clasificador")
+        manifest = json.loads((artifact_dir / "manifest.json").read_text())
+        manifest["format_version"] = 99
+        (artifact_dir / "manifest.json").write_text(json.dumps(manifest))
+        with pytest.raises(IncompatibleArtifactError, match="Versión"):
+            load_classifier_artifact(artifact_dir)
+        
+        classifier.artifact_dir = artifact_dir
+        assert classifier.load_model() is False
+        assert classifier.model is None
+    
+    def test_classifier_artifact_swaps_versions(self, trained_pipeline, tmp_path):
+        """Test artefacto: cada guardado publica una versión nueva con un enlace y conserva la anterior"""
+        from src.services.classifier_artifact import load_classifier_artifact, save_classifier_artifact
+        
+        artifact_dir = tmp_path / "clasificador"
+        versions = []
+        for _ in range(3):
+            save_classifier_artifact(trained_pipeline, artifact_dir)
+            assert artifact_dir.is_symlink()
+            versions.append(artifact_dir.resolve())
+        
+        assert len(set(versions)) == 3
+        assert not versions[0].exists()
+        assert versions[1].exists() and versions[2].exists()
+        assert load_classifier_artifact(artifact_dir).predict(["saldo"]) is not None
+    
+    def test_train_incremental_from_jsonl(self, classifier, tmp_path):
+        """Test entrenamiento incremental: bloques acotados, actualización sin reentrenar y artefacto"""
+        import json
+        from unittest.mock import patch
+        from sklearn.naive_bayes import MultinomialNB
+        
+        corpus = tmp_path / "corpus.jsonl"
+        records = [
+            {"text": "estado de cuenta saldo movimientos extracto", "document_type": "estado_cuenta"},
+            {"text": "cédula de ciudadanía registraduría", "document_type": "cedula"},
+            {"text": "extracto bancario fecha de corte saldo", "document_type": "estado_cuenta"},
+            {"text": "documento de identidad fecha de nacimiento", "document_type": "cedula"},
+            {"text": "texto con etiqueta desconocida", "document_type": "factura"},
+        ]
+        corpus.write_text("\n".join(json.dumps(r, ensure_ascii=False) for r in records), encoding="utf-8")
+        classifier.model = None
+        classifier.artifact_dir = tmp_path / "clasificador"
+        
+        with patch.object(MultinomialNB, 'partial_fit', autospec=True,
+                          side_effect=MultinomialNB.partial_fit) as partial_fit:
+            stats = classifier.train_incremental(corpus, chunk_size=2)
+        
+        assert stats['documents'] == 4
+        assert stats['skipped'] == 1
+        assert max(call.args[1].shape[0] for call in partial_fit.call_args_list) <= 2
+        assert classifier.classify_with_ml("saldo del extracto").document_type == DocumentType.ESTADO_CUENTA
+        
+        # Un lote nuevo actualiza los conteos del modelo cargado desde el artefacto
+        assert classifier.load_model()
+        class_count = np.array(classifier.model.steps[-1][1].class_count_)
+        classifier.train_incremental([
+            {"text": "certificación laboral salario cargo empresa", "document_type": "carta_laboral"}
+        ])
+        updated = classifier.model.steps[-1][1].class_count_
+        assert updated.sum() == class_count.sum() + 1
+        assert classifier.classify_with_ml("salario y cargo").document_type == DocumentType.CARTA_LABORAL
+        
+        # Registros en memoria sin texto o tipo se omiten en lugar de interrumpir el entrenamiento
+        stats = classifier.train_incremental([
+            {"text": "extracto bancario saldo", "document_type": "estado_cuenta"},
+            {"text": "registro sin tipo"},
+            {"document_type": "cedula"},
+            {"text": "cédula de ciudadanía", "document_type": "cedula"},
+        ], save=False)
+        assert stats['documents'] == 2
+    
+    def test_model_search_frontier(self):
+        """Test búsqueda de hiperparámetros: validación cruzada, latencia y frontera"""
+        from src.services.model_search import search_classifier
+        
+        corpus = {
+            "cedula": ["cédula de ciudadanía", "registraduría nacional", "documento de identidad",
+                       "fecha de nacimiento y lugar de expedición"],
+            "estado_cuenta": ["estado de cuenta", "extracto bancario saldo", "movimientos del mes",
+                              "fecha de corte y saldo"],
+            "carta_laboral": ["certificación laboral", "salario y cargo", "empresa y empleado",
+                              "recursos humanos contrato"],
+        }
+        texts = [text for texts in corpus.values() for text in texts]
+        labels = [label for label, texts in corpus.items() for _ in texts]
+        grid = {'tfidf__ngram_range': [(1, 1), (1, 2)], 'classifier__alpha': [0.1, 1.0]}
+        
+        result = search_classifier(texts, labels, param_grid=grid, folds=2, n_jobs=2, latency_sample=5)
+        
+        assert len(result['candidates']) == 4
+        assert all(0.0 <= c['accuracy'] <= 1.0 and c['p99_ms'] >= c['p50_ms'] > 0 for c in result['candidates'])
+        frontier = result['frontier']
+        assert [c['p99_ms'] for c in frontier] == sorted(c['p99_ms'] for c in frontier)
+        assert all(a['accuracy'] < b['accuracy'] for a, b in zip(frontier, frontier[1:]))
+        assert result['best'] is frontier[-1]
+    
+    def test_model_search_select_within_budget(self):
+        """Test selección: la combinación más precisa dentro del presupuesto de p99"""
+        from src.services.model_search import pareto_frontier, select_model
+        
+        candidates = [
+            {'params': 'a', 'accuracy': 0.80, 'p99_ms': 1.0},
+            {'params': 'b', 'accuracy': 0.85, 'p99_ms': 3.0},
+            {'params': 'c', 'accuracy': 0.83, 'p99_ms': 4.0},
+            {'params': 'd', 'accuracy': 0.90, 'p99_ms': 8.0},
+        ]
+        
+        frontier = pareto_frontier(candidates)
+        
+        assert [c['params'] for c in frontier] == ['a', 'b', 'd']
+        assert select_model(frontier, p99_budget_ms=5.0)['params'] == 'b'
+        assert select_model(frontier, p99_budget_ms=0.5) is None
+    
+    def test_pattern_scores_ignore_case_and_accents(self, classifier):
+        """Test patrones: el texto de OCR sin tildes ni minúsculas puntúa igual y las siglas coinciden"""
+        accented = "Cédula de ciudadanía. Número de documento: 12345678. Lugar de expedición: Bogotá"
+        ocr_text = "CEDULA DE CIUDADANIA. NUMERO DE DOCUMENTO: 12345678. LUGAR DE EXPEDICION: BOGOTA"
+        
+        assert classifier.classify_by_patterns(ocr_text).confidence == pytest.approx(
+            classifier.classify_by_patterns(accented).confidence
+        )
+        assert classifier.classify_by_patterns(ocr_text).confidence > 0.4
+        
+        scores = classifier._pattern_scores(fold_text("CC 12345678"))
+        assert scores[DocumentType.CEDULA] > 0
+        assert classifier._pattern_scores(fold_text("Dirección y acción"))[DocumentType.CEDULA] == 0
+        assert classifier._pattern_scores(fold_text("PASAPORTE tipo P COL"))[DocumentType.PASAPORTE] > \
+            classifier._pattern_scores(fold_text("PASAPORTE"))[DocumentType.PASAPORTE]
+    
+    def test_extract_features_batch(self, classifier):
+        """Test matriz de características por lotes: mismos valores que por documento y sin dividir por cero"""
+        import re
+        
+        texts = [
+            "ESTADO DE CUENTA\nSaldo: $1,500,000\nFecha de corte: 31/12/2023",
+            "CÉDULA DE CIUDADANÍA 12345678",
+            "",
+            "   \n  ",
+        ]
+        
+        matrix = classifier.extract_features_batch(texts)
+        names = classifier.feature_extractor.feature_names
+        
+        assert matrix.shape == (4, len(names))
+        for row, text in zip(matrix, texts[:2]):
+            features = dict(zip(names, row))
+            text_lower = fold_text(text)
+            for doc_type, patterns in classifier.patterns.items():
+                expected = sum(1 for p in patterns if fold_text(p) in text_lower) / len(patterns)
+                assert features[f"pattern_{doc_type.value}"] == pytest.approx(expected)
+            assert features["has_numbers"] == pytest.approx(len(re.findall(r'\d+', text)) / len(text.split()))
+            assert features["line_count"] == len(text.split('\n'))
+            assert features["word_count"] == len(text.split())
+        assert matrix[0, names.index("has_dates")] == 1.0
+        assert matrix[1, names.index("has_currency")] == 0.0
+        assert not np.isnan(matrix).any()
+        assert matrix[2, names.index("has_numbers")] == 0.0
+        assert classifier.extract_features_batch([]).shape == (0, len(names))
+    
+    def test_classification_cascade(self, classifier):
+        """Test cascada: patrones decisivos se aceptan y solo los ambiguos escalan a ML en un lote"""
+        from unittest.mock import Mock
+        
+        classifier.model = Mock()
+        classifier.model.classes_ = np.array(['cedula', 'carta_laboral'])
+        classifier.model.predict_proba = Mock(return_value=np.array([[0.1, 0.9], [0.8, 0.2]]))
+        
+        decisive = ("CÉDULA DE CIUDADANÍA Número de documento: 12345678 Lugar de expedición: Bogotá "
+                    "Fecha de nacimiento: 15/05/1990 Registraduría Nacional")
+        ambiguous = ["Documento sin contenido específico", "Otro texto general"]
+        
+        results = classifier.classify_many([ambiguous[0], decisive, ambiguous[1]])
+        
+        classifier.model.predict_proba.assert_called_once_with(ambiguous)
+        assert [r.document_type for r in results] == [
+            DocumentType.CARTA_LABORAL, DocumentType.CEDULA, DocumentType.CEDULA
+        ]
+        assert "patrones" in results[1].reasoning
+        stats = classifier.get_cascade_stats()
+        assert stats['calls'] == 3
+        assert stats['escalations'] == 2
+        assert stats['escalation_rate'] == pytest.approx(2 / 3)
+    
     def test_training_data_format(self, classifier):
         """Test formato de datos de entrenamiento"""
         training_data = [
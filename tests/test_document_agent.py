@@ -112,6 +112,243 @@ class TestDocumentProcessingAgent:
         assert 0 <= result.risk_score <= 1
         assert isinstance(result.risk_factors, list)
     
+    @pytest.mark.asyncio
+    async def test_process_pdf_stream(self, agent):
+        """Test clasificación en la primera página y extracción por página del flujo"""
+        from src.models.schemas import ClassificationResult
+        
+        pages = [
+            {'page': 0, 'text': 'ESTADO DE CUENTA\nCuenta: 1234567890'},
+            {'page': 1, 'text': 'Saldo: $1,500,000\nFecha de corte: 31/12/2023'},
+        ]
+        agent.ocr_service.iter_pdf_pages = Mock(return_value=(page for page in pages))
+        agent._classify_document = Mock(return_value=ClassificationResult(
+            document_type=DocumentType.ESTADO_CUENTA, confidence=0.9
+        ))
+        document = Document(
+            id="extracto",
+            filename="extracto.pdf",
+            file_path="/tmp/extracto.pdf",
+            file_size=1024,
+            mime_type="application/pdf"
+        )
+        
+        result = await agent.process_document(document, ['classify', 'extract'])
+        
+        agent._classify_document.assert_called_once()
+        assert result.classification.document_type == DocumentType.ESTADO_CUENTA
+        assert result.extraction.fields['numero_cuenta'] == '1234567890'
+        assert result.extraction.fields['saldo'] == '1,500,000'
+        assert result.extraction.fields['fecha_corte'] == '31/12/2023'
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("full_ocr, expected_pages", [(False, 1), (True, 3)])
+    async def test_process_pdf_stream_early_stop(self, agent, full_ocr, expected_pages):
+        """Test detención del OCR con evidencia suficiente, salvo que se fuerce el OCR completo"""
+        from src.models.schemas import ClassificationResult
+        
+        consumed = []
+        
+        def pages():
+            texts = [
+                "CERTIFICACION LABORAL\nEmpleado: Juan Perez\nEmpresa: Banco Ejemplo\n"
+                "Cargo: Analista\nSalario: $3,500,000\nFecha de ingreso: 01/02/2020",
+                "Pagina de anexos",
+                "Pagina de firmas",
+            ]
+            for page_num, text in enumerate(texts):
+                consumed.append(page_num)
+                yield {'page': page_num, 'text': text}
+        
+        agent.ocr_service.iter_pdf_pages = Mock(return_value=pages())
+        agent._classify_document = Mock(return_value=ClassificationResult(
+            document_type=DocumentType.CARTA_LABORAL, confidence=0.9
+        ))
+        document = Document(
+            id="carta",
+            filename="carta.pdf",
+            file_path="/tmp/carta.pdf",
+            file_size=1024,
+            mime_type="application/pdf"
+        )
+        
+        result = await agent.process_document(document, ['classify', 'extract'], full_ocr=full_ocr)
+        
+        assert len(consumed) == expected_pages
+        assert result.extraction.fields['salario'] == '3,500,000'
+        assert result.extraction.fields['fecha_ingreso'] == '01/02/2020'
+    
+    @pytest.mark.asyncio
+    async def test_process_pdf_stream_bounds_classification(self, agent):
+        """Test que con baja confianza se clasifica solo en las primeras páginas y no en cada una"""
+        from src.models.schemas import ClassificationResult
+        
+        consumed = []
+        
+        def pages():
+            for page_num in range(30):
+                consumed.append(page_num)
+                text = (
+                    "CERTIFICACION LABORAL\nEmpleado: Juan Perez\nEmpresa: Banco Ejemplo\n"
+                    "Cargo: Analista\nSalario: $3,500,000\nFecha de ingreso: 01/02/2020"
+                ) if page_num == 0 else f"Pagina {page_num} de anexos"
+                yield {'page': page_num, 'text': text}
+        
+        agent.ocr_service.iter_pdf_pages = Mock(return_value=pages())
+        agent._classify_document = Mock(return_value=ClassificationResult(
+            document_type=DocumentType.CARTA_LABORAL, confidence=0.4
+        ))
+        document = Document(
+            id="carta_larga",
+            filename="carta_larga.pdf",
+            file_path="/tmp/carta_larga.pdf",
+            file_size=1024,
+            mime_type="application/pdf"
+        )
+        
+        result = await agent.process_document(document, ['classify', 'extract'])
+        
+        assert agent._classify_document.call_count == 2
+        assert len(consumed) == 2
+        assert result.classification.document_type == DocumentType.CARTA_LABORAL
+        assert result.extraction.fields['salario'] == '3,500,000'
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("texts, expected_type, expected_pages", [
+        ([
+            "REPÚBLICA DE COLOMBIA\nCÉDULA DE CIUDADANÍA\nNúmero de documento: 12345678\n"
+            "Nombres: Juan Carlos\nFecha de nacimiento: 15/05/1990\n"
+            "Lugar de expedición: Bogota\nRegistraduría Nacional",
+            "Reverso de la cédula",
+            "Huella"
+        ], DocumentType.CEDULA, 1),
+        ([
+            "BANCO EJEMPLO\nESTADO DE CUENTA\nCuenta: 1234567890123\nTitular: Maria Lopez\n"
+            "Saldo: $1,500,000\nFecha de corte: 31/03/2024",
+            "Movimientos\n05/03/2024 Compra -45.000,00",
+            "15/03/2024 Abono nómina 2.500.000"
+        ], DocumentType.ESTADO_CUENTA, 3),
+    ])
+    async def test_process_pdf_stream_early_stop_with_classifier(self, agent, texts, expected_type, expected_pages):
+        """Test detención temprana con el clasificador por patrones real (sin modelo de ML)"""
+        agent.classifier.model = None
+        consumed = []
+        
+        def pages():
+            for page_num, text in enumerate(texts):
+                consumed.append(page_num)
+                yield {'page': page_num, 'text': text}
+        
+        agent.ocr_service.iter_pdf_pages = Mock(return_value=pages())
+        document = Document(
+            id="stream_real",
+            filename="stream_real.pdf",
+            file_path="/tmp/stream_real.pdf",
+            file_size=1024,
+            mime_type="application/pdf"
+        )
+        
+        result = await agent.process_document(document, ['classify', 'extract'])
+        
+        assert result.classification.document_type == expected_type
+        assert len(consumed) == expected_pages
+        if expected_type == DocumentType.ESTADO_CUENTA:
+            assert result.extraction.fields['movimientos']['count'] == 2
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("zone_ocr, prior_confidence, lugar, uses_zones, full_ocr_calls", [
+        (False, 0.95, "BOGOTA", False, 1),   # Sin pedirlo no se usan zonas
+        (True, 0.5, "BOGOTA", False, 1),     # Tipo dudoso: OCR completo
+        (True, 0.95, "BOGOTA", True, 0),     # Tipo confiable y campos completos
+        (True, 0.95, "", False, 1),          # Falta un campo: OCR completo
+    ])
+    async def test_process_document_zone_ocr(self, agent, zone_ocr, prior_confidence, lugar,
+                                             uses_zones, full_ocr_calls):
+        """Test que el OCR por zonas es opcional, exige clasificación confiable y cae al OCR completo"""
+        zone_texts = {
+            'numero_documento': '12345678',
+            'apellidos': 'PEREZ GOMEZ',
+            'nombres': 'JUAN CARLOS',
+            'fecha_nacimiento': '15/05/1990',
+            'lugar_expedicion': lugar
+        }
+        agent.ocr_service.extract_zones = Mock(return_value={
+            'fields': {field: {'text': text, 'confidence': 0.9} for field, text in zone_texts.items()},
+            'text': '\n'.join(text for text in zone_texts.values() if text),
+            'word_count': 7,
+            'pixel_ratio': 0.3,
+            'processing_time': 0.1
+        })
+        agent.ocr_service.extract_text = Mock(return_value={
+            'text': "CÉDULA DE CIUDADANÍA\nNúmero de documento: 87654321", 'confidence': 0.9
+        })
+        document = Document(
+            id="cedula_zonas",
+            filename="cedula.png",
+            file_path="/tmp/cedula.png",
+            document_type=DocumentType.CEDULA,
+            classification_confidence=prior_confidence,
+            file_size=1024,
+            mime_type="image/png"
+        )
+        
+        result = await agent.process_document(document, ['classify', 'extract'], zone_ocr=zone_ocr)
+        
+        assert agent.ocr_service.extract_zones.called == (zone_ocr and prior_confidence >= 0.9)
+        assert agent.ocr_service.extract_text.call_count == full_ocr_calls
+        expected_number = '12345678' if uses_zones else '87654321'
+        assert result.extraction.fields['numero_documento'] == expected_number
+        if uses_zones:
+            assert result.classification.confidence == prior_confidence
+    
+    @pytest.mark.asyncio
+    async def test_process_pdf_stream_early_stop_default_actions(self, agent):
+        """Test que la detención temprana también aplica con las acciones por defecto de la API"""
+        from src.models.schemas import AgentRequest
+        
+        agent.classifier.model = None
+        consumed = []
+        texts = [
+            "REPÚBLICA DE COLOMBIA\nCÉDULA DE CIUDADANÍA\nNúmero de documento: 12345678\n"
+            "Nombres: Juan Carlos\nFecha de nacimiento: 15/05/1990\n"
+            "Lugar de expedición: Bogota\nRegistraduría Nacional",
+            "Reverso de la cédula",
+            "Huella"
+        ]
+        
+        def pages():
+            for page_num, text in enumerate(texts):
+                consumed.append(page_num)
+                yield {'page': page_num, 'text': text}
+        
+        agent.ocr_service.iter_pdf_pages = Mock(return_value=pages())
+        document = Document(
+            id="stream_default",
+            filename="stream_default.pdf",
+            file_path="/tmp/stream_default.pdf",
+            file_size=1024,
+            mime_type="application/pdf"
+        )
+        
+        result = await agent.process_document(document, AgentRequest(document_id=document.id).actions)
+        
+        assert len(consumed) == 1
+        assert result.classification.document_type == DocumentType.CEDULA
+        assert result.fraud_detection is not None
+    
+    @pytest.mark.asyncio
+    async def test_process_request_forwards_ocr_options(self, agent):
+        """Test que process_request pasa full_ocr y zone_ocr de la solicitud"""
+        from src.models.schemas import AgentRequest
+        
+        agent.process_document = AsyncMock(return_value=None)
+        request = AgentRequest(document_id="doc_zonas", actions=['extract'], full_ocr=True, zone_ocr=True)
+        
+        await agent.process_request(request)
+        
+        args = agent.process_document.call_args.args
+        assert args[1:] == (['extract'], True, True)
+    
     def cleanup_temp_files(self, sample_document):
         """Limpia archivos temporales"""
         try:
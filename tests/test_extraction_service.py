@@ -0,0 +1,256 @@
+"""
+Tests para el servicio de extracción de datos
+"""
+import pytest
+
+from src.core.config import DOCUMENT_CONFIG, MODEL_CONFIG
+from src.services.extraction_service import DataExtractionService
+from src.models.schemas import DocumentType
+
+
+class TestDataExtractionService:
+    
+    @pytest.fixture
+    def extractor(self):
+        return DataExtractionService()
+    
+    def test_extract_cedula_with_regex(self, extractor):
+        """Test extracción de cédula con regex"""
+        text = "CC: 12345678\nFecha de nacimiento: 15/05/1990"
+        
+        data, scores = extractor.extract_with_regex(text, DocumentType.CEDULA)
+        
+        assert data['numero_documento'] == '12345678'
+        assert data['fecha_nacimiento'] == '15/05/1990'
+        assert scores['numero_documento'] == 0.8
+    
+    def test_extract_from_zones(self, extractor):
+        """Test extracción desde fragmentos de zonas de plantilla"""
+        zone_fields = {
+            'numero_documento': {'text': 'NUMERO 1.234.567.890', 'confidence': 0.95},
+            'apellidos': {'text': 'APELLIDOS\nPEREZ GONZALEZ', 'confidence': 0.9},
+            'nombres': {'text': 'JUAN  CARLOS', 'confidence': 0.7},
+            'fecha_nacimiento': {'text': '15/05/1990', 'confidence': 0.9},
+            'lugar_expedicion': {'text': '', 'confidence': 0.0}
+        }
+        
+        data, scores = extractor.extract_from_zones(zone_fields, DocumentType.CEDULA)
+        
+        assert data['numero_documento'] == '1234567890'
+        assert data['apellidos'] == 'PEREZ GONZALEZ'
+        assert data['nombres'] == 'JUAN CARLOS'
+        assert data['fecha_nacimiento'] == '15/05/1990'
+        assert 'lugar_expedicion' not in data
+        assert scores['nombres'] == 0.7
+        assert scores['numero_documento'] == 0.9
+    
+    def test_extract_data_prefers_zones(self, extractor):
+        """Test que los campos de zonas tienen prioridad sobre el texto completo"""
+        zone_fields = {'numero_documento': {'text': '87654321', 'confidence': 0.9}}
+        text = "CC: 12345678\nFecha de nacimiento: 15/05/1990"
+        
+        result = extractor.extract_data(text, DocumentType.CEDULA, use_nlp=False, zone_fields=zone_fields)
+        
+        assert result.fields['numero_documento'] == '87654321'
+        assert result.fields['fecha_nacimiento'] == '15/05/1990'
+    
+    @pytest.mark.parametrize("document_type,text", [
+        (DocumentType.CARTA_LABORAL,
+         "Certificamos que el Señor Juan Perez\nEmpresa: Acme S.A.\nCargo: Analista\n"
+         "Salario: $3,500,000\nFecha de ingreso: 01/02/2020\n"),
+        (DocumentType.ESTADO_CUENTA,
+         "Cliente: Maria Lopez\nCuenta: 1234567890123\n" + "01/03/2024 Compra $45,000\n" * 200 +
+         "Saldo disponible: $1,234,567.89\nFecha de corte: 31/03/2024\n"),
+        (DocumentType.SOLICITUD_CREDITO,
+         "Nombres: Ana Ruiz\nMonto solicitado\nMonto: $10,000,000\nPlazo: 36 meses\n"),
+    ])
+    def test_extract_with_regex_matches_per_field_search(self, extractor, document_type, text):
+        """Test que el recorrido único da la misma primera coincidencia que cada patrón por separado"""
+        import re
+        
+        expected = {}
+        for field, pattern in extractor.patterns[document_type.value].items():
+            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
+            if matches:
+                expected[field] = matches[0]
+        
+        engine = extractor.regex_engines[document_type.value]
+        assert engine.search_first(text) == expected
+        assert engine.search_first(text, ['cargo', 'plazo']) == {
+            field: value for field, value in expected.items() if field in ('cargo', 'plazo')
+        }
+    
+    def test_regex_engine_stops_when_fields_found(self):
+        """Test que el recorrido se detiene al encontrar todos los campos pedidos"""
+        from src.services.regex_engine import FieldRegexEngine, leading_group
+        
+        assert leading_group(r"(?:Saldo|Disponible)\s*:?\s*\$?([\d,]+)") == "(?:Saldo|Disponible)"
+        assert leading_group(r"([(])x") == "([(])"
+        assert leading_group(r"Saldo: (\d+)") is None
+        
+        engine = FieldRegexEngine({'saldo': r"(?:Saldo)\s*:?\s*(\d+)", 'corte': r"(?:Corte)\s*:?\s*(\d+)"})
+        scanner = engine.scanner
+        visited = []
+        
+        class CountingScanner:
+            def finditer(self, text):
+                for candidate in scanner.finditer(text):
+                    visited.append(candidate.start())
+                    yield candidate
+        
+        engine.scanner = CountingScanner()
+        text = "Saldo: 100\nCorte: 31\n" + "Saldo: 200\n" * 1000
+        
+        assert engine.search_first(text) == {'saldo': '100', 'corte': '31'}
+        assert len(visited) == 2
+        assert engine.search_first(text, fields=['saldo']) == {'saldo': '100'}
+        assert len(visited) == 3
+        assert engine.search_first(text, fields=[]) == {}
+    
+    @pytest.fixture
+    def ner_extractor(self, monkeypatch):
+        """Extractor con un pipeline de spaCy en blanco que imita al modelo completo"""
+        import spacy
+        from src.services import extraction_service
+        
+        def fake_load(model_name):
+            nlp = spacy.blank("es")
+            nlp.add_pipe("sentencizer")
+            ruler = nlp.add_pipe("entity_ruler", name="ner")
+            ruler.add_patterns([
+                {"label": "PER", "pattern": "Juan Perez"},
+                {"label": "ORG", "pattern": "Acme"},
+                {"label": "LOC", "pattern": "Bogotá"},
+                {"label": "MONEY", "pattern": [{"TEXT": "$"}, {"LIKE_NUM": True}]}
+            ])
+            return nlp
+        
+        monkeypatch.setattr(extraction_service.spacy, "load", fake_load)
+        return DataExtractionService()
+    
+    def test_ner_pipeline_keeps_only_ner(self, ner_extractor):
+        """Test que el pipeline cargado solo ejecuta el NER"""
+        assert ner_extractor.nlp.pipe_names == ["ner"]
+        assert "sentencizer" in ner_extractor.nlp.disabled
+    
+    def test_extract_with_nlp_batch(self, ner_extractor):
+        """Test extracción NLP por lotes con solo las entidades PER, ORG y MONEY"""
+        texts = [
+            "Juan Perez trabaja en Acme, Bogotá, con salario de $ 3500000",
+            "Sin entidades",
+            "Saldo $ 1200 a nombre de Juan Perez"
+        ]
+        types = [DocumentType.CARTA_LABORAL, DocumentType.CEDULA, DocumentType.ESTADO_CUENTA]
+        
+        entities = list(ner_extractor.extract_entities_batch(texts, batch_size=2))
+        assert entities[0] == [("PER", "Juan Perez"), ("ORG", "Acme"), ("MONEY", "$ 3500000")]
+        assert entities[1] == []
+        
+        results = ner_extractor.extract_with_nlp_batch(texts, types, batch_size=2)
+        assert len(results) == 3
+        assert results[0][0] == {"nombres": "Juan Perez", "empresa": "Acme", "salario": "3500000"}
+        assert results[1] == ({}, {})
+        assert results[2][0] == {"saldo": "1200", "nombres": "Juan Perez"}
+        assert ner_extractor.extract_with_nlp(texts[2], types[2]) == results[2]
+    
+    def test_extract_data_skips_nlp_when_regex_covers_fields(self, ner_extractor, monkeypatch):
+        """Test que el NLP no se ejecuta si regex llenó los campos que el NLP podría aportar"""
+        calls = []
+        original = ner_extractor.extract_with_nlp
+        monkeypatch.setattr(
+            ner_extractor, "extract_with_nlp",
+            lambda text, document_type: calls.append(text) or original(text, document_type)
+        )
+        
+        text = "CC: 12345678\nNombres: Juan Perez\nFecha de nacimiento: 15/05/1990"
+        result = ner_extractor.extract_data(text, DocumentType.CEDULA)
+        
+        assert calls == []
+        assert result.fields['nombres'].startswith('Juan Perez')
+        assert ner_extractor.get_nlp_stats()['skip_rate'] == 1.0
+    
+    def test_extract_data_runs_nlp_without_expected_fields(self, ner_extractor):
+        """Test que los tipos sin EXTRACTION_FIELDS siguen usando NLP sobre el texto completo"""
+        text = "CONTRATO entre Juan Perez y Acme SAS, firmado el 01/02/2023"
+        result = ner_extractor.extract_data(text, DocumentType.CONTRATO)
+        
+        assert result.fields == {
+            'nombres': 'Juan Perez', 'empresa': 'Acme', 'fecha_nacimiento': '01/02/2023'
+        }
+        stats = ner_extractor.get_nlp_stats()
+        assert stats['calls'] == 1 and stats['skipped'] == 0
+    
+    def test_extract_data_runs_nlp_on_windows(self, ner_extractor, monkeypatch):
+        """Test que el NLP procesa solo las ventanas de los campos faltantes"""
+        monkeypatch.setitem(DOCUMENT_CONFIG, 'nlp_window_chars', 40)
+        calls = []
+        original = ner_extractor.extract_with_nlp
+        monkeypatch.setattr(
+            ner_extractor, "extract_with_nlp",
+            lambda text, document_type: calls.append(text) or original(text, document_type)
+        )
+        
+        text = (
+            "Empleado: Juan Perez\nCargo: Analista\nSalario: $3,500,000\nFecha de ingreso: 01/02/2020\n"
+            + "Texto de relleno sin datos. " * 200
+            + "\nEmpresa: 123 Acme\n"
+            + "Más relleno. " * 200
+        )
+        result = ner_extractor.extract_data(text, DocumentType.CARTA_LABORAL)
+        
+        assert ner_extractor.plan_nlp_fields(DocumentType.CARTA_LABORAL, {'empleado': 'x'}) == [
+            'empresa', 'salario'
+        ]
+        assert len(calls) == 1
+        assert len(calls[0]) < 120 and "Acme" in calls[0]
+        assert result.fields['empresa'] == 'Acme'
+        assert result.fields['empleado'].startswith('Juan Perez')
+        
+        stats = ner_extractor.get_nlp_stats()
+        assert stats['calls'] == 1 and stats['skipped'] == 0 and stats['window_rate'] == 1.0
+    
+    def test_text_windows_cover_text_with_overlap(self):
+        """Test que las ventanas cubren el texto, se solapan y no parten palabras"""
+        from src.services.extraction_service import text_windows
+        
+        text = "palabra " * 1000
+        spans = text_windows(text, 500, 50)
+        
+        assert spans[0][0] == 0 and spans[-1][1] == len(text)
+        for (start, end), (next_start, _) in zip(spans, spans[1:]):
+            assert end - start <= 500
+            assert next_start < end
+            assert text[end] == ' '
+        assert text_windows("corto", 500, 50) == [(0, 5)]
+    
+    def test_entity_spans_in_windows_match_whole_text(self, ner_extractor, monkeypatch):
+        """Test que las entidades por ventanas tienen las mismas posiciones que sobre el texto completo"""
+        text = "".join(
+            f"Línea {i} pago a Juan Perez de Acme por $ {i}00 en Bogotá.\n" for i in range(300)
+        )
+        whole = [
+            (ent.label_, ent.text, ent.start_char, ent.end_char)
+            for ent in ner_extractor.nlp(text).ents if ent.label_ != "LOC"
+        ]
+        
+        window_sizes = []
+        original_pipe = ner_extractor.nlp.pipe
+        
+        def spy_pipe(items, **kwargs):
+            for item in original_pipe(items, **kwargs):
+                doc = item[0] if isinstance(item, tuple) else item
+                window_sizes.append(len(doc.text))
+                yield item
+        
+        monkeypatch.setitem(MODEL_CONFIG, 'nlp_chunk_chars', 700)
+        monkeypatch.setitem(MODEL_CONFIG, 'nlp_chunk_overlap_chars', 60)
+        monkeypatch.setattr(ner_extractor.nlp, "pipe", spy_pipe)
+        spans = list(ner_extractor.extract_entity_spans_batch([text, "Acme", ""]))
+        monkeypatch.undo()
+        
+        assert spans[0] == whole
+        assert spans[1] == [("ORG", "Acme", 0, 4)]
+        assert spans[2] == []
+        assert len(window_sizes) > 20 and max(window_sizes) <= 700
+        for label, entity_text, start, end in spans[0]:
+            assert text[start:end] == entity_text
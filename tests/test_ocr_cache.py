@@ -0,0 +1,61 @@
+"""
+Tests para la caché persistente de resultados de OCR
+"""
+import pytest
+
+from src.services.ocr_cache import OCRCache
+
+
+class TestOCRCache:
+    
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return OCRCache(tmp_path / "ocr_cache", max_bytes=1024)
+    
+    @pytest.fixture
+    def sample_file(self, tmp_path):
+        path = tmp_path / "documento.png"
+        path.write_bytes(b"contenido de prueba")
+        return str(path)
+    
+    def test_get_put_roundtrip(self, cache):
+        """Test almacenamiento y lectura de un resultado"""
+        key = OCRCache.make_key("abc", "tesseract", "--psm 6", 0)
+        
+        assert cache.get(key) is None
+        cache.put(key, {'text': 'CÉDULA', 'confidence': 0.9, 'word_count': 1})
+        result = cache.get(key)
+        
+        assert result['text'] == 'CÉDULA'
+        assert result['from_cache'] is True
+        
+        stats = cache.get_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
+    
+    def test_key_depends_on_all_components(self, cache, sample_file):
+        """Test que la clave cambia con motor, configuración y página"""
+        base = cache.key_for_file(sample_file, "tesseract", "--psm 6", 0)
+        
+        assert base == cache.key_for_file(sample_file, "tesseract", "--psm 6", 0)
+        assert base != cache.key_for_file(sample_file, "easyocr", "--psm 6", 0)
+        assert base != cache.key_for_file(sample_file, "tesseract", "--psm 3", 0)
+        assert base != cache.key_for_file(sample_file, "tesseract", "--psm 6", 1)
+    
+    def test_key_for_missing_file(self, cache):
+        """Test clave para archivo inexistente"""
+        assert cache.key_for_file("no_existe.png", "tesseract", "") is None
+    
+    def test_lru_eviction(self, cache):
+        """Test desalojo de la entrada menos usada recientemente"""
+        payload = {'text': 'x' * 400}
+        cache.put("a", payload)
+        cache.put("b", payload)
+        cache.get("a")
+        cache.put("c", payload)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.get_stats()['evictions'] == 1
@@ -3,19 +3,22 @@ Tests unitarios para el servicio de OCR
 """
 import pytest
 import tempfile
+from unittest.mock import Mock
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from pathlib import Path
 
+from src.models.schemas import DocumentType
+from src.services.ocr_cache import OCRCache
 from src.services.ocr_service import OCRService
 
 
 class TestOCRService:
     
     @pytest.fixture
-    def ocr_service(self):
-        return OCRService()
+    def ocr_service(self, tmp_path):
+        return OCRService(cache=OCRCache(tmp_path / "ocr_cache"))
     
     @pytest.fixture
     def sample_image(self):
@@ -78,6 +81,206 @@ class TestOCRService:
         assert isinstance(processed, np.ndarray)
         assert len(processed.shape) == 2  # Imagen en escala de grises
     
+    def test_preprocess_in_memory_images(self, ocr_service, sample_image):
+        """Test preprocesamiento de imágenes PIL y NumPy sin archivos intermedios"""
+        from_path = ocr_service.preprocess_image(sample_image)
+        
+        pil_image = Image.open(sample_image)
+        assert np.array_equal(ocr_service.preprocess_image(pil_image), from_path)
+        
+        bgr_image = cv2.imread(sample_image)
+        assert np.array_equal(ocr_service.preprocess_image(bgr_image), from_path)
+        
+        gray_image = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2GRAY)
+        assert ocr_service.preprocess_image(gray_image).shape == from_path.shape
+    
+    @staticmethod
+    def _text_page(font_size):
+        """Página de sondeo con texto de un tamaño dado"""
+        img = Image.new('L', (600, 400), color=255)
+        draw = ImageDraw.Draw(img)
+        font = ImageFont.load_default(size=font_size)
+        for y in range(20, 360, font_size * 2):
+            draw.text((10, y), "SALDO ANTERIOR 1.250.000 PAGO PSE", fill=0, font=font)
+        return img
+    
+    def test_estimate_text_height(self, ocr_service):
+        """Test estimación de altura de texto"""
+        small = ocr_service.estimate_text_height(self._text_page(10))
+        large = ocr_service.estimate_text_height(self._text_page(30))
+        
+        assert small is not None and large is not None
+        assert large > small * 2
+        assert ocr_service.estimate_text_height(Image.new('L', (200, 200), color=255)) is None
+    
+    def test_plan_page_dpi_prefers_low_dpi_for_large_print(self, ocr_service):
+        """Test planificador de DPI: letra grande requiere menos DPI"""
+        ocr_service._rasterize_page = Mock(return_value=self._text_page(30))
+        large_dpi, _ = ocr_service.plan_page_dpi('documento.pdf', 0)
+        
+        ocr_service._rasterize_page = Mock(return_value=self._text_page(8))
+        small_dpi, _ = ocr_service.plan_page_dpi('documento.pdf', 0)
+        
+        assert large_dpi < small_dpi
+    
+    @pytest.mark.parametrize("points, expected_dpi", [(8, 200), (10, 200), (12, 150), (18, 100)])
+    def test_plan_page_dpi_for_font_sizes(self, ocr_service, points, expected_dpi):
+        """Test DPI planificada para tamaños de letra conocidos: nunca por encima de pdf_dpi"""
+        def rasterize(path, page, dpi, grayscale=False):
+            size = round(points * dpi / 72)
+            img = Image.new('L', (int(8.5 * dpi), 3 * dpi), color=255)
+            draw = ImageDraw.Draw(img)
+            font = ImageFont.load_default(size=size)
+            for line in range(6):
+                draw.text((10, 10 + line * size * 1.4), "Numero de documento: 12345678 Nombres: Juan Perez",
+                          fill=0, font=font)
+            return img
+        
+        ocr_service._rasterize_page = Mock(side_effect=rasterize)
+        
+        dpi, _ = ocr_service.plan_page_dpi('documento.pdf', 0)
+        
+        assert dpi == expected_dpi
+    
+    @pytest.mark.parametrize("planned_dpi, expected_dpis", [
+        (100, [100, 150]),  # Un solo reintento aunque la confianza siga baja
+        (200, [200, 300]),  # Por encima de pdf_dpi solo mediante el reintento
+    ])
+    def test_adaptive_dpi_retries_at_most_once(self, ocr_service, planned_dpi, expected_dpis):
+        """Test que la DPI adaptativa no encadena rasterizaciones con confianza baja"""
+        ocr_service.plan_page_dpi = Mock(return_value=(planned_dpi, 10.0))
+        ocr_service._rasterize_page = Mock(side_effect=lambda path, page, dpi: Image.new('L', (10, 10)))
+        ocr_service.extract_text = Mock(side_effect=lambda *args, **kwargs: {'text': 'x', 'confidence': 0.3})
+        
+        result = ocr_service._ocr_pdf_page_adaptive('documento.pdf', 0)
+        
+        assert [call.args[2] for call in ocr_service._rasterize_page.call_args_list] == expected_dpis
+        assert result['dpi'] == planned_dpi
+    
+    def test_extract_zones(self, ocr_service, sample_image):
+        """Test OCR solo de las zonas de plantilla de una cédula"""
+        ocr_service.extract_with_tesseract = Mock(return_value={
+            'text': '12345678', 'confidence': 0.9, 'word_count': 1, 'method': 'tesseract'
+        })
+        
+        result = ocr_service.extract_zones(sample_image, DocumentType.CEDULA)
+        
+        assert set(result['fields']) == {
+            'numero_documento', 'apellidos', 'nombres', 'fecha_nacimiento', 'lugar_expedicion'
+        }
+        assert result['pixel_ratio'] < 0.5
+        assert ocr_service.extract_with_tesseract.call_count == 5
+    
+    def test_extract_zones_without_template(self, ocr_service, sample_image):
+        """Test OCR por zonas de un tipo sin plantilla"""
+        with pytest.raises(ValueError):
+            ocr_service.extract_zones(sample_image, DocumentType.CONTRATO)
+    
+    def test_extract_batch_preserves_order(self, ocr_service):
+        """Test OCR por lotes agrupado por tamaño y en orden de entrada"""
+        calls = []
+        
+        def readtext_batched(batch, batch_size):
+            calls.append([img.shape for img in batch])
+            return [[([[0, 0], [1, 0], [1, 1], [0, 1]], f"{img.shape[1]}x{img.shape[0]}", 0.9)]
+                    for img in batch]
+        
+        ocr_service.easyocr_reader = Mock(readtext_batched=readtext_batched)
+        images = [
+            np.full((100, 200, 3), 255, dtype=np.uint8),
+            np.full((600, 300), 255, dtype=np.uint8),
+            np.full((120, 180, 3), 255, dtype=np.uint8),
+            "invalid_path.jpg"
+        ]
+        
+        results = ocr_service.extract_batch(images, batch_size=4)
+        
+        assert [r['text'] for r in results[:3]] == ['256x256', '512x768', '256x256']
+        assert 'error' in results[3]
+        assert sorted(len(batch) for batch in calls) == [1, 2]
+    
+    def test_iter_pdf_pages_in_order(self, ocr_service):
+        """Test flujo de páginas: capa de texto inmediata y OCR solo donde falta"""
+        digital = "EXTRACTO BANCARIO Cuenta: 1234567890 Saldo: $1,500,000"
+        ocr_service.extract_pdf_text_layer = Mock(return_value=[digital, '', digital])
+        ocr_service._ocr_page_range = Mock(side_effect=lambda path, first, last, method, dpi: [{
+            'page': first, 'text': 'pagina escaneada', 'confidence': 0.8,
+            'word_count': 2, 'method': 'tesseract'
+        }])
+        
+        pages = list(ocr_service.iter_pdf_pages('extracto.pdf', max_workers=1))
+        
+        assert [p['page'] for p in pages] == [0, 1, 2]
+        assert [p['method'] for p in pages] == ['text_layer', 'tesseract', 'text_layer']
+        ocr_service._ocr_page_range.assert_called_once()
+    
+    def test_iter_pdf_pages_uses_cache_and_caps_pool(self, ocr_service, tmp_path, monkeypatch):
+        """Test flujo de páginas: caché por página, RSS reportada y sin pool para una sola página con OCR"""
+        from src.services import ocr_service as ocr_module
+        
+        pdf_path = tmp_path / "extracto.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4 contenido de prueba")
+        digital = "EXTRACTO BANCARIO Cuenta: 1234567890 Saldo: $1,500,000"
+        ocr_service.extract_pdf_text_layer = Mock(return_value=[digital, ''])
+        ocr_service._ocr_page_range = Mock(side_effect=lambda path, first, last, method, dpi: [{
+            'page': first, 'text': 'pagina escaneada', 'confidence': 0.8,
+            'word_count': 2, 'method': 'tesseract'
+        }])
+        monkeypatch.setattr(ocr_module, 'ProcessPoolExecutor', Mock(side_effect=AssertionError("pool")))
+        
+        first = list(ocr_service.iter_pdf_pages(str(pdf_path), max_workers=8))
+        second = list(ocr_service.iter_pdf_pages(str(pdf_path), max_workers=8))
+        
+        ocr_service._ocr_page_range.assert_called_once()
+        assert [p['text'] for p in second] == [p['text'] for p in first]
+        assert second[1]['method'] == 'tesseract'
+        assert all(p['peak_rss_mb'] > 0 for p in first + second)
+        assert ocr_service.get_cache_stats()['hits'] == 1
+    
+    def test_plan_raster_memory_respects_ceiling(self, ocr_service, monkeypatch):
+        """Test planificador de memoria: limita procesos y reduce la DPI si no cabe una página"""
+        from src.services import ocr_service as ocr_module
+        
+        config = dict(ocr_module.OCR_CONFIG, adaptive_dpi=False, pdf_dpi=200,
+                      raster_window_pages=1, raster_memory_factor=4)
+        monkeypatch.setattr(ocr_module, 'OCR_CONFIG', config)
+        ocr_service._largest_page_size = Mock(return_value=(8.5, 11.0))
+        
+        # Carta a 200 DPI: 1700x2200x3x4 bytes ~ 43MB por página
+        config['max_document_memory_mb'] = 100
+        assert ocr_service.plan_raster_memory('extracto.pdf', 8) == (200, 2)
+        
+        config['max_document_memory_mb'] = 20
+        dpi, workers = ocr_service.plan_raster_memory('extracto.pdf', 8)
+        assert workers == 1
+        assert dpi < 200
+        assert 8.5 * dpi * 11.0 * dpi * 3 * 4 <= 20 * 1024 * 1024
+    
+    def test_ocr_page_range_rasterizes_in_windows(self, ocr_service, monkeypatch):
+        """Test rasterización por ventanas: nunca se convierte el bloque completo de una vez"""
+        import pdf2image
+        from src.services import ocr_service as ocr_module
+        
+        monkeypatch.setattr(ocr_module, 'OCR_CONFIG', dict(
+            ocr_module.OCR_CONFIG, adaptive_dpi=False, raster_window_pages=2
+        ))
+        calls = []
+        
+        def fake_convert(path, dpi, first_page, last_page):
+            calls.append((first_page, last_page))
+            return [Image.new('RGB', (50, 50), 'white') for _ in range(first_page, last_page + 1)]
+        
+        monkeypatch.setattr(pdf2image, 'convert_from_path', fake_convert)
+        ocr_service.extract_text = Mock(side_effect=lambda image, method, use_cache: {
+            'text': 'pagina', 'confidence': 0.9, 'word_count': 1, 'method': 'tesseract'
+        })
+        
+        pages = ocr_service._ocr_page_range('extracto.pdf', 0, 4, 'tesseract', 150)
+        
+        assert calls == [(1, 2), (3, 4), (5, 5)]
+        assert [p['page'] for p in pages] == [0, 1, 2, 3, 4]
+        assert all(p['dpi'] == 150 and p['rss_mb'] > 0 for p in pages)
+    
     def test_invalid_image_path(self, ocr_service):
         """Test con ruta de imagen inválida"""
         result = ocr_service.extract_text("invalid_path.jpg")
@@ -100,6 +303,127 @@ class TestOCRService:
         with pytest.raises(ValueError):
             ocr_service.extract_text(sample_image, method='unsupported')
     
+    def test_merge_page_results(self):
+        """Test combinación de resultados por página"""
+        pages = [
+            {'page': 1, 'text': 'segunda', 'confidence': 0.5, 'word_count': 1, 'method': 'tesseract'},
+            {'page': 0, 'text': 'primera pagina', 'confidence': 0.8, 'word_count': 2, 'method': 'easyocr'},
+        ]
+        
+        result = OCRService._merge_page_results(pages)
+        
+        assert result['text'] == 'primera pagina\n\nsegunda'
+        assert result['word_count'] == 3
+        assert result['page_count'] == 2
+        assert result['confidence'] == pytest.approx((0.8 * 2 + 0.5) / 3)
+        assert [p['page'] for p in result['pages']] == [0, 1]
+    
+    def test_extract_from_pdf_pages_invalid_path(self, ocr_service):
+        """Test OCR multipágina con PDF inexistente"""
+        result = ocr_service.extract_from_pdf_pages("invalid_path.pdf")
+        
+        assert result['confidence'] == 0.0
+        assert 'error' in result
+    
+    def test_is_usable_text_layer(self):
+        """Test detección de capa de texto utilizable"""
+        assert OCRService._is_usable_text_layer("EXTRACTO BANCARIO Cuenta: 1234567890 Saldo: $1,500,000")
+        assert not OCRService._is_usable_text_layer("")
+        assert not OCRService._is_usable_text_layer("   \n  ")
+        assert not OCRService._is_usable_text_layer("(cid:12)(cid:45)(cid:78)(cid:90)(cid:11)(cid:3)")
+        assert not OCRService._is_usable_text_layer("\ufffd\ufffd\ufffd\ufffd" * 10)
+        assert not OCRService._is_usable_text_layer("EXTRACTOBANCARIOCUENTA1234567890SALDOTOTAL")
+    
+    def test_page_ranges(self):
+        """Test agrupación de páginas en rangos contiguos"""
+        assert OCRService._page_ranges([0, 1, 2, 3, 4], 2) == [(0, 1), (2, 3), (4, 4)]
+        assert OCRService._page_ranges([5, 1, 2, 7], 4) == [(1, 2), (5, 5), (7, 7)]
+    
+    def test_cascade_skips_easyocr_when_tesseract_is_good(self, ocr_service):
+        """Test cascada: no se escala a EasyOCR si Tesseract supera el umbral"""
+        ocr_service.extract_with_tesseract = Mock(return_value={
+            'text': 'CEDULA DE CIUDADANIA 12345678', 'confidence': 0.95,
+            'word_count': 4, 'method': 'tesseract'
+        })
+        ocr_service.extract_with_easyocr = Mock()
+        
+        result = ocr_service.extract_text('imagen.png', method='cascade')
+        
+        assert result['method'] == 'tesseract'
+        ocr_service.extract_with_easyocr.assert_not_called()
+        assert ocr_service.get_engine_stats()['tesseract_hit_rate'] == 1.0
+    
+    def test_cascade_escalates_hard_images(self, ocr_service):
+        """Test cascada: imágenes difíciles se escalan a EasyOCR"""
+        ocr_service.extract_with_tesseract = Mock(return_value={
+            'text': 'C3DU', 'confidence': 0.3, 'word_count': 1, 'method': 'tesseract'
+        })
+        ocr_service.extract_with_easyocr = Mock(return_value={
+            'text': 'CEDULA DE CIUDADANIA', 'confidence': 0.9, 'word_count': 3, 'method': 'easyocr'
+        })
+        
+        result = ocr_service.extract_text('imagen.png', method='cascade')
+        
+        assert result['method'] == 'easyocr'
+        assert ocr_service.get_engine_stats()['escalation_rate'] == 1.0
+    
+    def test_concurrent_returns_good_result(self, ocr_service):
+        """Test modo concurrente con ambos motores"""
+        ocr_service.extract_with_tesseract = Mock(return_value={
+            'text': 'texto', 'confidence': 0.2, 'word_count': 1, 'method': 'tesseract'
+        })
+        ocr_service.extract_with_easyocr = Mock(return_value={
+            'text': 'CEDULA DE CIUDADANIA', 'confidence': 0.9, 'word_count': 3, 'method': 'easyocr'
+        })
+        
+        result = ocr_service.extract_text('imagen.png', method='concurrent')
+        
+        assert result['method'] == 'easyocr'
+        assert ocr_service.get_engine_stats()['calls'] == 1
+    
+    def test_repeated_image_uses_cache(self, ocr_service, sample_image):
+        """Test que una imagen repetida no vuelve a pasar por OCR"""
+        ocr_service.extract_with_tesseract = Mock(return_value={
+            'text': 'CEDULA DE CIUDADANIA', 'confidence': 0.9, 'word_count': 3, 'method': 'tesseract'
+        })
+        
+        first = ocr_service.extract_text(sample_image, method='tesseract')
+        second = ocr_service.extract_text(sample_image, method='tesseract')
+        
+        assert ocr_service.extract_with_tesseract.call_count == 1
+        assert second['text'] == first['text']
+        assert second['from_cache'] is True
+        assert ocr_service.get_cache_stats()['hits'] == 1
+    
+    def test_cache_can_be_disabled(self, sample_image):
+        """Test que use_cache=False no crea caché aunque cache_enabled esté activo"""
+        service = OCRService(use_cache=False)
+        service.extract_with_tesseract = Mock(return_value={
+            'text': 'CEDULA', 'confidence': 0.9, 'word_count': 1, 'method': 'tesseract'
+        })
+        
+        service.extract_text(sample_image, method='tesseract')
+        service.extract_text(sample_image, method='tesseract')
+        
+        assert service.cache is None
+        assert service.extract_with_tesseract.call_count == 2
+    
+    def test_easyocr_loaded_lazily(self, ocr_service, sample_image):
+        """Test que EasyOCR no se carga hasta su primer uso"""
+        assert ocr_service._easyocr_reader is None
+        
+        ocr_service.extract_with_tesseract = Mock(return_value={
+            'text': 'CEDULA', 'confidence': 0.9, 'word_count': 1, 'method': 'tesseract'
+        })
+        ocr_service.extract_text(sample_image, method='tesseract')
+        
+        assert ocr_service._easyocr_reader is None
+    
+    def test_warm_up_unknown_engine(self, ocr_service):
+        """Test precarga con motor no soportado"""
+        with pytest.raises(ValueError):
+            ocr_service.warm_up(engines=['desconocido'])
+    
     def cleanup_temp_files(self, sample_image):
         """Limpia archivos temporales"""
         try:
@@ -0,0 +1,71 @@
+"""
+Tests para el reconocimiento de Tesseract en un solo pase
+"""
+import numpy as np
+import pytest
+from unittest.mock import patch
+from PIL import Image, ImageDraw, ImageFont
+
+from src.services import tesseract_pool
+
+
+class TestTesseractPool:
+    
+    def test_parse_tesseract_config(self):
+        """Test lectura de idioma, oem y psm"""
+        assert tesseract_pool.parse_tesseract_config('--oem 3 --psm 6 -l spa') == ('spa', 3, 6)
+        assert tesseract_pool.parse_tesseract_config('') == ('eng', 3, 3)
+    
+    def test_recognize_with_pytesseract_single_call(self):
+        """Test que texto y confianzas salen de una sola llamada a image_to_data"""
+        data = {
+            'level':     [1, 2, 5, 5, 5, 2, 5],
+            'block_num': [0, 1, 1, 1, 1, 2, 2],
+            'par_num':   [0, 1, 1, 1, 1, 1, 1],
+            'line_num':  [0, 1, 1, 1, 2, 1, 1],
+            'text':      ['', '', 'CEDULA', 'DE', 'CIUDADANIA', '', '12345678'],
+            'conf':      ['-1', '-1', '96', '91.5', '88', '-1', '0']
+        }
+        
+        with patch.object(tesseract_pool.pytesseract, 'image_to_data', return_value=data) as image_to_data:
+            text, confidences = tesseract_pool.recognize_with_pytesseract(
+                np.zeros((10, 10), dtype=np.uint8), '--psm 6'
+            )
+        
+        image_to_data.assert_called_once()
+        assert text == 'CEDULA DE\nCIUDADANIA\n\n12345678'
+        assert confidences == [96.0, 91.5, 88.0]
+    
+    def test_pool_reuses_handles(self):
+        """Test que el pool reutiliza handles en lugar de crear uno por imagen"""
+        pool = tesseract_pool.TesseractHandlePool('spa', 3, size=2)
+        created = []
+        
+        class FakeHandle:
+            def Clear(self):
+                pass
+        
+        def create_handle():
+            created.append(FakeHandle())
+            return created[-1]
+        
+        pool._create_handle = create_handle
+        
+        for _ in range(5):
+            with pool.handle():
+                pass
+        
+        assert len(created) == 1
+    
+    def test_pool_recognizes_with_tesserocr(self):
+        """Test del constructor y el modo de segmentación reales de tesserocr"""
+        pytest.importorskip('tesserocr')
+        image = Image.new('L', (400, 80), color=255)
+        ImageDraw.Draw(image).text((10, 20), "CEDULA 12345678", fill=0, font=ImageFont.load_default())
+        image = image.resize((1200, 240))
+        
+        pool = tesseract_pool.TesseractHandlePool('eng', 3, size=1)
+        text, confidences = pool.recognize(np.array(image), 7)
+        
+        assert '12345678' in text.replace(' ', '')
+        assert confidences
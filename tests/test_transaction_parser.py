@@ -0,0 +1,133 @@
+"""
+Tests para la lectura de movimientos de estados de cuenta
+"""
+import io
+import time
+
+import numpy as np
+import pytest
+
+from src.models.schemas import DocumentType
+from src.services.extraction_service import DataExtractionService
+from src.services.transaction_parser import parse_amount, parse_transactions
+
+STATEMENT = """BANCO DE PRUEBA
+Estado de cuenta
+Cuenta: 1234567890123
+Fecha de corte: 30/04/2024
+FECHA DESCRIPCIÓN VALOR SALDO
+01/03/2024 Saldo anterior $1.000.000,00 1.000.000,00
+05/03/2024 Compra supermercado 123 -$45.000,50 954.999,50
+15/03/2024 Abono nómina 2.500.000 3.454.999,50
+20/03/2024 PAGO CUOTA 3 -150.000 3.304.999,50
+31/02/2024 Línea con fecha imposible 10.000
+02/04/2024 Retiro cajero -200,000.00
+Total movimientos del periodo
+"""
+
+
+class TestTransactionParser:
+    
+    @pytest.mark.parametrize("value,expected", [
+        ("1.234.567,89", 1234567.89),
+        ("1,234,567.89", 1234567.89),
+        ("45.000", 45000.0),
+        ("-$45.000,50", -45000.5),
+        ("$ -12,5", -12.5),
+        ("2500000", 2500000.0),
+    ])
+    def test_parse_amount(self, value, expected):
+        """Test conversión de montos con separadores de miles y decimales"""
+        assert parse_amount(value) == expected
+    
+    def test_parse_transactions(self):
+        """Test lectura de filas en columnas desde texto y desde líneas"""
+        table = parse_transactions(STATEMENT)
+        
+        assert len(table) == 4
+        assert table.dates.dtype == np.dtype('datetime64[D]')
+        assert str(table.dates[0]) == "2024-03-05"
+        assert table.descriptions[0] == "Compra supermercado 123"
+        assert table.descriptions[2] == "PAGO CUOTA 3"
+        np.testing.assert_allclose(table.amounts, [-45000.5, 2500000.0, -150000.0, -200000.0])
+        assert table.balances[1] == 3454999.5
+        assert np.isnan(table.balances[3])
+        
+        from_lines = parse_transactions(io.StringIO(STATEMENT))
+        np.testing.assert_array_equal(from_lines.amounts, table.amounts)
+        assert from_lines.descriptions == table.descriptions
+    
+    def test_monthly_flows(self):
+        """Test entradas y salidas por mes"""
+        flows = parse_transactions(STATEMENT).monthly_flows()
+        
+        assert [str(month) for month in flows['months']] == ["2024-03", "2024-04"]
+        np.testing.assert_allclose(flows['inflow'], [2500000.0, 0.0])
+        np.testing.assert_allclose(flows['outflow'], [195000.5, 200000.0])
+        np.testing.assert_allclose(flows['net'], [2304999.5, -200000.0])
+        assert flows['count'].tolist() == [3, 1]
+    
+    @pytest.mark.parametrize("line,expected", [
+        ("15/05/2023 PAGO CUOTA 3 150.000", ("PAGO CUOTA 3", 150000.0)),
+        ("15/05/2023 PAGO CUOTA 3 150.000 1.200.000", ("PAGO CUOTA 3", 150000.0)),
+        ("15/05/2023 Transferencia 12 $50", ("Transferencia 12", 50.0)),
+        ("31/05/2023 SALDO ANTERIOR 1.000.000", None),
+        ("31/05/2023 Saldo final $1.000.000,00", None),
+        ("31/05/2023 Referencia 12 3", None),
+    ])
+    def test_amount_must_look_like_money(self, line, expected):
+        """Test que los números de la descripción y las filas de saldo no son movimientos"""
+        table = parse_transactions(line)
+        
+        if expected is None:
+            assert len(table) == 0
+        else:
+            assert (table.descriptions[0], table.amounts[0]) == expected
+    
+    def test_unsigned_debits_from_balance(self):
+        """Test que los débitos sin signo se deducen de la variación del saldo"""
+        statement = (
+            "01/03/2024 Saldo anterior 1.000.000,00\n"
+            "05/03/2024 Compra supermercado 45.000,50 954.999,50\n"
+            "15/03/2024 Abono nómina 2.500.000 3.454.999,50\n"
+            "20/03/2024 Pago tarjeta 150.000 3.304.999,50\n"
+            "25/03/2024 Intereses 1.000 3.305.999,50\n"
+        )
+        
+        table = parse_transactions(statement)
+        
+        np.testing.assert_allclose(table.amounts, [-45000.5, 2500000.0, -150000.0, 1000.0])
+        assert parse_transactions(statement).monthly_flows()['outflow'][0] == pytest.approx(195000.5)
+    
+    def test_large_statement(self):
+        """Test que un estado de 5.000 movimientos se resume rápidamente"""
+        lines = [
+            f"{day % 28 + 1:02d}/{day % 12 + 1:02d}/2024 Movimiento {day} "
+            f"{'-' if day % 3 else ''}{day * 10:,}.00 {day * 100:,}.00"
+            for day in range(5000)
+        ]
+        text = "\n".join(lines)
+        
+        start_time = time.perf_counter()
+        table = parse_transactions(text)
+        flows = table.monthly_flows()
+        elapsed = time.perf_counter() - start_time
+        
+        assert len(table) == 5000
+        assert len(flows['months']) == 12
+        assert flows['inflow'].sum() == pytest.approx(table.amounts[table.amounts > 0].sum())
+        assert elapsed < 1.0
+    
+    def test_extract_data_includes_movimientos(self):
+        """Test que el estado de cuenta incluye el resumen de movimientos"""
+        result = DataExtractionService().extract_data(STATEMENT, DocumentType.ESTADO_CUENTA, use_nlp=False)
+        
+        movimientos = result.structured_data['movimientos']
+        assert movimientos['count'] == 4
+        assert movimientos['monthly'][1] == {
+            'month': '2024-04', 'inflow': 0.0, 'outflow': 200000.0, 'net': -200000.0, 'count': 1
+        }
+        assert result.confidence_scores['movimientos'] == 0.8
+        
+        carta = DataExtractionService().extract_data(STATEMENT, DocumentType.CARTA_LABORAL, use_nlp=False)
+        assert 'movimientos' not in carta.fields